@@ -1,21 +1,127 @@
 """Authorize requests"""
+import asyncio
+import logging
 import os
+
 import httpx
 from dotenv import load_dotenv
+from fastapi import Request
 
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+
+def _split(value: str) -> list:
+    """Items of a comma-separated setting."""
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
 ALBERT_API_KEY = os.getenv("ALBERT_API_KEY")
+ALBERT_API_BASE_URL = os.getenv("ALBERT_API_BASE_URL")
+# Upstreams and keys pooled by app.services.upstream_pool, comma-separated.
+# Each defaults to the single setting above, which in turn defaults to the
+# first entry. URLs are built from ALBERT_API_BASE_URL and rewritten to the
+# upstream chosen for each call.
+ALBERT_API_BASE_URLS = [url.rstrip("/") for url in _split(os.getenv("ALBERT_API_BASE_URLS", ""))]
+ALBERT_API_KEYS = _split(os.getenv("ALBERT_API_KEYS", ""))
+ALBERT_API_KEY = ALBERT_API_KEY or next(iter(ALBERT_API_KEYS), None)
+ALBERT_API_BASE_URL = ALBERT_API_BASE_URL or next(iter(ALBERT_API_BASE_URLS), None)
+ALBERT_API_BASE_URLS = ALBERT_API_BASE_URLS or ([ALBERT_API_BASE_URL] if ALBERT_API_BASE_URL else [])
+ALBERT_API_KEYS = ALBERT_API_KEYS or ([ALBERT_API_KEY] if ALBERT_API_KEY else [])
+ALBERT_API_HEALTH_URL = os.getenv("ALBERT_API_HEALTH_URL")
+
+ALBERT_HTTP2 = os.getenv("ALBERT_HTTP2", "true").lower() == "true"
+ALBERT_MAX_CONNECTIONS = int(os.getenv("ALBERT_MAX_CONNECTIONS", "100"))
+ALBERT_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("ALBERT_MAX_KEEPALIVE_CONNECTIONS", "20"))
+ALBERT_KEEPALIVE_EXPIRY = float(os.getenv("ALBERT_KEEPALIVE_EXPIRY", "30"))
+ALBERT_CONNECT_TIMEOUT = float(os.getenv("ALBERT_CONNECT_TIMEOUT", "5"))
+ALBERT_POOL_TIMEOUT = float(os.getenv("ALBERT_POOL_TIMEOUT", "10"))
+ALBERT_WARMUP_REQUESTS = int(os.getenv("ALBERT_WARMUP_REQUESTS", "2"))
+
+# Read timeouts (seconds) per kind of upstream call, each overridable with
+# ALBERT_TIMEOUT_<NAME>. Generation and audio calls need far longer than
+# catalog reads.
+ENDPOINT_TIMEOUTS = {
+    name: float(os.getenv(f"ALBERT_TIMEOUT_{name.upper()}", default))
+    for name, default in {
+        "health": "5",
+        "catalog": "10",
+        "chat": "120",
+        "completions": "120",
+        "embeddings": "30",
+        "search": "30",
+        "upload": "300",
+        "transcription": "600",
+    }.items()
+}
+
+
+def get_timeout(endpoint: str) -> httpx.Timeout:
+    """Returns the timeout to use for a kind of upstream call.
+
+    Args:
+        endpoint (str): Key of ENDPOINT_TIMEOUTS, e.g. "chat" or "catalog".
+
+    Returns:
+        httpx.Timeout: Timeout with the shared connect and pool limits.
+    """
+    return httpx.Timeout(
+        ENDPOINT_TIMEOUTS[endpoint],
+        connect=ALBERT_CONNECT_TIMEOUT,
+        pool=ALBERT_POOL_TIMEOUT,
+    )
 
 
-def get_albert_client() -> httpx.AsyncClient:
-    """Returns client with desired api key.
+def create_albert_client() -> httpx.AsyncClient:
+    """Builds the application-scoped client used for every upstream call.
 
     Returns:
-        httpx.AsyncClient: _description_
+        httpx.AsyncClient: Pooled keep-alive client, HTTP/2 when enabled.
     """
     headers = {
         "Authorization": f"Bearer {ALBERT_API_KEY}"
     }
-    return httpx.AsyncClient(headers=headers)
+    limits = httpx.Limits(
+        max_connections=ALBERT_MAX_CONNECTIONS,
+        max_keepalive_connections=ALBERT_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=ALBERT_KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncClient(
+        headers=headers,
+        limits=limits,
+        http2=ALBERT_HTTP2,
+        timeout=get_timeout("catalog"),
+    )
+
+
+async def warmup_albert_client(client: httpx.AsyncClient) -> None:
+    """Resolves DNS and opens pooled connections before traffic arrives.
+
+    Failures are logged and ignored so an unreachable upstream does not
+    prevent the app from starting.
+
+    Args:
+        client (httpx.AsyncClient): The application-scoped client.
+    """
+    urls = [ALBERT_API_HEALTH_URL] if ALBERT_API_HEALTH_URL else [f"{url}/models" for url in ALBERT_API_BASE_URLS]
+    if not urls or ALBERT_WARMUP_REQUESTS <= 0:
+        return
+
+    results = await asyncio.gather(
+        *(client.get(url, timeout=get_timeout("health")) for url in urls for _ in range(ALBERT_WARMUP_REQUESTS)),
+        return_exceptions=True,
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            logger.warning("Albert API warmup request failed: %s", result)
+
+
+def get_albert_client(request: Request) -> httpx.AsyncClient:
+    """Returns the shared client with desired api key.
+
+    Returns:
+        httpx.AsyncClient: Client created by the application lifespan.
+    """
+    return request.app.state.albert_client
@@ -1,13 +1,47 @@
 """Main routes"""
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from app.functions.login_function import create_albert_client, warmup_albert_client
 from app.routes import core
+from app.services.conversations import create_conversation_store
+from app.services.health import HealthProber, circuit_breaker
+from app.services.jobs import JobQueue, create_job_store
+from app.services.metrics import MetricsMiddleware
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the shared Albert client, job workers, conversation store and
+    health prober on startup, close them on shutdown.
+
+    Args:
+        app (FastAPI): The application.
+    """
+    app.state.albert_client = create_albert_client()
+    app.state.job_queue = JobQueue(create_job_store())
+    app.state.conversation_store = create_conversation_store()
+    app.state.health_prober = HealthProber(app.state.albert_client, circuit_breaker)
+    await warmup_albert_client(app.state.albert_client)
+    await app.state.job_queue.start()
+    app.state.health_prober.start()
+    try:
+        yield
+    finally:
+        await app.state.health_prober.stop()
+        await app.state.job_queue.stop()
+        app.state.conversation_store.close()
+        await app.state.albert_client.aclose()
+
 
 app = FastAPI(
     title="Test Albert API",
     description="API to interact with Albert Api Services",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
+app.add_middleware(MetricsMiddleware)
 app.include_router(core.router)
 
 @app.get("/", include_in_schema=False)
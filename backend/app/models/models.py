@@ -1,6 +1,6 @@
 """Represent models responses"""
 from enum import Enum
-from typing import List, Optional, Literal, Union
+from typing import Any, List, Optional, Literal, Union
 from pydantic import BaseModel
 from uuid import UUID
 # from googletrans import LANGUAGES
@@ -91,6 +91,21 @@ class SearchArgs(BaseModel):
     template: str
 
 
+class SearchRequest(BaseModel):
+    """Search fanned out to each collection and fused locally.
+
+    Args:
+        BaseModel (_type_): _description_
+    """
+    prompt: str
+    collections: List[str]
+    k: int = 4
+    rff_k: int = 20
+    method: Literal["hybrid", "lexical", "semantic"] = "semantic"
+    score_threshold: float = 0.0
+    deadline: Optional[float] = None
+
+
 class ChatRequest(BaseModel):
     """_summary_
 
@@ -173,3 +188,61 @@ class TranscriptionRequest(BaseModel):
     response_format: str = "json"
     temperature: float = 0.0
     timestamp_granularities: Optional[List[str]] = None
+
+
+class Job(BaseModel):
+    """State of a background job.
+
+    Args:
+        BaseModel (_type_): _description_
+    """
+    id: str
+    kind: str
+    status: Literal["queued", "running", "succeeded", "failed", "cancelled"] = "queued"
+    progress: float = 0.0
+    result: Optional[Any] = None
+    error: Optional[Any] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+
+class Conversation(BaseModel):
+    """Chat history kept server-side between turns.
+
+    Args:
+        BaseModel (_type_): _description_
+    """
+    id: str
+    model: str
+    user: Optional[str] = None
+    messages: List[Message] = []
+    created_at: float
+    updated_at: float
+
+
+class ConversationCreate(BaseModel):
+    """Body creating a conversation.
+
+    Args:
+        BaseModel (_type_): _description_
+    """
+    model: str
+    system: Optional[str] = None
+    user: Optional[str] = None
+
+
+class ConversationMessage(BaseModel):
+    """A message appended to a conversation, and the generation parameters
+    used when it asks for a reply.
+
+    Args:
+        BaseModel (_type_): _description_
+    """
+    content: str
+    role: Literal["system", "user", "assistant"] = "user"
+    name: Optional[str] = None
+    temperature: float = 0.7
+    max_tokens: int = 0
+    top_p: float = 1
+    seed: int = 0
@@ -1,52 +1,75 @@
 """Routes for Core tag"""
-import os
 
 import json
+import logging
 import httpx
-from typing import Optional, List
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends, Body
+from typing import Optional, List, Literal
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends, Body, Header, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from dotenv import load_dotenv
 from enum import Enum
-from app.functions.login_function import get_albert_client
+from app.functions.login_function import ALBERT_API_BASE_URL, get_albert_client, get_timeout
 from app.models.models import ChatRequest
-from app.services.app_services import fetch_models, fetch_model_by_id
-from app.models.models import AlbertModelResponse, CompletionRequest, Language
+from app.services.app_services import fetch_models, fetch_model_by_id, fetch_collections
+from app.services.app_services import post_chat_completion, post_completion, post_transcription
+from app.services.app_services import build_file_request, post_file
+from app.services.audio_segments import transcribe_wav_segments
+from app.services.batch import BATCH_CONCURRENCY, iter_batch, parse_batch_body, run_batch
+from app.services.bulk_ingest import BULK_UPLOAD_CONCURRENCY, ingest_files
+from app.services.catalog_cache import catalog_cache
+from app.services.context_window import fit_to_context
+from app.services.conversations import (
+    ConversationStore, append_messages, build_chat_request, conversation_lock,
+    get_conversation_store, load_conversation, make_message, new_conversation,
+)
+from app.services.health import HealthProber, get_health_prober
+from app.services.hedging import hedger
+from app.services.jobs import JobQueue, detach_upload, get_job_queue, job_accepted
+from app.services.limiter import model_limiter
+from app.services.model_router import report_model, resolve_request
+from app.services import metrics
+from app.services.metrics import InstrumentedRoute
+from app.services.multipart import UPLOAD_MAX_BYTES, file_size
+from app.services.passthrough import RawJSON, fast_json, relay
+from app.services.rate_limit import estimate_tokens, rate_limit_key, rate_limiter
+from app.services.response_cache import is_deterministic, response_cache
+from app.services.search import fan_out_search
+from app.services.semantic_cache import semantic_cache
+from app.services.transcription_cache import transcription_cache
+from app.services.streaming import stream_upstream
+from app.services.upstream import send_upstream
+from app.services.upstream_pool import upstream_pool
+from app.models.models import AlbertModelResponse, CompletionRequest, Job, Language, SearchRequest
+from app.models.models import Conversation, ConversationCreate, ConversationMessage
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
 
-ALBERT_API_BASE_URL = os.getenv("ALBERT_API_BASE_URL")
-ALBERT_API_HEALTH_URL = os.getenv("ALBERT_API_HEALTH_URL")
-
-router = APIRouter()
+router = APIRouter(route_class=InstrumentedRoute)
 
 
 @router.get("/health", tags=["Health Check"])
-async def health_check(client: httpx.AsyncClient = Depends(get_albert_client)):
+async def health_check(prober: HealthProber = Depends(get_health_prober)):
     """
     Check Albert Health.
-    """
-    status = {"api": "ok", "albert_api": "ok"}
-
-    try:
-        response = await client.get(ALBERT_API_HEALTH_URL, timeout=5.0)
-        print(response.status_code)
-        if response.status_code != 200:
-            status["albert_api"] = "down"
-    except Exception:
-        status["albert_api"] = "down"
 
-    return status
+    Answers from the state kept by the background health prober, without
+    calling the Albert API.
+    """
+    return prober.status()
 
 
 @router.get("/models", summary="Get Albert models", tags=["Models"])
 async def get_albert_models(client: httpx.AsyncClient = Depends(get_albert_client)):
     """
     Endpoint to fetch the list of models from the Albert API.
+
+    The upstream body is relayed as is.
     """
     try:
-        models = await fetch_models(client=client)
-        return models
+        models = await catalog_cache.get("models", lambda: fetch_models(client=client))
+        return relay(models)
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -64,82 +87,175 @@ async def get_model_by_id(model_id: str, client: httpx.AsyncClient = Depends(get
     Returns:
         _type_: _description_
     """
-    model_data = await fetch_model_by_id(model_id, client=client)
+    model_data = await catalog_cache.get(
+        f"model:{model_id}", lambda: fetch_model_by_id(model_id, client=client)
+    )
     return model_data
 
 
 @router.post("/chat-completion/")
 async def chat_completion(request: ChatRequest,
-                          client: httpx.AsyncClient = Depends(get_albert_client)):
+                          response: Response,
+                          http_request: Request,
+                          client: httpx.AsyncClient = Depends(get_albert_client),
+                          x_cache_bypass: Optional[str] = Header(None),
+                          x_model_pin: Optional[str] = Header(None)):
     """_summary_
 
+    Messages that do not fit in the model's context window are dropped,
+    oldest first, and reported in the X-Context-* headers. A model of
+    "auto:<type>" or an alias is resolved from the catalog, and the model
+    used is returned in X-Resolved-Model.
+
     Args:
         request (ChatRequest): _description_
+        response (Response): Carries the X-Cache, X-Context-* and X-Resolved-Model headers.
+        http_request (Request): Identifies the caller for rate limiting.
         client (httpx.AsyncClient, optional): _description_. Defaults to Depends(get_albert_client).
+        x_cache_bypass (Optional[str]): Set to skip the response and semantic cache lookups.
+        x_model_pin (Optional[str]): Model or alias to use for "auto" models.
 
     Raises:
-        HTTPException: _description_
+        HTTPException: _description_, 429 when the user is over their rate limits.
 
     Returns:
         _type_: _description_
     """
-    try:
-        response = await client.post(
+    user_key = rate_limit_key(request.user, http_request)
+    request = await resolve_request(request, client, x_model_pin)
+    request, fit_report = await fit_to_context(request, client)
+    if request.stream:
+        payload = request.model_dump()
+        rate_limiter.admit(user_key, estimate_tokens(payload))
+        streamed = await stream_upstream(
+            client,
             f"{ALBERT_API_BASE_URL}/chat/completions",
-            json=request.model_dump()
+            payload,
+            get_timeout("chat"),
         )
-        response.raise_for_status()
-        return response.json()
-    except httpx.RequestError as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Request to origin API failed: {e}"
-        ) from e
-    except httpx.HTTPStatusError as e:
-        raise HTTPException(
-            status_code=response.status_code,
-            detail=f"Error response from origin API: {e.response.text}"
-        ) from e
+        fit_report.apply(streamed)
+        report_model(streamed, request.model)
+        return streamed
+
+    rate_limiter.admit(user_key)
+    fit_report.apply(response)
+    report_model(response, request.model)
+    completion = await semantic_cache.get_or_call(
+        request.model_dump(),
+        lambda: response_cache.get_or_call(
+            "chat",
+            request,
+            lambda: rate_limiter.metered(user_key, post_chat_completion(
+                request.model_dump(), client=client, hedge=is_deterministic(request)
+            )),
+            response,
+            bypass=bool(x_cache_bypass),
+        ),
+        response,
+        client,
+        bypass=bool(x_cache_bypass),
+    )
+    return fast_json(completion, response)
+
+
+@router.post("/chat-completion/batch")
+async def chat_completion_batch(
+    http_request: Request,
+    concurrency: int = BATCH_CONCURRENCY,
+    output: Literal["json", "ndjson"] = "json",
+    client: httpx.AsyncClient = Depends(get_albert_client),
+):
+    """Run a batch of chat completions against the Albert API.
+
+    The body is either a JSON array of ChatRequest or JSON lines with one
+    ChatRequest per line (Content-Type application/x-ndjson). Items run with
+    at most `concurrency` calls in flight and fail independently. Each item
+    takes a request token of its user: items beyond the burst wait for the
+    bucket to refill, and get 429 if that takes over RATE_LIMIT_MAX_WAIT.
+
+    Args:
+        http_request (Request): The incoming request carrying the batch body.
+        concurrency (int): Maximum number of upstream calls in flight.
+        output (str): "json" for one response with results in input order,
+            "ndjson" to stream each result as soon as it completes.
+        client (httpx.AsyncClient): The HTTP client to make the requests.
+
+    Returns:
+        dict: {"results": [...], "succeeded": int, "failed": int} in json mode.
+    """
+    items = parse_batch_body(
+        await http_request.body(),
+        http_request.headers.get("content-type", ""),
+        ChatRequest,
+    )
+    async def forward(item: ChatRequest):
+        if item.stream:
+            raise HTTPException(status_code=400, detail="Streaming is not supported in batches")
+        user_key = rate_limit_key(item.user, http_request)
+        await rate_limiter.acquire(user_key)
+        item = await resolve_request(item, client)
+        item, _ = await fit_to_context(item, client)
+        return await rate_limiter.metered(user_key, post_chat_completion(item.model_dump(), client=client))
+
+    if output == "ndjson":
+        async def lines():
+            async for result in iter_batch(items, forward, concurrency):
+                yield json.dumps(result) + "\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    results = await run_batch(items, forward, concurrency)
+    failed = sum(1 for result in results if "error" in result)
+    return {"results": results, "succeeded": len(results) - failed, "failed": failed}
 
 
 @router.post("/completions")
 async def completions(
     request: CompletionRequest,
-    client: httpx.AsyncClient = Depends(get_albert_client)
+    response: Response,
+    http_request: Request,
+    client: httpx.AsyncClient = Depends(get_albert_client),
+    x_cache_bypass: Optional[str] = Header(None),
+    x_model_pin: Optional[str] = Header(None),
 ):
     """
     Calls the completions endpoint with the provided parameters.
 
+    Deterministic requests (temperature 0 or an explicit seed) are served
+    from the response cache when possible. A model of "auto:<type>" or an
+    alias is resolved from the catalog and reported in X-Resolved-Model.
+
     Args:
         request (CompletionRequest): The request data.
+        response (Response): Carries the X-Cache and X-Resolved-Model headers.
+        http_request (Request): Identifies the caller for rate limiting.
         client (httpx.AsyncClient): The HTTP client to make the request.
+        x_cache_bypass (Optional[str]): Set to skip the response cache lookup.
+        x_model_pin (Optional[str]): Model or alias to use for "auto" models.
+
+    Raises:
+        HTTPException: 429 when the user is over their rate limits.
 
     Returns:
         dict: The response from the completions API.
     """
     # payload = request.dict()
+    request = await resolve_request(request, client, x_model_pin)
+    report_model(response, request.model)
     payload = request.model_dump()
+    user_key = rate_limit_key(request.user if "user" in request.model_fields_set else None, http_request)
+    rate_limiter.admit(user_key)
 
-    try:
-        response = await client.post(f"{ALBERT_API_BASE_URL}/completions", json=payload)
-        response.raise_for_status()
-        # response_data = response.json()
-        # text = response_data.get("choices", [{}])[0].get("text", "")
-
-        # return text
-        return response.json()
-
-    except httpx.RequestError as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Request to origin API failed: {e}"
-        ) from e
-
-    except httpx.HTTPStatusError as e:
-        raise HTTPException(
-            status_code=response.status_code,
-            detail=f"Error response from origin API: {e.response.text}"
-        ) from e
+    completion = await response_cache.get_or_call(
+        "completions",
+        request,
+        lambda: rate_limiter.metered(
+            user_key, post_completion(payload, client=client, hedge=is_deterministic(request))
+        ),
+        response,
+        bypass=bool(x_cache_bypass),
+    )
+    return fast_json(completion, response)
 
 
 @router.get("/model-details/{model_id}", tags=["Models"])
@@ -158,10 +274,15 @@ async def get_model_details(model_id: str, client: httpx.AsyncClient = Depends(g
     encoded_model_id = model_id.replace("/", "%2F")
     url = f"{ALBERT_API_BASE_URL}/models/{encoded_model_id}"
 
-    try:
-        response = await client.get(url)
+    async def fetch_model_details():
+        response = await hedger.run(
+            "model", lambda: send_upstream(client, "GET", url, timeout=get_timeout("catalog"))
+        )
         response.raise_for_status()
-        return response.json()
+        return RawJSON.from_response(response)
+
+    try:
+        return relay(await catalog_cache.get(f"model-details:{model_id}", fetch_model_details))
     except httpx.RequestError as e:
         raise HTTPException(
             status_code=500,
@@ -169,7 +290,7 @@ async def get_model_details(model_id: str, client: httpx.AsyncClient = Depends(g
         ) from e
     except httpx.HTTPStatusError as e:
         raise HTTPException(
-            status_code=response.status_code,
+            status_code=e.response.status_code,
             detail=f"Error response from origin API: {e.response.text}"
         ) from e
 
@@ -188,11 +309,7 @@ async def get_collections(client: httpx.AsyncClient = Depends(get_albert_client)
         _type_: _description_
     """
     try:
-        response = await client.get(
-            f"{ALBERT_API_BASE_URL}/collections",
-        )
-        response.raise_for_status()
-        return response.json()
+        return relay(await catalog_cache.get("collections", lambda: fetch_collections(client=client)))
     except httpx.RequestError as e:
         raise HTTPException(
             status_code=500,
@@ -200,11 +317,113 @@ async def get_collections(client: httpx.AsyncClient = Depends(get_albert_client)
         ) from e
     except httpx.HTTPStatusError as e:
         raise HTTPException(
-            status_code=response.status_code,
+            status_code=e.response.status_code,
             detail=f"Error response from origin API: {e.response.text}"
         ) from e
 
 
+@router.post("/search", tags=["Search"])
+async def search(request: SearchRequest, client: httpx.AsyncClient = Depends(get_albert_client)):
+    """Search several collections at once.
+
+    Each collection is queried concurrently, their rankings are merged with
+    reciprocal-rank fusion, then score_threshold and k are applied.
+    Collections slower than the deadline (seconds, SEARCH_DEADLINE by
+    default) are left out and reported in "sources" with their latency.
+
+    Args:
+        request (SearchRequest): The search.
+        client (httpx.AsyncClient): The HTTP client to make the requests.
+
+    Returns:
+        dict: Fused results, per-collection status and latency.
+    """
+    return await fan_out_search(request, client)
+
+
+@router.get("/limits", tags=["Health Check"])
+async def get_model_limits():
+    """Return the adaptive concurrency limit, in-flight calls and queue depth per model."""
+    return model_limiter.stats()
+
+
+@router.get("/hedging", tags=["Health Check"])
+async def get_hedging_stats():
+    """Return the hedge delay, remaining budget and wins per kind of upstream call."""
+    return hedger.stats()
+
+
+@router.get("/upstreams", tags=["Health Check"])
+async def get_upstreams():
+    """Return the load, latency EWMA and ejection state of every upstream/key pair."""
+    return upstream_pool.stats()
+
+
+@router.get("/metrics", response_class=PlainTextResponse, tags=["Health Check"])
+async def get_metrics():
+    """Return request, upstream and token metrics in the Prometheus text format."""
+    return PlainTextResponse(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@router.get("/quotas", tags=["Quotas"])
+async def get_quotas():
+    """Return the remaining request and token allowance of every tracked user."""
+    return rate_limiter.stats()
+
+
+@router.get("/quotas/{user_key:path}", tags=["Quotas"])
+async def get_quota(user_key: str):
+    """Return the remaining allowance of one user, e.g. "user:alice".
+
+    Raises:
+        HTTPException: 404 if the user has not been seen.
+    """
+    quota = rate_limiter.get(user_key)
+    if quota is None:
+        raise HTTPException(status_code=404, detail="Unknown user")
+    return quota
+
+
+@router.delete("/quotas/{user_key:path}", tags=["Quotas"])
+async def reset_quota(user_key: str):
+    """Refill the buckets of one user."""
+    return {"reset": rate_limiter.reset(user_key)}
+
+
+@router.get("/cache/catalog", tags=["Cache"])
+async def get_catalog_cache_stats():
+    """Return hit/miss counters of the model and collection catalog cache."""
+    return catalog_cache.stats()
+
+
+@router.delete("/cache/catalog", tags=["Cache"])
+async def invalidate_catalog_cache(key: Optional[str] = None):
+    """Invalidate one catalog cache entry, or all of them when no key is given.
+
+    Args:
+        key (Optional[str]): Entry to drop, e.g. "models", "collections" or "model:<id>".
+    """
+    return {"invalidated": catalog_cache.invalidate(key)}
+
+
+@router.get("/cache/semantic", tags=["Cache"])
+async def get_semantic_cache_stats():
+    """Return hit/miss counters and occupancy of the semantic chat cache."""
+    return semantic_cache.stats()
+
+
+@router.get("/cache/responses", tags=["Cache"])
+async def get_response_cache_stats():
+    """Return hit/miss counters of the deterministic completion cache."""
+    return response_cache.stats()
+
+
+@router.get("/cache/transcriptions", tags=["Cache"])
+async def get_transcription_cache_stats():
+    """Return transcription cache hit/miss counters and disk usage."""
+    return transcription_cache.stats()
+
+
 @router.post("/upload")
 async def upload_file(
     file: UploadFile = File(...),
@@ -215,7 +434,9 @@ async def upload_file(
     is_separator_regex: bool = Form(False),
     separators: str = Form("\n\n,\n,. , "),
     chunk_min_size: int = Form(0),
+    async_job: bool = Form(False),
     client: httpx.AsyncClient = Depends(get_albert_client),
+    job_queue: JobQueue = Depends(get_job_queue),
 ):
     """
     Upload a file to be processed, chunked, and stored into a vector database. Supported file types : pdf, html, json.
@@ -229,48 +450,85 @@ async def upload_file(
         key (optional) with dict type value.
         html: Hypertext Markup Language file.
         markdown: Markdown Language file.
-    """
-    separators_list = [sep.strip() for sep in separators.split(",") if sep.strip()]
-
-    request_payload = {
-        "collection": collection,
-        "chunker": {
-            "name": "LangchainRecursiveCharacterTextSplitter",
-            "args": {
-                "chunk_size": chunk_size,
-                "chunk_overlap": chunk_overlap,
-                "length_function": length_function,
-                "is_separator_regex": is_separator_regex,
-                "separators": separators_list,
-                "chunk_min_size": chunk_min_size,
-            },
-        },
-    }
 
-    try:
-        response = await client.post(
-            f"{ALBERT_API_BASE_URL}/files",
-            files={
-                "file": (file.filename, await file.read(), file.content_type),
-                "request": (None, json.dumps(request_payload), "application/json"),
-            },
-        )
-        response.raise_for_status()
-        return response.json()
-    except httpx.RequestError as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Request to external API failed: {e}",
-        ) from e
-    except httpx.HTTPStatusError as e:
+    The file is streamed to the Albert API in fixed-size chunks and files
+    larger than UPLOAD_MAX_BYTES are rejected before anything is sent.
+
+    With `async_job`, the upload runs in the background and a job id is
+    returned at once; poll /jobs/{job_id} for its progress and result.
+    """
+    size = file.size if file.size is not None else file_size(file.file)
+    if size > UPLOAD_MAX_BYTES:
         raise HTTPException(
-            status_code=response.status_code,
-            detail=f"Error response from external API: {e.response.text}",
-        ) from e
+            status_code=413,
+            detail=f"File too large: {size} bytes, maximum is {UPLOAD_MAX_BYTES} bytes",
+        )
+
+    request_payload = build_file_request(
+        collection,
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=length_function,
+        is_separator_regex=is_separator_regex,
+        separators=separators,
+        chunk_min_size=chunk_min_size,
+    )
+
+    if async_job:
+        detached = await detach_upload(file)
+        filename, content_type = file.filename, file.content_type
+
+        async def run_upload(report_progress):
+            return await post_file(
+                detached, filename, content_type, request_payload, client,
+                size=size, on_progress=report_progress,
+            )
+
+        job = await job_queue.submit("upload", run_upload, cleanup=detached.close)
+        return JSONResponse(status_code=202, content=job_accepted(job))
+
+    return await post_file(
+        file.file, file.filename, file.content_type, request_payload, client, size=size
+    )
+
+
+@router.post("/upload/bulk")
+async def upload_files_bulk(
+    files: List[UploadFile] = File(...),
+    collection: str = Form(...),
+    chunk_size: int = Form(512),
+    chunk_overlap: int = Form(0),
+    length_function: str = Form("len"),
+    is_separator_regex: bool = Form(False),
+    separators: str = Form("\n\n,\n,. , "),
+    chunk_min_size: int = Form(0),
+    concurrency: int = Form(BULK_UPLOAD_CONCURRENCY),
+    client: httpx.AsyncClient = Depends(get_albert_client),
+):
+    """
+    Upload several files, or zip/tar archives of files, into one collection.
+
+    Archives are unpacked entry by entry and every file is forwarded to the
+    Albert API with the same chunker settings as /upload, with at most
+    `concurrency` files in flight. Returns one result per file along with
+    aggregate throughput stats.
+    """
+    request_payload = build_file_request(
+        collection,
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=length_function,
+        is_separator_regex=is_separator_regex,
+        separators=separators,
+        chunk_min_size=chunk_min_size,
+    )
+
+    return await ingest_files(files, request_payload, client, concurrency)
 
 
 @router.post("/transcribe/")
 async def transcribe_audio(
+    response: Response,
     file: UploadFile = File(...),
     model: str = Form("openai/whisper-large-v3"),
     language: str = Form("fr"),
@@ -278,11 +536,27 @@ async def transcribe_audio(
     response_format: str = Form("json"),
     temperature: float = Form(0.0),
     timestamp_granularities: Optional[List[str]] = Form(None),
+    segmented: bool = Form(False),
+    segment_seconds: float = Form(300.0),
+    overlap_seconds: float = Form(2.0),
+    async_job: bool = Form(False),
     client: httpx.AsyncClient = Depends(get_albert_client),
+    job_queue: JobQueue = Depends(get_job_queue),
+    x_cache_bypass: Optional[str] = Header(None),
 ):
-    """Send an audio file for transcription"""
+    """Send an audio file for transcription.
 
-    files = {"file": (file.filename, file.file, file.content_type)}
+    Results are cached on disk by the SHA-256 of the audio and the
+    transcription parameters, so a file sent again is answered without
+    calling the Albert API; X-Cache tells HIT, MISS or BYPASS.
+
+    With `segmented`, a WAV recording is cut into overlapping windows of
+    `segment_seconds` that are transcribed concurrently and stitched back
+    together; segments that fail are listed in "failed_segments".
+
+    With `async_job`, the transcription runs in the background and a job id
+    is returned at once; poll /jobs/{job_id} for its progress and result.
+    """
     data = {
         "model": model,
         "language": language,
@@ -294,21 +568,182 @@ async def transcribe_audio(
     if timestamp_granularities:
         for i, granularity in enumerate(timestamp_granularities):
             data[f"timestamp_granularities[{i}]"] = granularity
-    try:
-        response = await client.post(f"{ALBERT_API_BASE_URL}/audio/transcriptions",
-                               files=files, data=data)
-        response.raise_for_status()
-        return response.json()
-    except httpx.RequestError as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Request to external API failed: {e}",
-        ) from e
-    except httpx.HTTPStatusError as e:
-        raise HTTPException(
-            status_code=response.status_code,
-            detail=f"Error response from external API: {e.response.text}",
-        ) from e
+
+    cache_params = {
+        "model": model,
+        "language": language,
+        "prompt": prompt,
+        "response_format": response_format,
+        "temperature": temperature,
+        "timestamp_granularities": timestamp_granularities or [],
+    }
+    if segmented:
+        cache_params.update(segment_seconds=segment_seconds, overlap_seconds=overlap_seconds)
+
+    if async_job:
+        detached = await detach_upload(file)
+        filename, content_type = file.filename, file.content_type
+
+        async def run_transcription(report_progress):
+            async def call():
+                if segmented:
+                    return await transcribe_wav_segments(
+                        detached, filename, data, client, segment_seconds, overlap_seconds,
+                        on_progress=report_progress,
+                    )
+                return await post_transcription((filename, detached, content_type), data, client)
+
+            return await transcription_cache.get_or_call(detached, cache_params, call, bypass=bool(x_cache_bypass))
+
+        job = await job_queue.submit("transcription", run_transcription, cleanup=detached.close)
+        return JSONResponse(status_code=202, content=job_accepted(job))
+
+    async def call():
+        if segmented:
+            return await transcribe_wav_segments(
+                file.file, file.filename, data, client, segment_seconds, overlap_seconds
+            )
+        return await post_transcription((file.filename, file.file, file.content_type), data, client)
+
+    return await transcription_cache.get_or_call(file.file, cache_params, call, response, bypass=bool(x_cache_bypass))
+
+
+@router.get("/jobs", response_model=List[Job], tags=["Jobs"])
+async def list_jobs(limit: int = 100, job_queue: JobQueue = Depends(get_job_queue)):
+    """List the most recent background jobs."""
+    return await job_queue.list(limit)
+
+
+@router.get("/jobs/{job_id}", response_model=Job, tags=["Jobs"])
+async def get_job(job_id: str, job_queue: JobQueue = Depends(get_job_queue)):
+    """Return the status, progress and result of a background job.
+
+    Args:
+        job_id (str): Id returned when the job was queued.
+
+    Raises:
+        HTTPException: 404 if the job is unknown.
+    """
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+
+@router.delete("/jobs/{job_id}", response_model=Job, tags=["Jobs"])
+async def cancel_job(job_id: str, job_queue: JobQueue = Depends(get_job_queue)):
+    """Cancel a queued or running background job.
+
+    Args:
+        job_id (str): Id returned when the job was queued.
+
+    Raises:
+        HTTPException: 404 if the job is unknown.
+    """
+    job = await job_queue.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+
+@router.post("/conversations", response_model=Conversation, tags=["Conversations"])
+async def create_conversation(request: ConversationCreate,
+                              store: ConversationStore = Depends(get_conversation_store)):
+    """Start a conversation whose history is kept server-side.
+
+    Args:
+        request (ConversationCreate): Model, optional system prompt and user.
+    """
+    conversation = new_conversation(request.model, request.system, request.user)
+    await store.save(conversation)
+    return conversation
+
+
+@router.get("/conversations/{conversation_id}", response_model=Conversation, tags=["Conversations"])
+async def get_conversation(conversation_id: str, store: ConversationStore = Depends(get_conversation_store)):
+    """Return a conversation and its history.
+
+    Raises:
+        HTTPException: 404 if unknown or expired.
+    """
+    return await load_conversation(store, conversation_id)
+
+
+@router.delete("/conversations/{conversation_id}", tags=["Conversations"])
+async def delete_conversation(conversation_id: str, store: ConversationStore = Depends(get_conversation_store)):
+    """Forget a conversation."""
+    return {"deleted": await store.delete(conversation_id)}
+
+
+@router.post("/conversations/{conversation_id}/messages", response_model=Conversation, tags=["Conversations"])
+async def append_conversation_message(conversation_id: str, message: ConversationMessage,
+                                      store: ConversationStore = Depends(get_conversation_store)):
+    """Add a message to a conversation without asking for a reply.
+
+    Raises:
+        HTTPException: 404 if unknown or expired.
+    """
+    async with conversation_lock(conversation_id):
+        conversation = await load_conversation(store, conversation_id)
+        append_messages(conversation, [make_message(message.role, message.content, message.name)])
+        await store.save(conversation)
+    return conversation
+
+
+@router.post("/conversations/{conversation_id}/reply", tags=["Conversations"])
+async def reply_in_conversation(
+    conversation_id: str,
+    message: ConversationMessage,
+    http_request: Request,
+    response: Response,
+    store: ConversationStore = Depends(get_conversation_store),
+    client: httpx.AsyncClient = Depends(get_albert_client),
+    x_model_pin: Optional[str] = Header(None),
+):
+    """Add the new turn to a conversation and get the assistant's reply.
+
+    The ChatRequest is built from the stored history, so the client only
+    sends the new message. Its content may be empty to get a reply to the
+    history as it is. The turn and the reply are stored only once the reply
+    has been received.
+
+    Args:
+        conversation_id (str): Id returned when the conversation was created.
+        message (ConversationMessage): The new turn and generation parameters.
+        http_request (Request): Identifies the caller for rate limiting.
+        response (Response): Carries the X-Context-* and X-Resolved-Model headers.
+        store (ConversationStore): Where conversations are kept.
+        client (httpx.AsyncClient): The HTTP client to make the request.
+        x_model_pin (Optional[str]): Model or alias to use for "auto" models.
+
+    Raises:
+        HTTPException: 404 if unknown or expired, 429 when the user is over
+            their rate limits.
+
+    Returns:
+        dict: The reply, its usage and the number of stored messages.
+    """
+    async with conversation_lock(conversation_id):
+        conversation = await load_conversation(store, conversation_id)
+        user_key = rate_limit_key(conversation.user, http_request)
+        pending = [make_message(message.role, message.content, message.name)] if message.content else []
+        request = await resolve_request(build_chat_request(conversation, message, pending), client, x_model_pin)
+        request, fit_report = await fit_to_context(request, client)
+        rate_limiter.admit(user_key)
+        fit_report.apply(response)
+        report_model(response, request.model)
+
+        completion = await rate_limiter.metered(user_key, post_chat_completion(request.model_dump(), client=client))
+        reply = completion.get("choices", [{}])[0].get("message", {}).get("content", "") or ""
+        append_messages(conversation, pending + [make_message("assistant", reply)])
+        await store.save(conversation)
+
+    return {
+        "conversation_id": conversation.id,
+        "assistant_reply": reply,
+        "usage": completion.get("usage"),
+        "messages": len(conversation.messages),
+    }
 
 from pydantic import BaseModel
 class Message(BaseModel):
@@ -344,26 +779,58 @@ class ChatRequesty(BaseModel):
     search: Optional[bool] = False
     search_args: Optional[SearchArgs] = None
 
-ALBERT_API_CHAT_URL = "https://albert.api.dev.etalab.gouv.fr/v1/chat/completions"
 
 @router.post("/chat")
-async def chat(request: ChatRequesty, client: httpx.AsyncClient = Depends(get_albert_client)):
-    try:
-        response = await client.post(ALBERT_API_CHAT_URL, json=request.dict(exclude_none=True))
-        response.raise_for_status()
-        api_response = response.json()
-        print("API Response:", api_response)  # Log the entire response here
-        assistant_message = api_response.get("choices", [{}])[0].get("message", {}).get("content", "")
-        if not assistant_message:
-            print("Assistant message is empty.")
-        return {"assistant_reply": assistant_message}
-    except httpx.RequestError as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Request to external API failed: {e}",
-        ) from e
-    except httpx.HTTPStatusError as e:
-        raise HTTPException(
-            status_code=response.status_code,
-            detail=f"Error response from external API: {e.response.text}",
-        ) from e
\ No newline at end of file
+async def chat(request: ChatRequesty, http_request: Request, response: Response,
+               client: httpx.AsyncClient = Depends(get_albert_client),
+               x_cache_bypass: Optional[str] = Header(None),
+               x_model_pin: Optional[str] = Header(None)):
+    user_key = rate_limit_key(request.user, http_request)
+    request = await resolve_request(request, client, x_model_pin)
+    request, fit_report = await fit_to_context(request, client)
+    if request.stream:
+        payload = request.dict(exclude_none=True)
+        rate_limiter.admit(user_key, estimate_tokens(payload))
+        streamed = await stream_upstream(
+            client,
+            f"{ALBERT_API_BASE_URL}/chat/completions",
+            payload,
+            get_timeout("chat"),
+        )
+        fit_report.apply(streamed)
+        report_model(streamed, request.model)
+        return streamed
+
+    rate_limiter.admit(user_key)
+    fit_report.apply(response)
+    report_model(response, request.model)
+
+    async def call():
+        try:
+            upstream_response = await send_upstream(client, "POST", f"{ALBERT_API_BASE_URL}/chat/completions",
+                                                    model=request.model,
+                                                    json=request.dict(exclude_none=True),
+                                                    timeout=get_timeout("chat"))
+            upstream_response.raise_for_status()
+        except httpx.RequestError as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Request to external API failed: {e}",
+            ) from e
+        except httpx.HTTPStatusError as e:
+            raise HTTPException(
+                status_code=upstream_response.status_code,
+                detail=f"Error response from external API: {e.response.text}",
+            ) from e
+        api_response = upstream_response.json()
+        metrics.record_usage(request.model, api_response.get("usage"))
+        rate_limiter.charge(user_key, (api_response.get("usage") or {}).get("total_tokens") or 0)
+        return api_response
+
+    api_response = await semantic_cache.get_or_call(
+        request.dict(exclude_none=True), call, response, client, bypass=bool(x_cache_bypass)
+    )
+    assistant_message = api_response.get("choices", [{}])[0].get("message", {}).get("content", "")
+    if not assistant_message:
+        logger.warning("Empty assistant message from model %s", request.model)
+    return fast_json({"assistant_reply": assistant_message}, response)
\ No newline at end of file
@@ -1,26 +1,45 @@
 """Module to interact with Albert Api Services"""
-import os
+import json
 
+from typing import Callable, Optional
 from urllib.parse import quote
 import httpx
 from dotenv import load_dotenv
 from fastapi import HTTPException
+from app.functions.login_function import ALBERT_API_BASE_URL, get_timeout
+from app.services.hedging import hedger
+from app.services.metrics import record_usage
+from app.services.multipart import MultipartFileStream
+from app.services.passthrough import RawJSON
+from app.services.upstream import send_upstream
 
 
 load_dotenv()
 
 
-ALBERT_API_BASE_URL = os.getenv("ALBERT_API_BASE_URL")
-
-async def fetch_models(client: httpx.AsyncClient):
+async def fetch_models(client: httpx.AsyncClient) -> RawJSON:
     """Fetches the list of models from the Albert API.
 
     Returns:
-        _type_: _description_
+        RawJSON: The upstream body, parsed on demand.
     """
-    response = await client.get(f"{ALBERT_API_BASE_URL}/models")
+    response = await hedger.run("models", lambda: send_upstream(
+        client, "GET", f"{ALBERT_API_BASE_URL}/models", timeout=get_timeout("catalog")
+    ))
     response.raise_for_status()
-    return response.json()
+    return RawJSON.from_response(response)
+
+async def fetch_collections(client: httpx.AsyncClient) -> RawJSON:
+    """Fetches the list of collections from the Albert API.
+
+    Returns:
+        RawJSON: The upstream body, parsed on demand.
+    """
+    response = await hedger.run("collections", lambda: send_upstream(
+        client, "GET", f"{ALBERT_API_BASE_URL}/collections", timeout=get_timeout("catalog")
+    ))
+    response.raise_for_status()
+    return RawJSON.from_response(response)
 
 async def fetch_model_by_id(model_id: str, client: httpx.AsyncClient):
     """_summary_
@@ -32,11 +51,12 @@ async def fetch_model_by_id(model_id: str, client: httpx.AsyncClient):
         _type_: _description_
     """
     encoded_model_id = quote(model_id)
-    print(encoded_model_id)
     url = f"{ALBERT_API_BASE_URL}/models/{encoded_model_id}"
 
     try:
-        response = await client.get(url)
+        response = await hedger.run(
+            "model", lambda: send_upstream(client, "GET", url, timeout=get_timeout("catalog"))
+        )
         response.raise_for_status()
     except httpx.RequestError as e:
         raise HTTPException(
@@ -51,3 +71,209 @@ async def fetch_model_by_id(model_id: str, client: httpx.AsyncClient):
 
     model_data = response.json()
     return model_data
+
+
+async def post_chat_completion(payload: dict, client: httpx.AsyncClient, hedge: bool = False):
+    """Forwards a chat completion request to the Albert API.
+
+    Args:
+        payload (dict): The ChatRequest dump sent upstream.
+        client (httpx.AsyncClient): The shared Albert client.
+        hedge (bool): Allow a hedged second call, for deterministic requests.
+
+    Raises:
+        HTTPException: If the upstream cannot be reached or answers an error.
+
+    Returns:
+        dict: The upstream completion.
+    """
+    try:
+        response = await hedger.run("chat", lambda: send_upstream(
+            client,
+            "POST",
+            f"{ALBERT_API_BASE_URL}/chat/completions",
+            model=payload.get("model"),
+            json=payload,
+            timeout=get_timeout("chat"),
+        ), enabled=hedge)
+        response.raise_for_status()
+    except httpx.RequestError as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Request to origin API failed: {e}"
+        ) from e
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(
+            status_code=response.status_code,
+            detail=f"Error response from origin API: {e.response.text}"
+        ) from e
+
+    completion = response.json()
+    record_usage(payload.get("model"), completion.get("usage"))
+    return completion
+
+async def post_completion(payload: dict, client: httpx.AsyncClient, hedge: bool = False):
+    """Forwards a text completion request to the Albert API.
+
+    Args:
+        payload (dict): The CompletionRequest dump sent upstream.
+        client (httpx.AsyncClient): The shared Albert client.
+        hedge (bool): Allow a hedged second call, for deterministic requests.
+
+    Raises:
+        HTTPException: If the upstream cannot be reached or answers an error.
+
+    Returns:
+        dict: The upstream completion.
+    """
+    try:
+        response = await hedger.run("completions", lambda: send_upstream(
+            client,
+            "POST",
+            f"{ALBERT_API_BASE_URL}/completions",
+            model=payload.get("model"),
+            json=payload,
+            timeout=get_timeout("completions"),
+        ), enabled=hedge)
+        response.raise_for_status()
+    except httpx.RequestError as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Request to origin API failed: {e}"
+        ) from e
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(
+            status_code=response.status_code,
+            detail=f"Error response from origin API: {e.response.text}"
+        ) from e
+
+    completion = response.json()
+    record_usage(payload.get("model"), completion.get("usage"))
+    return completion
+
+async def post_transcription(file: tuple, data: dict, client: httpx.AsyncClient):
+    """Sends an audio file to the Albert API for transcription.
+
+    Args:
+        file (tuple): (filename, content or file object, content type).
+        data (dict): Form fields sent along with the file.
+        client (httpx.AsyncClient): The shared Albert client.
+
+    Raises:
+        HTTPException: If the upstream cannot be reached or answers an error.
+
+    Returns:
+        dict: The upstream transcription.
+    """
+    try:
+        response = await send_upstream(
+            client,
+            "POST",
+            f"{ALBERT_API_BASE_URL}/audio/transcriptions",
+            model=data.get("model"),
+            files={"file": file},
+            data=data,
+            timeout=get_timeout("transcription"),
+        )
+        response.raise_for_status()
+    except httpx.RequestError as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Request to external API failed: {e}",
+        ) from e
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(
+            status_code=response.status_code,
+            detail=f"Error response from external API: {e.response.text}",
+        ) from e
+
+    return response.json()
+
+
+def build_file_request(
+    collection: str,
+    chunk_size: int = 512,
+    chunk_overlap: int = 0,
+    length_function: str = "len",
+    is_separator_regex: bool = False,
+    separators: str = "\n\n,\n,. , ",
+    chunk_min_size: int = 0,
+) -> dict:
+    """Builds the "request" part sent along with a file to the /files endpoint.
+
+    Args:
+        collection (str): Target collection id.
+        separators (str): Comma separated list of separators.
+
+    Returns:
+        dict: Collection and chunker configuration.
+    """
+    separators_list = [sep.strip() for sep in separators.split(",") if sep.strip()]
+
+    return {
+        "collection": collection,
+        "chunker": {
+            "name": "LangchainRecursiveCharacterTextSplitter",
+            "args": {
+                "chunk_size": chunk_size,
+                "chunk_overlap": chunk_overlap,
+                "length_function": length_function,
+                "is_separator_regex": is_separator_regex,
+                "separators": separators_list,
+                "chunk_min_size": chunk_min_size,
+            },
+        },
+    }
+
+async def post_file(fileobj, filename: str, content_type: Optional[str], request_payload: dict,
+                    client: httpx.AsyncClient, size: Optional[int] = None,
+                    on_progress: Optional[Callable[[int, int], None]] = None):
+    """Streams a file to the Albert API /files endpoint.
+
+    Args:
+        fileobj (BinaryIO): Seekable file holding the document.
+        filename (str): Name announced to the upstream.
+        content_type (Optional[str]): Media type of the document.
+        request_payload (dict): Output of build_file_request.
+        client (httpx.AsyncClient): The shared Albert client.
+        size (Optional[int]): Size of the file when already known.
+        on_progress (Optional[Callable[[int, int], None]]): Called with
+            (bytes sent, file size) while the file is streamed.
+
+    Raises:
+        HTTPException: If the upstream cannot be reached or answers an error.
+
+    Returns:
+        dict: The upstream response.
+    """
+    body = MultipartFileStream(
+        fileobj,
+        filename,
+        content_type,
+        fields={"request": (json.dumps(request_payload), "application/json")},
+        size=size,
+        on_progress=on_progress,
+    )
+
+    try:
+        response = await send_upstream(
+            client,
+            "POST",
+            f"{ALBERT_API_BASE_URL}/files",
+            content=body,
+            headers=body.headers,
+            timeout=get_timeout("upload"),
+        )
+        response.raise_for_status()
+    except httpx.RequestError as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Request to external API failed: {e}",
+        ) from e
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(
+            status_code=response.status_code,
+            detail=f"Error response from external API: {e.response.text}",
+        ) from e
+
+    return response.json()
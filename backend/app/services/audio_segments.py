@@ -0,0 +1,249 @@
+"""Split long WAV recordings and transcribe the segments concurrently"""
+import asyncio
+import io
+import math
+import os
+import wave
+from typing import BinaryIO, Callable, List, NamedTuple, Optional
+
+import httpx
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from app.services.app_services import post_transcription
+
+
+load_dotenv()
+
+TRANSCRIPTION_SEGMENT_CONCURRENCY = int(os.getenv("TRANSCRIPTION_SEGMENT_CONCURRENCY", "4"))
+# Shortest distance between the starts of two windows.
+TRANSCRIPTION_MIN_STEP_SECONDS = float(os.getenv("TRANSCRIPTION_MIN_STEP_SECONDS", "1"))
+# Windows a recording may be cut into.
+TRANSCRIPTION_MAX_SEGMENTS = int(os.getenv("TRANSCRIPTION_MAX_SEGMENTS", "500"))
+
+
+class AudioWindow(NamedTuple):
+    """A window of the recording, bounds in frames and seconds."""
+    index: int
+    start_frame: int
+    end_frame: int
+    start: float
+    end: float
+
+
+class WavSegmenter:
+    """Cut a WAV file into overlapping windows, read lazily one at a time.
+
+    Args:
+        fileobj (BinaryIO): Seekable file holding a PCM WAV recording.
+        segment_seconds (float): Length of each window.
+        overlap_seconds (float): Overlap between consecutive windows.
+
+    Raises:
+        HTTPException: If the file is not a readable WAV file, the window
+            settings are invalid or they give more than TRANSCRIPTION_MAX_SEGMENTS
+            windows.
+    """
+
+    def __init__(self, fileobj: BinaryIO, segment_seconds: float, overlap_seconds: float):
+        if segment_seconds <= 0 or not 0 <= overlap_seconds < segment_seconds:
+            raise HTTPException(
+                status_code=400,
+                detail="segment_seconds must be positive and larger than overlap_seconds",
+            )
+        try:
+            fileobj.seek(0)
+            self._reader = wave.open(fileobj, "rb")
+        except (wave.Error, EOFError) as e:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Segmented transcription requires a PCM WAV file: {e}",
+            ) from e
+
+        self.params = self._reader.getparams()
+        self.framerate = self.params.framerate
+        self.duration = self.params.nframes / self.framerate
+        self.windows = self._plan(segment_seconds, overlap_seconds)
+        self._lock = asyncio.Lock()
+
+    def _plan(self, segment_seconds: float, overlap_seconds: float) -> List[AudioWindow]:
+        total = self.params.nframes
+        length = int(segment_seconds * self.framerate)
+        step = length - int(overlap_seconds * self.framerate)
+        min_step = max(1, int(TRANSCRIPTION_MIN_STEP_SECONDS * self.framerate))
+        if length < 1 or step < min_step:
+            raise HTTPException(
+                status_code=400,
+                detail=f"segment_seconds minus overlap_seconds must be at least {TRANSCRIPTION_MIN_STEP_SECONDS} s",
+            )
+        count = 1 + max(0, math.ceil((total - length) / step))
+        if count > TRANSCRIPTION_MAX_SEGMENTS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"{count} segments requested, at most {TRANSCRIPTION_MAX_SEGMENTS} allowed: "
+                       "raise segment_seconds",
+            )
+        windows = []
+        start = 0
+        while True:
+            end = min(start + length, total)
+            windows.append(AudioWindow(len(windows), start, end, start / self.framerate, end / self.framerate))
+            if end >= total:
+                return windows
+            start += step
+
+    def _read_sync(self, window: AudioWindow) -> bytes:
+        self._reader.setpos(window.start_frame)
+        frames = self._reader.readframes(window.end_frame - window.start_frame)
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as writer:
+            writer.setparams(self.params)
+            writer.writeframes(frames)
+        return buffer.getvalue()
+
+    async def read(self, window: AudioWindow) -> bytes:
+        """Return one window as a standalone WAV file."""
+        async with self._lock:
+            return await run_in_threadpool(self._read_sync, window)
+
+
+def _shift(items: Optional[list], offset: float, keep_from: float, keep_until: float) -> list:
+    shifted = []
+    for item in items or []:
+        start = item.get("start", 0.0) + offset
+        if keep_from <= start < keep_until:
+            shifted.append({**item, "start": start, "end": item.get("end", 0.0) + offset})
+    return shifted
+
+
+def stitch_transcriptions(windows: List[AudioWindow], results: List[Optional[dict]],
+                          overlap_seconds: float) -> dict:
+    """Merge per-window transcriptions into one, with offset-corrected timestamps.
+
+    Timed segments and words found in an overlap are kept from one window only:
+    the cut lies in the middle of the overlap. Without timed segments the
+    whole text of every window is kept, so the speech of each overlap is
+    repeated; transcribe_wav_segments asks for verbose_json to avoid that.
+
+    Args:
+        windows (List[AudioWindow]): The windows that were transcribed.
+        results (List[Optional[dict]]): Upstream result per window, None if failed.
+        overlap_seconds (float): Overlap between consecutive windows.
+
+    Returns:
+        dict: {"text", "segments", "words"}, timed lists empty when not returned upstream.
+    """
+    texts, segments, words = [], [], []
+    half_overlap = overlap_seconds / 2
+    for window, result in zip(windows, results):
+        if result is None:
+            continue
+        keep_from = window.start + half_overlap if window.index > 0 else 0.0
+        keep_until = window.end - half_overlap if window.index < len(windows) - 1 else float("inf")
+        segments.extend(_shift(result.get("segments"), window.start, keep_from, keep_until))
+        words.extend(_shift(result.get("words"), window.start, keep_from, keep_until))
+        texts.append(result.get("text", "").strip())
+
+    for i, segment in enumerate(segments):
+        segment["id"] = i
+    if segments:
+        text = " ".join(segment.get("text", "").strip() for segment in segments)
+    else:
+        text = " ".join(text for text in texts if text)
+    return {"text": text, "segments": segments, "words": words}
+
+
+async def transcribe_wav_segments(
+    fileobj: BinaryIO,
+    filename: str,
+    data: dict,
+    client: httpx.AsyncClient,
+    segment_seconds: float,
+    overlap_seconds: float,
+    concurrency: int = TRANSCRIPTION_SEGMENT_CONCURRENCY,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> dict:
+    """Transcribe a long WAV recording as concurrent overlapping segments.
+
+    Args:
+        fileobj (BinaryIO): Seekable file holding the recording.
+        filename (str): Name of the uploaded file.
+        data (dict): Form fields forwarded with every segment.
+        client (httpx.AsyncClient): The shared Albert client.
+        segment_seconds (float): Length of each segment.
+        overlap_seconds (float): Overlap between consecutive segments.
+        concurrency (int): Maximum number of segments transcribed at once.
+        on_progress (Optional[Callable[[int, int], None]]): Called with
+            (segments done, segment count) as segments complete.
+
+    Segments are always transcribed as verbose_json, so that the speech of
+    each overlap is kept once; with the json format only "text",
+    "duration" and "failed_segments" are returned.
+
+    Raises:
+        HTTPException: If the input is invalid or every segment failed.
+
+    Returns:
+        dict: Stitched transcription with "duration" and "failed_segments".
+    """
+    response_format = data.get("response_format")
+    if response_format not in ("json", "verbose_json"):
+        raise HTTPException(
+            status_code=400,
+            detail="Segmented transcription supports the json and verbose_json formats only",
+        )
+
+    segmenter = WavSegmenter(fileobj, segment_seconds, overlap_seconds)
+    # Timestamps are needed to cut the overlaps, whatever format is returned.
+    data = {**data, "response_format": "verbose_json"}
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    stem = os.path.splitext(filename or "audio")[0]
+
+    done = 0
+
+    async def transcribe(window: AudioWindow) -> dict:
+        nonlocal done
+        async with semaphore:
+            content = await segmenter.read(window)
+            try:
+                return await post_transcription(
+                    (f"{stem}.part{window.index}.wav", content, "audio/wav"), data, client
+                )
+            finally:
+                done += 1
+                if on_progress is not None:
+                    on_progress(done, len(segmenter.windows))
+
+    outcomes = await asyncio.gather(
+        *(transcribe(window) for window in segmenter.windows), return_exceptions=True
+    )
+
+    results, failed = [], []
+    for window, outcome in zip(segmenter.windows, outcomes):
+        if isinstance(outcome, BaseException):
+            if not isinstance(outcome, HTTPException):
+                raise outcome
+            results.append(None)
+            failed.append({
+                "index": window.index,
+                "start": window.start,
+                "end": window.end,
+                "status_code": outcome.status_code,
+                "error": outcome.detail,
+            })
+        else:
+            results.append(outcome)
+
+    if len(failed) == len(segmenter.windows):
+        raise HTTPException(
+            status_code=502,
+            detail={"message": "Every audio segment failed", "failed_segments": failed},
+        )
+
+    transcription = stitch_transcriptions(segmenter.windows, results, overlap_seconds)
+    if response_format == "json":
+        transcription = {"text": transcription["text"]}
+    transcription["duration"] = segmenter.duration
+    transcription["failed_segments"] = failed
+    return transcription
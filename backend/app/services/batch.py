@@ -0,0 +1,121 @@
+"""Run many independent upstream calls with bounded concurrency"""
+import asyncio
+import json
+import logging
+import os
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Type
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from pydantic import BaseModel, ValidationError
+
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "10000"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "64"))
+
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/jsonl", "application/json-lines")
+
+
+def parse_batch_body(body: bytes, content_type: str, model: Type[BaseModel]) -> List[Any]:
+    """Parse a JSON array or a JSONL body into request models.
+
+    Items that fail validation are kept as HTTPException so that one bad
+    line does not reject the whole batch.
+
+    Args:
+        body (bytes): Raw request body.
+        content_type (str): Content-Type of the request.
+        model (Type[BaseModel]): Model validating each item.
+
+    Raises:
+        HTTPException: If the body as a whole cannot be parsed.
+
+    Returns:
+        List[Any]: One model instance or HTTPException per item.
+    """
+    try:
+        if content_type.split(";")[0].strip() in NDJSON_MEDIA_TYPES:
+            raw_items = [json.loads(line) for line in body.splitlines() if line.strip()]
+        else:
+            raw_items = json.loads(body)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid batch body: {e}") from e
+
+    if not isinstance(raw_items, list):
+        raise HTTPException(status_code=400, detail="Batch body must be a JSON array or JSON lines")
+    if len(raw_items) > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(raw_items)} items, maximum is {BATCH_MAX_ITEMS}",
+        )
+
+    items = []
+    for raw_item in raw_items:
+        try:
+            items.append(model.model_validate(raw_item))
+        except ValidationError as e:
+            items.append(HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False)))
+    return items
+
+
+async def _run_item(index: int, item: Any, call: Callable[[Any], Awaitable[Any]],
+                    semaphore: asyncio.Semaphore) -> dict:
+    if isinstance(item, HTTPException):
+        return {"index": index, "status_code": item.status_code, "error": item.detail}
+    async with semaphore:
+        try:
+            return {"index": index, "status_code": 200, "response": await call(item)}
+        except HTTPException as e:
+            return {"index": index, "status_code": e.status_code, "error": e.detail}
+        except Exception as e:  # pylint: disable=broad-except
+            logger.exception("Batch item %d failed", index)
+            return {"index": index, "status_code": 502, "error": f"Upstream call failed: {e}"}
+
+
+async def iter_batch(items: List[Any], call: Callable[[Any], Awaitable[Any]],
+                     concurrency: int = BATCH_CONCURRENCY) -> AsyncIterator[dict]:
+    """Yield per-item results in completion order.
+
+    Pending calls are cancelled if the consumer stops iterating early, e.g.
+    when the client disconnects from a streamed batch. An HTTPException
+    fails its item with its status; any other error fails it with 502.
+
+    Args:
+        items (List[Any]): Output of parse_batch_body.
+        call (Callable[[Any], Awaitable[Any]]): Forwards one item upstream.
+        concurrency (int): Maximum number of calls in flight.
+
+    Yields:
+        dict: {"index", "status_code", "response"} or {"index", "status_code", "error"}.
+    """
+    semaphore = asyncio.Semaphore(max(1, min(concurrency, BATCH_MAX_CONCURRENCY)))
+    tasks = [asyncio.create_task(_run_item(i, item, call, semaphore)) for i, item in enumerate(items)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def run_batch(items: List[Any], call: Callable[[Any], Awaitable[Any]],
+                    concurrency: int = BATCH_CONCURRENCY) -> List[dict]:
+    """Run a batch and return per-item results in input order.
+
+    Args:
+        items (List[Any]): Output of parse_batch_body.
+        call (Callable[[Any], Awaitable[Any]]): Forwards one item upstream.
+        concurrency (int): Maximum number of calls in flight.
+
+    Returns:
+        List[dict]: One result per item, ordered like the input.
+    """
+    results: List[dict] = [{}] * len(items)
+    async for result in iter_batch(items, call, concurrency):
+        results[result["index"]] = result
+    return results
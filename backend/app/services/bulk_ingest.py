@@ -0,0 +1,186 @@
+"""Ingest many files or whole archives into a collection in parallel"""
+import asyncio
+import mimetypes
+import os
+import posixpath
+import tarfile
+import tempfile
+import time
+import zipfile
+from typing import BinaryIO, Iterator, List, NamedTuple, Optional
+
+import httpx
+from dotenv import load_dotenv
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from app.services.app_services import post_file
+from app.services.multipart import UPLOAD_CHUNK_SIZE, UPLOAD_MAX_BYTES, file_size
+
+
+load_dotenv()
+
+BULK_UPLOAD_CONCURRENCY = int(os.getenv("BULK_UPLOAD_CONCURRENCY", "8"))
+# Extracted entries larger than this spill from memory to a temporary file.
+BULK_SPOOL_MAX_MEMORY = int(os.getenv("BULK_SPOOL_MAX_MEMORY", str(1024 * 1024)))
+
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+
+class ArchiveEntry(NamedTuple):
+    """A regular file extracted from an archive, or the reason it was skipped."""
+    name: str
+    fileobj: Optional[BinaryIO]
+    size: int
+    error: Optional[str] = None
+
+
+def is_archive(filename: Optional[str]) -> bool:
+    """Tell whether an uploaded file should be unpacked."""
+    return bool(filename) and filename.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def _is_ignored(name: str) -> bool:
+    parts = name.split("/")
+    return "__MACOSX" in parts or posixpath.basename(name).startswith(".")
+
+
+def _spool(source: BinaryIO, name: str) -> ArchiveEntry:
+    target = tempfile.SpooledTemporaryFile(max_size=BULK_SPOOL_MAX_MEMORY)
+    size = 0
+    while chunk := source.read(UPLOAD_CHUNK_SIZE):
+        size += len(chunk)
+        if size > UPLOAD_MAX_BYTES:
+            target.close()
+            return ArchiveEntry(name, None, size, f"File too large, maximum is {UPLOAD_MAX_BYTES} bytes")
+        target.write(chunk)
+    target.seek(0)
+    return ArchiveEntry(name, target, size)
+
+
+def iter_archive_entries(fileobj: BinaryIO, filename: str) -> Iterator[ArchiveEntry]:
+    """Yield the regular files of a zip or tar archive one at a time.
+
+    Each entry is copied to its own spooled temporary file while the archive
+    is read as a stream, so only the entries being forwarded are held at once.
+    Entries larger than UPLOAD_MAX_BYTES are reported without being kept.
+
+    Args:
+        fileobj (BinaryIO): Seekable file holding the archive.
+        filename (str): Name of the archive, used to pick the format.
+
+    Yields:
+        ArchiveEntry: One entry per regular file.
+    """
+    fileobj.seek(0)
+    if filename.lower().endswith(".zip"):
+        with zipfile.ZipFile(fileobj) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or _is_ignored(info.filename):
+                    continue
+                with archive.open(info) as source:
+                    yield _spool(source, info.filename)
+    else:
+        with tarfile.open(fileobj=fileobj, mode="r|*") as archive:
+            for member in archive:
+                if not member.isfile() or _is_ignored(member.name):
+                    continue
+                yield _spool(archive.extractfile(member), member.name)
+
+
+async def ingest_files(
+    uploads: List[UploadFile],
+    request_payload: dict,
+    client: httpx.AsyncClient,
+    concurrency: int = BULK_UPLOAD_CONCURRENCY,
+) -> dict:
+    """Forward uploaded files and archive entries to /files in parallel.
+
+    At most `concurrency` files are extracted or in flight at any time, which
+    also bounds the temporary storage used by archive entries.
+
+    Args:
+        uploads (List[UploadFile]): Plain files and zip/tar archives.
+        request_payload (dict): Output of build_file_request, shared by all files.
+        client (httpx.AsyncClient): The shared Albert client.
+        concurrency (int): Maximum number of files in flight.
+
+    Returns:
+        dict: {"results": [...], "stats": {...}} with one result per file.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    tasks: List[asyncio.Task] = []
+    started = time.perf_counter()
+
+    async def forward(name: str, fileobj: Optional[BinaryIO], size: int,
+                      error: Optional[str] = None, owned: bool = False) -> dict:
+        result = {"filename": name, "size": size}
+        file_started = time.perf_counter()
+        try:
+            if error is not None:
+                raise HTTPException(status_code=413 if fileobj is None else 400, detail=error)
+            if size > UPLOAD_MAX_BYTES:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"File too large, maximum is {UPLOAD_MAX_BYTES} bytes",
+                )
+            content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+            result["response"] = await post_file(
+                fileobj, posixpath.basename(name), content_type, request_payload, client, size=size
+            )
+            result["status_code"] = 200
+        except HTTPException as e:
+            result["status_code"] = e.status_code
+            result["error"] = e.detail
+        finally:
+            result["elapsed_seconds"] = time.perf_counter() - file_started
+            if owned and fileobj is not None:
+                fileobj.close()
+            semaphore.release()
+        return result
+
+    async def schedule(*args, **kwargs) -> None:
+        tasks.append(asyncio.create_task(forward(*args, **kwargs)))
+
+    try:
+        for upload in uploads:
+            if not is_archive(upload.filename):
+                await semaphore.acquire()
+                size = upload.size if upload.size is not None else file_size(upload.file)
+                await schedule(upload.filename, upload.file, size)
+                continue
+
+            entries = iter_archive_entries(upload.file, upload.filename)
+            try:
+                while True:
+                    await semaphore.acquire()
+                    entry = await run_in_threadpool(next, entries, None)
+                    if entry is None:
+                        semaphore.release()
+                        break
+                    await schedule(entry.name, entry.fileobj, entry.size, entry.error, owned=True)
+            except (zipfile.BadZipFile, tarfile.TarError, EOFError, OSError) as e:
+                await schedule(upload.filename, upload.file, 0, f"Unreadable archive: {e}")
+            finally:
+                entries.close()
+
+        results = await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    elapsed = time.perf_counter() - started
+    total_bytes = sum(result["size"] for result in results if result["status_code"] == 200)
+    failed = sum(1 for result in results if result["status_code"] != 200)
+    return {
+        "results": results,
+        "stats": {
+            "files": len(results),
+            "succeeded": len(results) - failed,
+            "failed": failed,
+            "bytes": total_bytes,
+            "elapsed_seconds": elapsed,
+            "files_per_second": len(results) / elapsed if elapsed else 0.0,
+            "bytes_per_second": total_bytes / elapsed if elapsed else 0.0,
+        },
+    }
@@ -0,0 +1,173 @@
+"""Stale-while-revalidate cache for the Albert model and collection catalogs"""
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", "60"))
+CATALOG_CACHE_STALE_TTL = float(os.getenv("CATALOG_CACHE_STALE_TTL", "300"))
+# Seconds a failed load is remembered and raised again without calling upstream.
+CATALOG_CACHE_ERROR_TTL = float(os.getenv("CATALOG_CACHE_ERROR_TTL", "5"))
+
+Fetcher = Callable[[], Awaitable[Any]]
+
+
+class CatalogCache:
+    """In-process TTL cache with single-flight loads and background refresh.
+
+    An entry younger than ``ttl`` is served as is. Up to ``ttl + stale_ttl``
+    it is still served, but a refresh is started in the background. Older
+    entries are reloaded while the caller waits. Concurrent loads of the same
+    key share a single upstream call. A failed load is remembered for
+    ``error_ttl``: meanwhile callers get the same error at once, or the
+    stale value if there is one, without another upstream call.
+    """
+
+    def __init__(self, ttl: float = CATALOG_CACHE_TTL, stale_ttl: float = CATALOG_CACHE_STALE_TTL,
+                 error_ttl: float = CATALOG_CACHE_ERROR_TTL):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.error_ttl = error_ttl
+        self._entries: Dict[str, tuple] = {}
+        self._failures: Dict[str, tuple] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._generation = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.errors = 0
+        self.cached_errors = 0
+
+    async def get(self, key: str, fetch: Fetcher) -> Any:
+        """Return the cached value for key, loading it with fetch when needed.
+
+        Args:
+            key (str): Cache key, e.g. "models" or "model:<id>".
+            fetch (Fetcher): Coroutine factory performing the upstream call.
+
+        Raises:
+            Exception: What the last load raised, while it is remembered.
+
+        Returns:
+            Any: The cached or freshly fetched value.
+        """
+        now = time.monotonic()
+        failure = self._failures.get(key)
+        failing = failure is not None and now - failure[1] < self.error_ttl
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, stored_at = entry
+            age = now - stored_at
+            if age < self.ttl:
+                self.hits += 1
+                return value
+            if age < self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                if key not in self._inflight and not failing:
+                    self.refreshes += 1
+                    self._load(key, fetch).add_done_callback(self._log_refresh_error)
+                return value
+
+        if failing:
+            self.cached_errors += 1
+            raise failure[0].with_traceback(None)
+        self.misses += 1
+        return await asyncio.shield(self._load(key, fetch))
+
+    def failing(self, key: str) -> bool:
+        """Tell whether the last load of a key failed less than error_ttl ago."""
+        failure = self._failures.get(key)
+        return failure is not None and time.monotonic() - failure[1] < self.error_ttl
+
+    def unavailable(self, key: str) -> bool:
+        """Tell whether get() would raise at once: the key is failing and
+        has no value, even stale, to serve instead."""
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[1] < self.ttl + self.stale_ttl:
+            return False
+        return self.failing(key)
+
+    def invalidate(self, key: Optional[str] = None) -> int:
+        """Drop one entry, or every entry when key is None.
+
+        Loads already in flight are not stored once they complete.
+
+        Args:
+            key (Optional[str]): Key to drop, or None for all.
+
+        Returns:
+            int: Number of entries removed.
+        """
+        self._generation += 1
+        if key is None:
+            removed = len(self._entries)
+            self._entries.clear()
+            self._failures.clear()
+            return removed
+        self._failures.pop(key, None)
+        return int(self._entries.pop(key, None) is not None)
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the cached keys.
+
+        Returns:
+            dict: Counters, configuration and keys.
+        """
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "errors": self.errors,
+            "cached_errors": self.cached_errors,
+            "hit_ratio": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+            "ttl": self.ttl,
+            "stale_ttl": self.stale_ttl,
+            "error_ttl": self.error_ttl,
+            "keys": sorted(self._entries),
+            "failing_keys": sorted(key for key in list(self._failures) if self.failing(key)),
+        }
+
+    def _load(self, key: str, fetch: Fetcher) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(key, fetch))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return task
+
+    async def _fetch(self, key: str, fetch: Fetcher) -> Any:
+        generation = self._generation
+        try:
+            value = await fetch()
+        except Exception as e:
+            self.errors += 1
+            if generation == self._generation and self.error_ttl > 0:
+                now = time.monotonic()
+                self._failures = {
+                    failed: failure for failed, failure in self._failures.items() if now - failure[1] < self.error_ttl
+                }
+                self._failures[key] = (e, now)
+            raise
+        self._failures.pop(key, None)
+        if generation == self._generation:
+            self._entries[key] = (value, time.monotonic())
+        return value
+
+    @staticmethod
+    def _log_refresh_error(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Background catalog refresh failed: %s", task.exception())
+
+
+catalog_cache = CatalogCache()
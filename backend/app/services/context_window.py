@@ -0,0 +1,156 @@
+"""Fit chat messages into the context window of the target model"""
+import logging
+import os
+import re
+from typing import List, NamedTuple, Tuple
+
+import httpx
+from dotenv import load_dotenv
+from fastapi import HTTPException, Response
+from pydantic import BaseModel
+
+from app.services.app_services import fetch_model_by_id
+from app.services.catalog_cache import catalog_cache
+
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_FIT_ENABLED = os.getenv("CONTEXT_FIT_ENABLED", "true").lower() in ("1", "true", "yes")
+# Headroom kept for the answer when the request does not set max_tokens.
+CONTEXT_DEFAULT_COMPLETION_TOKENS = int(os.getenv("CONTEXT_DEFAULT_COMPLETION_TOKENS", "256"))
+# Tokens added per message for the role and separators of the chat template.
+CONTEXT_MESSAGE_OVERHEAD = int(os.getenv("CONTEXT_MESSAGE_OVERHEAD", "4"))
+
+TRIMMED_TOKENS_HEADER = "X-Context-Trimmed-Tokens"
+DROPPED_MESSAGES_HEADER = "X-Context-Dropped-Messages"
+
+_PIECE = re.compile(r"\w+|[^\w\s]")
+
+
+def count_tokens(text: str) -> int:
+    """Approximate the token count of a text without a model tokenizer.
+
+    Counts one token per punctuation mark and one per started group of four
+    characters of each word, which stays close to BPE tokenizers on prose.
+
+    Args:
+        text (str): Text to count.
+
+    Returns:
+        int: Estimated tokens.
+    """
+    return sum((len(piece) + 3) // 4 for piece in _PIECE.findall(text))
+
+
+def _tail(text: str, tokens: int) -> str:
+    """Keep roughly the last `tokens` tokens of a text."""
+    pieces = list(_PIECE.finditer(text))
+    kept = 0
+    for index in range(len(pieces) - 1, -1, -1):
+        kept += (len(pieces[index].group()) + 3) // 4
+        if kept > tokens:
+            return text[pieces[index + 1].start():] if index + 1 < len(pieces) else ""
+    return text
+
+
+class FitReport(NamedTuple):
+    """What fitting removed from a request."""
+    trimmed_tokens: int
+    dropped_messages: int
+
+    def apply(self, response: Response) -> None:
+        """Report the removal in the response headers."""
+        response.headers[TRIMMED_TOKENS_HEADER] = str(self.trimmed_tokens)
+        response.headers[DROPPED_MESSAGES_HEADER] = str(self.dropped_messages)
+
+
+def fit_messages(messages: List[BaseModel], budget: int) -> Tuple[List[BaseModel], FitReport]:
+    """Drop the oldest non-system messages until the rest fits in `budget` tokens.
+
+    System messages and the last message are always kept. If they alone do
+    not fit, the last message is cut from its start, keeping its end.
+
+    Args:
+        messages (List[BaseModel]): Chat messages with `role` and `content`.
+        budget (int): Tokens available for the prompt.
+
+    Raises:
+        HTTPException: 400 if the system messages alone exceed the budget.
+
+    Returns:
+        Tuple[List[BaseModel], FitReport]: Kept messages and what was removed.
+    """
+    sizes = [count_tokens(message.content) + CONTEXT_MESSAGE_OVERHEAD for message in messages]
+    total = sum(sizes)
+    if total <= budget or not messages:
+        return messages, FitReport(0, 0)
+
+    last = len(messages) - 1
+    dropped = set()
+    for index, message in enumerate(messages[:-1]):
+        if total <= budget:
+            break
+        if message.role != "system":
+            dropped.add(index)
+            total -= sizes[index]
+    trimmed = sum(sizes[index] for index in dropped)
+    kept = [message for index, message in enumerate(messages) if index not in dropped]
+
+    if total > budget:
+        room = sizes[last] - (total - budget) - CONTEXT_MESSAGE_OVERHEAD
+        if room <= 0 or messages[last].role == "system":
+            raise HTTPException(
+                status_code=400,
+                detail=f"System prompt and last message need {total} tokens, the context allows {budget}",
+            )
+        content = _tail(messages[last].content, room)
+        trimmed += sizes[last] - CONTEXT_MESSAGE_OVERHEAD - count_tokens(content)
+        kept[-1] = messages[last].model_copy(update={"content": content})
+
+    return kept, FitReport(trimmed, len(dropped))
+
+
+async def fit_to_context(request: BaseModel, client: httpx.AsyncClient) -> Tuple[BaseModel, FitReport]:
+    """Fit a chat request into its model's max_context_length.
+
+    The context length comes from the cached model catalog. Requests for
+    models the catalog does not know, or while their lookup is failing, go
+    through unchanged. max_tokens, or
+    CONTEXT_DEFAULT_COMPLETION_TOKENS when unset, is kept free for the answer.
+
+    Args:
+        request (BaseModel): ChatRequest with `model`, `messages` and `max_tokens`.
+        client (httpx.AsyncClient): The shared Albert client.
+
+    Raises:
+        HTTPException: 400 if the request cannot be made to fit.
+
+    Returns:
+        Tuple[BaseModel, FitReport]: The request to send and what was removed.
+    """
+    key = f"model:{request.model}"
+    if not CONTEXT_FIT_ENABLED or catalog_cache.unavailable(key):
+        return request, FitReport(0, 0)
+    try:
+        model = await catalog_cache.get(key, lambda: fetch_model_by_id(request.model, client=client))
+        max_context_length = int(model["max_context_length"])
+    except (HTTPException, httpx.HTTPError, KeyError, TypeError, ValueError) as e:
+        logger.warning("No context length for model %s, not fitting: %s", request.model, e)
+        return request, FitReport(0, 0)
+
+    if request.max_tokens:
+        headroom = request.max_tokens
+        if headroom >= max_context_length:
+            raise HTTPException(
+                status_code=400,
+                detail=f"max_tokens {headroom} leaves no room for the prompt, "
+                       f"{request.model} has a context of {max_context_length} tokens",
+            )
+    else:
+        headroom = min(CONTEXT_DEFAULT_COMPLETION_TOKENS, max_context_length // 4)
+    messages, report = fit_messages(request.messages, max_context_length - headroom)
+    if report == (0, 0):
+        return request, report
+    return request.model_copy(update={"messages": messages}), report
@@ -0,0 +1,229 @@
+"""Server-side chat histories so clients only send the new turn"""
+import abc
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+from typing import List, Optional
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+
+from app.models.models import ChatRequest, Conversation, ConversationMessage, Message
+
+
+load_dotenv()
+
+CONVERSATION_STORE = os.getenv("CONVERSATION_STORE", "memory")
+CONVERSATION_SQLITE_PATH = os.getenv("CONVERSATION_SQLITE_PATH", "conversations.sqlite3")
+CONVERSATION_MAX_SESSIONS = int(os.getenv("CONVERSATION_MAX_SESSIONS", "10000"))
+# Seconds of inactivity after which a conversation is forgotten.
+CONVERSATION_TTL = float(os.getenv("CONVERSATION_TTL", "86400"))
+# Non-system messages kept per conversation, the oldest go first.
+CONVERSATION_MAX_MESSAGES = int(os.getenv("CONVERSATION_MAX_MESSAGES", "200"))
+
+
+class ConversationStore(abc.ABC):
+    """Interface of conversation persistence backends."""
+
+    @abc.abstractmethod
+    async def save(self, conversation: Conversation) -> None:
+        """Insert or replace a conversation."""
+
+    @abc.abstractmethod
+    async def get(self, conversation_id: str) -> Optional[Conversation]:
+        """Return a live conversation, or None if unknown or expired."""
+
+    @abc.abstractmethod
+    async def delete(self, conversation_id: str) -> bool:
+        """Forget a conversation, False if it was unknown."""
+
+    def close(self) -> None:
+        """Release the resources of the store."""
+
+
+class InMemoryConversationStore(ConversationStore):
+    """Conversations in an LRU dict bounded in size and idle time.
+
+    Args:
+        max_sessions (int): Conversations kept, the least recently used go first.
+        ttl (float): Seconds of inactivity before a conversation expires.
+    """
+
+    def __init__(self, max_sessions: int = CONVERSATION_MAX_SESSIONS, ttl: float = CONVERSATION_TTL):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._conversations: "OrderedDict[str, Conversation]" = OrderedDict()
+
+    async def save(self, conversation: Conversation) -> None:
+        self._conversations[conversation.id] = conversation
+        self._conversations.move_to_end(conversation.id)
+        while len(self._conversations) > self.max_sessions:
+            self._conversations.popitem(last=False)
+
+    async def get(self, conversation_id: str) -> Optional[Conversation]:
+        conversation = self._conversations.get(conversation_id)
+        if conversation is None:
+            return None
+        if conversation.updated_at + self.ttl < time.time():
+            del self._conversations[conversation_id]
+            return None
+        self._conversations.move_to_end(conversation_id)
+        return conversation
+
+    async def delete(self, conversation_id: str) -> bool:
+        return self._conversations.pop(conversation_id, None) is not None
+
+
+class SQLiteConversationStore(ConversationStore):
+    """Conversations persisted in SQLite, pruned by idle time and count.
+
+    Args:
+        path (str): Database file.
+        max_sessions (int): Conversations kept, the least recently updated go first.
+        ttl (float): Seconds of inactivity before a conversation expires.
+    """
+
+    # Saves between two pruning passes.
+    PRUNE_EVERY = 100
+
+    def __init__(self, path: str = CONVERSATION_SQLITE_PATH,
+                 max_sessions: int = CONVERSATION_MAX_SESSIONS, ttl: float = CONVERSATION_TTL):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._saves = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS conversations ("
+                "id TEXT PRIMARY KEY, updated_at REAL NOT NULL, data TEXT NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS conversations_updated_at ON conversations (updated_at)"
+            )
+
+    def _save(self, conversation: Conversation) -> None:
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO conversations (id, updated_at, data) VALUES (?, ?, ?)",
+                (conversation.id, conversation.updated_at, conversation.model_dump_json()),
+            )
+            self._saves += 1
+            if self._saves % self.PRUNE_EVERY == 0:
+                self._connection.execute(
+                    "DELETE FROM conversations WHERE updated_at < ?", (time.time() - self.ttl,)
+                )
+                self._connection.execute(
+                    "DELETE FROM conversations WHERE id NOT IN "
+                    "(SELECT id FROM conversations ORDER BY updated_at DESC LIMIT ?)",
+                    (self.max_sessions,),
+                )
+
+    def _get(self, conversation_id: str) -> Optional[Conversation]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT data FROM conversations WHERE id = ? AND updated_at >= ?",
+                (conversation_id, time.time() - self.ttl),
+            ).fetchone()
+        return Conversation.model_validate_json(row[0]) if row else None
+
+    def _delete(self, conversation_id: str) -> bool:
+        with self._lock, self._connection:
+            cursor = self._connection.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,))
+        return cursor.rowcount > 0
+
+    async def save(self, conversation: Conversation) -> None:
+        await run_in_threadpool(self._save, conversation.model_copy())
+
+    async def get(self, conversation_id: str) -> Optional[Conversation]:
+        return await run_in_threadpool(self._get, conversation_id)
+
+    async def delete(self, conversation_id: str) -> bool:
+        return await run_in_threadpool(self._delete, conversation_id)
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+def create_conversation_store() -> ConversationStore:
+    """Build the store selected by CONVERSATION_STORE ("memory" or "sqlite")."""
+    if CONVERSATION_STORE == "sqlite":
+        return SQLiteConversationStore(CONVERSATION_SQLITE_PATH)
+    return InMemoryConversationStore()
+
+
+def new_conversation(model: str, system: Optional[str], user: Optional[str]) -> Conversation:
+    """Start a conversation, with its system prompt if any."""
+    now = time.time()
+    messages = [Message(role="system", content=system, name="system")] if system else []
+    return Conversation(id=uuid.uuid4().hex, model=model, user=user, messages=messages,
+                        created_at=now, updated_at=now)
+
+
+def make_message(role: str, content: str, name: Optional[str] = None) -> Message:
+    """Message named after its role unless a name is given."""
+    return Message(role=role, content=content, name=name or role)
+
+
+def append_messages(conversation: Conversation, messages: List[Message]) -> None:
+    """Add messages, dropping the oldest non-system ones past CONVERSATION_MAX_MESSAGES."""
+    conversation.messages.extend(messages)
+    conversation.updated_at = time.time()
+    overflow = sum(1 for message in conversation.messages if message.role != "system") - CONVERSATION_MAX_MESSAGES
+    if overflow > 0:
+        kept = []
+        for message in conversation.messages:
+            if overflow > 0 and message.role != "system":
+                overflow -= 1
+                continue
+            kept.append(message)
+        conversation.messages = kept
+
+
+def build_chat_request(conversation: Conversation, turn: ConversationMessage,
+                       pending: List[Message]) -> ChatRequest:
+    """ChatRequest carrying the stored history followed by the pending messages.
+
+    Its `user` is the one the conversation was created for, empty if none:
+    the conversation id would give every new conversation its own quota.
+    """
+    return ChatRequest(
+        messages=conversation.messages + pending,
+        model=conversation.model,
+        user=conversation.user or "",
+        temperature=turn.temperature,
+        max_tokens=turn.max_tokens,
+        top_p=turn.top_p,
+        seed=turn.seed,
+    )
+
+
+_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+def conversation_lock(conversation_id: str) -> asyncio.Lock:
+    """Lock serializing the turns of one conversation."""
+    lock = _locks.get(conversation_id)
+    if lock is None:
+        lock = _locks[conversation_id] = asyncio.Lock()
+    return lock
+
+
+def get_conversation_store(request: Request) -> ConversationStore:
+    """Returns the conversation store created by the application lifespan."""
+    return request.app.state.conversation_store
+
+
+async def load_conversation(store: ConversationStore, conversation_id: str) -> Conversation:
+    """Return a conversation or raise 404."""
+    conversation = await store.get(conversation_id)
+    if conversation is None:
+        raise HTTPException(status_code=404, detail="Conversation not found or expired")
+    return conversation
@@ -0,0 +1,201 @@
+"""Background health probing and circuit breaking for the Albert API"""
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Deque, Optional, Tuple
+
+import httpx
+from dotenv import load_dotenv
+from fastapi import HTTPException, Request
+
+from app.functions.login_function import ALBERT_API_HEALTH_URL, get_timeout
+
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+HEALTH_PROBE_INTERVAL = float(os.getenv("HEALTH_PROBE_INTERVAL", "10"))
+HEALTH_WINDOW_SIZE = int(os.getenv("HEALTH_WINDOW_SIZE", "50"))
+BREAKER_FAILURE_RATIO = float(os.getenv("BREAKER_FAILURE_RATIO", "0.5"))
+BREAKER_MIN_SAMPLES = int(os.getenv("BREAKER_MIN_SAMPLES", "5"))
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "30"))
+BREAKER_HALF_OPEN_CALLS = int(os.getenv("BREAKER_HALF_OPEN_CALLS", "1"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker fed by a rolling window of outcomes.
+
+    The circuit opens when at least BREAKER_FAILURE_RATIO of the last
+    HEALTH_WINDOW_SIZE calls and probes failed. After BREAKER_OPEN_SECONDS,
+    or as soon as a health probe succeeds past that delay, it lets
+    BREAKER_HALF_OPEN_CALLS concurrent trial calls through; one success
+    closes it, one failure opens it again.
+    """
+
+    def __init__(self):
+        self.state = CLOSED
+        self.opened_until = 0.0
+        self.rejected = 0
+        self._window: Deque[Tuple[bool, float]] = deque(maxlen=HEALTH_WINDOW_SIZE)
+        self._trials = 0
+
+    def allow(self) -> bool:
+        """Tell whether a call may be sent upstream now."""
+        if self.state == OPEN:
+            if time.monotonic() < self.opened_until:
+                return False
+            self.state = HALF_OPEN
+            self._trials = 0
+        if self.state == HALF_OPEN:
+            if self._trials >= BREAKER_HALF_OPEN_CALLS:
+                return False
+            self._trials += 1
+        return True
+
+    def check(self) -> None:
+        """Raise 503 with Retry-After when the circuit rejects calls.
+
+        Raises:
+            HTTPException: If the circuit is open.
+        """
+        if not self.allow():
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Albert API is unavailable, circuit breaker is open",
+                headers={"Retry-After": str(int(self.retry_after() + 0.999) or 1)},
+            )
+
+    def release(self) -> None:
+        """Mark a call let through by allow() as finished."""
+        self._trials = max(0, self._trials - 1)
+
+    def retry_after(self) -> float:
+        """Seconds until trial calls are let through again."""
+        return max(0.0, self.opened_until - time.monotonic())
+
+    def record(self, ok: bool, latency: float, probe: bool = False) -> None:
+        """Record the outcome of a call or a health probe.
+
+        Args:
+            ok (bool): False for connection errors, timeouts and 5xx.
+            latency (float): Duration in seconds.
+            probe (bool): True for background health probes.
+        """
+        self._window.append((ok, latency))
+        if self.state == OPEN:
+            if ok and probe and time.monotonic() >= self.opened_until:
+                self.state = HALF_OPEN
+                self._trials = 0
+            return
+        if self.state == HALF_OPEN:
+            if ok:
+                self._close()
+            else:
+                self._open()
+            return
+        failures = sum(1 for sample_ok, _ in self._window if not sample_ok)
+        if len(self._window) >= BREAKER_MIN_SAMPLES and failures / len(self._window) >= BREAKER_FAILURE_RATIO:
+            self._open()
+
+    def _open(self) -> None:
+        if self.state != OPEN:
+            logger.warning("Albert API circuit breaker opened")
+        self.state = OPEN
+        self.opened_until = time.monotonic() + BREAKER_OPEN_SECONDS
+
+    def _close(self) -> None:
+        logger.info("Albert API circuit breaker closed")
+        self.state = CLOSED
+        self._window.clear()
+
+    def stats(self) -> dict:
+        """Breaker state and rolling window statistics."""
+        latencies = sorted(latency for _, latency in self._window)
+        successes = sum(1 for ok, _ in self._window if ok)
+        return {
+            "state": self.state,
+            "retry_after_seconds": self.retry_after() if self.state == OPEN else 0.0,
+            "window_size": len(self._window),
+            "success_ratio": successes / len(self._window) if self._window else None,
+            "latency_avg_ms": sum(latencies) / len(latencies) * 1000 if latencies else None,
+            "latency_p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1000 if latencies else None,
+            "rejected": self.rejected,
+        }
+
+
+class HealthProber:
+    """Probes ALBERT_API_HEALTH_URL on an interval and feeds the breaker.
+
+    Args:
+        client (httpx.AsyncClient): The shared Albert client.
+        breaker (CircuitBreaker): Breaker shared by the forwarding routes.
+        interval (float): Seconds between probes.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, breaker: CircuitBreaker,
+                 interval: float = HEALTH_PROBE_INTERVAL):
+        self.client = client
+        self.breaker = breaker
+        self.interval = interval
+        self.last_ok: Optional[bool] = None
+        self.last_checked: Optional[float] = None
+        self.last_latency: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def probe(self) -> bool:
+        """Run one health probe and record its outcome."""
+        started = time.monotonic()
+        try:
+            response = await self.client.get(ALBERT_API_HEALTH_URL, timeout=get_timeout("health"))
+            ok = response.status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        self.last_latency = time.monotonic() - started
+        self.last_ok = ok
+        self.last_checked = time.time()
+        self.breaker.record(ok, self.last_latency, probe=True)
+        return ok
+
+    async def _run(self) -> None:
+        while True:
+            await self.probe()
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Start probing in the background."""
+        if ALBERT_API_HEALTH_URL:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop probing."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def status(self) -> dict:
+        """Cached health answered without calling the upstream."""
+        up = self.last_ok is not False and self.breaker.state != OPEN
+        return {
+            "api": "ok",
+            "albert_api": "ok" if up else "down",
+            "last_checked": self.last_checked,
+            "last_latency_ms": self.last_latency * 1000 if self.last_latency is not None else None,
+            "circuit": self.breaker.stats(),
+        }
+
+
+circuit_breaker = CircuitBreaker()
+
+
+def get_health_prober(request: Request) -> HealthProber:
+    """Returns the prober started by the application lifespan."""
+    return request.app.state.health_prober
@@ -0,0 +1,166 @@
+"""Hedged upstream calls to cut tail latency"""
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional
+
+import httpx
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "false").lower() in ("1", "true", "yes")
+# Latency percentile of a route after which a second attempt is sent.
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "0.95"))
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "0.02"))
+# Latencies seen on a route before it is hedged.
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_WINDOW_SIZE = int(os.getenv("HEDGE_WINDOW_SIZE", "200"))
+# Extra calls allowed, as a percentage of hedgeable calls.
+HEDGE_BUDGET_PERCENT = float(os.getenv("HEDGE_BUDGET_PERCENT", "5"))
+# Hedges that may be spent at once after a quiet period.
+HEDGE_BUDGET_BURST = float(os.getenv("HEDGE_BUDGET_BURST", "10"))
+
+Call = Callable[[], Awaitable[httpx.Response]]
+
+
+class RouteHedger:
+    """Rolling latencies and hedge budget of one kind of upstream call.
+
+    Every call earns HEDGE_BUDGET_PERCENT / 100 of a hedge, up to
+    HEDGE_BUDGET_BURST, and every hedge spends one, so hedges stay under
+    that share of the traffic over time.
+    """
+
+    def __init__(self):
+        self.latencies: Deque[float] = deque(maxlen=HEDGE_WINDOW_SIZE)
+        self.budget = HEDGE_BUDGET_BURST
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.skipped = 0
+        self._delay: Optional[float] = None
+
+    def delay(self) -> Optional[float]:
+        """Seconds to wait for the first attempt before hedging, None until
+        HEDGE_MIN_SAMPLES latencies were seen."""
+        if len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        if self._delay is None:
+            ordered = sorted(self.latencies)
+            self._delay = max(HEDGE_MIN_DELAY, ordered[int(HEDGE_PERCENTILE * (len(ordered) - 1))])
+        return self._delay
+
+    def observe(self, latency: float) -> None:
+        """Record the latency of an attempt that completed."""
+        self.latencies.append(latency)
+        self._delay = None
+
+    def earn(self) -> None:
+        """Add the share of a hedge earned by one call."""
+        self.calls += 1
+        self.budget = min(HEDGE_BUDGET_BURST, self.budget + HEDGE_BUDGET_PERCENT / 100)
+
+    def spend(self) -> bool:
+        """Take one hedge from the budget, False if it is exhausted."""
+        if self.budget < 1:
+            self.skipped += 1
+            return False
+        self.budget -= 1
+        self.hedges += 1
+        return True
+
+    def stats(self) -> dict:
+        """Delay, budget and outcome counters."""
+        return {
+            "delay_ms": self.delay() * 1000 if self.delay() is not None else None,
+            "samples": len(self.latencies),
+            "budget": self.budget,
+            "calls": self.calls,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "skipped_over_budget": self.skipped,
+        }
+
+
+def _succeeded(task: asyncio.Task) -> bool:
+    return task.exception() is None and task.result().status_code < 500
+
+
+class Hedger:
+    """Sends a second identical call when the first is slower than usual.
+
+    Only for calls that are safe to send twice: reads and deterministic
+    completions. The first good answer wins and the other attempt is
+    cancelled; if both fail, the first attempt's outcome is returned.
+    """
+
+    def __init__(self):
+        self._routes: Dict[str, RouteHedger] = {}
+
+    def route(self, name: str) -> RouteHedger:
+        """Return the state of a kind of call."""
+        route = self._routes.get(name)
+        if route is None:
+            route = self._routes[name] = RouteHedger()
+        return route
+
+    async def _timed(self, route: RouteHedger, call: Call) -> httpx.Response:
+        started = time.monotonic()
+        response = await call()
+        route.observe(time.monotonic() - started)
+        return response
+
+    async def run(self, name: str, call: Call, enabled: bool = True) -> httpx.Response:
+        """Run `call`, hedged when HEDGE_ENABLED and `enabled`.
+
+        Args:
+            name (str): Kind of call, e.g. "collections", whose latencies set the delay.
+            call (Call): Sends the upstream request; called once or twice.
+            enabled (bool): False for calls that must not be sent twice.
+
+        Returns:
+            httpx.Response: The answer of the winning attempt.
+        """
+        if not (HEDGE_ENABLED and enabled):
+            return await call()
+        route = self.route(name)
+        route.earn()
+        delay = route.delay()
+        first = asyncio.ensure_future(self._timed(route, call))
+        attempts = [first]
+        try:
+            if delay is None:
+                return await first
+            done, _ = await asyncio.wait(attempts, timeout=delay)
+            if done or not route.spend():
+                return await first
+            logger.debug("Hedging %s call after %.0f ms", name, delay * 1000)
+            attempts.append(asyncio.ensure_future(self._timed(route, call)))
+            pending = set(attempts)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in attempts:
+                    if task in done and _succeeded(task):
+                        if task is not first:
+                            route.hedge_wins += 1
+                        return task.result()
+            return first.result()
+        finally:
+            for task in attempts:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception()
+
+    def stats(self) -> Dict[str, dict]:
+        """Stats of every kind of call seen so far."""
+        return {name: route.stats() for name, route in self._routes.items()}
+
+
+hedger = Hedger()
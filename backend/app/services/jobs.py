@@ -0,0 +1,368 @@
+"""Background jobs for long-running uploads and transcriptions"""
+import abc
+import asyncio
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, Request, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from app.models.models import Job
+
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_QUEUE_MAX_SIZE = int(os.getenv("JOB_QUEUE_MAX_SIZE", "1000"))
+JOB_STORE = os.getenv("JOB_STORE", "memory")
+JOB_SQLITE_PATH = os.getenv("JOB_SQLITE_PATH", "jobs.sqlite3")
+# Finished jobs kept with their results, the oldest go first.
+JOB_MAX_FINISHED = int(os.getenv("JOB_MAX_FINISHED", "1000"))
+# Seconds a finished job is kept after it finished.
+JOB_TTL = float(os.getenv("JOB_TTL", "86400"))
+
+ProgressCallback = Callable[[int, int], None]
+JobFunction = Callable[[ProgressCallback], Awaitable[Any]]
+
+
+class JobStore(abc.ABC):
+    """Interface of job persistence backends."""
+
+    @abc.abstractmethod
+    async def save(self, job: Job) -> None:
+        """Insert or replace a job."""
+
+    @abc.abstractmethod
+    async def get(self, job_id: str) -> Optional[Job]:
+        """Return a job, or None if unknown."""
+
+    @abc.abstractmethod
+    async def list(self, limit: int = 100) -> List[Job]:
+        """Return the most recent jobs first."""
+
+    async def recover(self) -> int:
+        """Mark jobs left unfinished by a previous process as failed.
+
+        Returns:
+            int: Number of jobs marked as failed.
+        """
+        return 0
+
+    def close(self) -> None:
+        """Release the resources of the store."""
+
+
+class InMemoryJobStore(JobStore):
+    """Jobs kept in a dict, lost on restart.
+
+    Finished jobs are bounded in count and age; queued and running jobs
+    are always kept.
+
+    Args:
+        max_finished (int): Finished jobs kept, the first finished go first.
+        ttl (float): Seconds a finished job is kept after it finished.
+    """
+
+    def __init__(self, max_finished: int = JOB_MAX_FINISHED, ttl: float = JOB_TTL):
+        self.max_finished = max_finished
+        self.ttl = ttl
+        self._jobs: Dict[str, Job] = {}
+        self._finished: "OrderedDict[str, float]" = OrderedDict()
+
+    def _prune(self) -> None:
+        expired_before = time.time() - self.ttl
+        while self._finished:
+            job_id, finished_at = next(iter(self._finished.items()))
+            if len(self._finished) <= self.max_finished and finished_at >= expired_before:
+                return
+            del self._finished[job_id]
+            self._jobs.pop(job_id, None)
+
+    async def save(self, job: Job) -> None:
+        self._jobs[job.id] = job
+        if job.finished_at is not None:
+            self._finished[job.id] = job.finished_at
+            self._finished.move_to_end(job.id)
+        self._prune()
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        self._prune()
+        return self._jobs.get(job_id)
+
+    async def list(self, limit: int = 100) -> List[Job]:
+        self._prune()
+        return sorted(self._jobs.values(), key=lambda job: job.created_at, reverse=True)[:limit]
+
+
+class SQLiteJobStore(JobStore):
+    """Jobs persisted in a SQLite database so their outcome survives restarts.
+
+    Only the job state is stored: the work of jobs interrupted by a restart
+    cannot be resumed, they are marked as failed by recover(). Finished jobs
+    are pruned by age and count every PRUNE_EVERY saves.
+
+    Args:
+        path (str): Database file.
+        max_finished (int): Finished jobs kept, the first finished go first.
+        ttl (float): Seconds a finished job is kept after it finished.
+    """
+
+    # Saves between two pruning passes.
+    PRUNE_EVERY = 100
+
+    def __init__(self, path: str = JOB_SQLITE_PATH, max_finished: int = JOB_MAX_FINISHED, ttl: float = JOB_TTL):
+        self.max_finished = max_finished
+        self.ttl = ttl
+        self._saves = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, created_at REAL NOT NULL, status TEXT NOT NULL, data TEXT NOT NULL)"
+            )
+
+    def _save(self, job: Job) -> None:
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO jobs (id, created_at, status, data) VALUES (?, ?, ?, ?)",
+                (job.id, job.created_at, job.status, job.model_dump_json()),
+            )
+            self._saves += 1
+            if self._saves % self.PRUNE_EVERY == 0:
+                self._prune()
+
+    def _prune(self) -> None:
+        finished = "status IN ('succeeded', 'failed', 'cancelled')"
+        self._connection.execute(
+            f"DELETE FROM jobs WHERE {finished} AND json_extract(data, '$.finished_at') < ?",
+            (time.time() - self.ttl,),
+        )
+        self._connection.execute(
+            f"DELETE FROM jobs WHERE {finished} AND id NOT IN (SELECT id FROM jobs WHERE {finished} "
+            "ORDER BY json_extract(data, '$.finished_at') DESC LIMIT ?)",
+            (self.max_finished,),
+        )
+
+    def _query(self, sql: str, parameters: tuple) -> List[Job]:
+        with self._lock:
+            rows = self._connection.execute(sql, parameters).fetchall()
+        return [Job.model_validate_json(row[0]) for row in rows]
+
+    def _recover(self) -> int:
+        interrupted = self._query("SELECT data FROM jobs WHERE status IN ('queued', 'running')", ())
+        for job in interrupted:
+            job.status = "failed"
+            job.error = "Interrupted by a server restart"
+            job.finished_at = time.time()
+            self._save(job)
+        return len(interrupted)
+
+    async def save(self, job: Job) -> None:
+        await run_in_threadpool(self._save, job.model_copy())
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        jobs = await run_in_threadpool(self._query, "SELECT data FROM jobs WHERE id = ?", (job_id,))
+        return jobs[0] if jobs else None
+
+    async def list(self, limit: int = 100) -> List[Job]:
+        return await run_in_threadpool(
+            self._query, "SELECT data FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+        )
+
+    async def recover(self) -> int:
+        return await run_in_threadpool(self._recover)
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._connection.close()
+
+
+def create_job_store() -> JobStore:
+    """Build the store selected by JOB_STORE ("memory" or "sqlite")."""
+    if JOB_STORE == "sqlite":
+        return SQLiteJobStore(JOB_SQLITE_PATH)
+    return InMemoryJobStore()
+
+
+class JobQueue:
+    """A queue of jobs drained by a fixed pool of asyncio workers.
+
+    Args:
+        store (JobStore): Where job states are kept.
+        workers (int): Number of jobs run concurrently.
+        max_size (int): Maximum number of queued jobs.
+    """
+
+    def __init__(self, store: JobStore, workers: int = JOB_WORKERS, max_size: int = JOB_QUEUE_MAX_SIZE):
+        self.store = store
+        self.workers = workers
+        self.max_size = max_size
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._jobs: Dict[str, Job] = {}
+        self._functions: Dict[str, tuple] = {}
+        self._running: Dict[str, asyncio.Task] = {}
+        self._workers: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        """Recover interrupted jobs and start the workers."""
+        recovered = await self.store.recover()
+        if recovered:
+            logger.warning("Marked %d interrupted jobs as failed", recovered)
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Cancel running jobs and stop the workers."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self.store.close()
+
+    async def submit(self, kind: str, function: JobFunction,
+                     cleanup: Optional[Callable[[], None]] = None) -> Job:
+        """Queue a job.
+
+        Args:
+            kind (str): Kind of job, e.g. "upload" or "transcription".
+            function (JobFunction): Coroutine factory receiving a progress callback.
+            cleanup (Optional[Callable[[], None]]): Called once the job is over,
+                e.g. to delete its temporary file.
+
+        Raises:
+            HTTPException: 503 if the queue is full.
+
+        Returns:
+            Job: The queued job.
+        """
+        if self._queue.qsize() >= self.max_size:
+            if cleanup is not None:
+                cleanup()
+            raise HTTPException(status_code=503, detail="Job queue is full",
+                                headers={"Retry-After": "5"})
+        job = Job(id=uuid.uuid4().hex, kind=kind, created_at=time.time())
+        self._jobs[job.id] = job
+        self._functions[job.id] = (function, cleanup)
+        await self.store.save(job)
+        self._queue.put_nowait(job.id)
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        """Return a job, with live progress when it is still active."""
+        return self._jobs.get(job_id) or await self.store.get(job_id)
+
+    async def list(self, limit: int = 100) -> List[Job]:
+        """Return the most recent jobs first."""
+        jobs = {job.id: job for job in await self.store.list(limit)}
+        jobs.update(self._jobs)
+        return sorted(jobs.values(), key=lambda job: job.created_at, reverse=True)[:limit]
+
+    async def cancel(self, job_id: str) -> Optional[Job]:
+        """Cancel a queued or running job.
+
+        Returns:
+            Optional[Job]: The job, or None if unknown.
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            return await self.store.get(job_id)
+        task = self._running.get(job_id)
+        if task is not None:
+            task.cancel()
+            return job
+        await self._finish(job, "cancelled")
+        return job
+
+    async def _finish(self, job: Job, status: str, result: Any = None, error: Any = None) -> None:
+        job.status = status
+        job.result = result
+        job.error = error
+        job.finished_at = time.time()
+        if status == "succeeded":
+            job.progress = 1.0
+        _, cleanup = self._functions.pop(job.id, (None, None))
+        if cleanup is not None:
+            cleanup()
+        await self.store.save(job)
+        self._jobs.pop(job.id, None)
+
+    async def _work(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                job = self._jobs.get(job_id)
+                if job is None or job.status != "queued":
+                    continue
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Job) -> None:
+        function, _ = self._functions[job.id]
+
+        def report_progress(done: int, total: int) -> None:
+            job.progress = done / total if total else 0.0
+
+        job.status = "running"
+        job.started_at = time.time()
+        await self.store.save(job)
+
+        task = asyncio.create_task(function(report_progress))
+        self._running[job.id] = task
+        try:
+            result = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            task.cancel()
+            await self._finish(job, "cancelled")
+            if asyncio.current_task().cancelling():
+                raise
+        except HTTPException as e:
+            await self._finish(job, "failed", error={"status_code": e.status_code, "detail": e.detail})
+        except Exception as e:  # pylint: disable=broad-except
+            logger.exception("Job %s failed", job.id)
+            await self._finish(job, "failed", error=str(e))
+        else:
+            await self._finish(job, "succeeded", result=result)
+        finally:
+            self._running.pop(job.id, None)
+
+
+async def detach_upload(upload: UploadFile) -> Any:
+    """Copy an upload to a temporary file that outlives the request.
+
+    Args:
+        upload (UploadFile): The uploaded file, closed when the request ends.
+
+    Returns:
+        tempfile.TemporaryFile: Copy positioned at the start.
+    """
+    def copy():
+        target = tempfile.TemporaryFile()
+        upload.file.seek(0)
+        shutil.copyfileobj(upload.file, target)
+        target.seek(0)
+        return target
+
+    return await run_in_threadpool(copy)
+
+
+def get_job_queue(request: Request) -> JobQueue:
+    """Returns the job queue created by the application lifespan."""
+    return request.app.state.job_queue
+
+
+def job_accepted(job: Job) -> dict:
+    """Body returned when a job has been queued."""
+    return {"job_id": job.id, "status": job.status, "status_url": f"/jobs/{job.id}"}
@@ -0,0 +1,196 @@
+"""Adaptive per-model concurrency limits for upstream calls"""
+import asyncio
+import os
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Deque, Dict, Optional
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+
+
+load_dotenv()
+
+LIMITER_INITIAL_LIMIT = float(os.getenv("LIMITER_INITIAL_LIMIT", "8"))
+LIMITER_MIN_LIMIT = float(os.getenv("LIMITER_MIN_LIMIT", "1"))
+LIMITER_MAX_LIMIT = float(os.getenv("LIMITER_MAX_LIMIT", "128"))
+# Multiplicative decrease applied on 429, 503 or timeouts.
+LIMITER_BACKOFF = float(os.getenv("LIMITER_BACKOFF", "0.5"))
+# Latency above baseline * tolerance counts as congestion.
+LIMITER_LATENCY_TOLERANCE = float(os.getenv("LIMITER_LATENCY_TOLERANCE", "2.0"))
+LIMITER_QUEUE_TIMEOUT = float(os.getenv("LIMITER_QUEUE_TIMEOUT", "10"))
+LIMITER_MAX_QUEUE = int(os.getenv("LIMITER_MAX_QUEUE", "1000"))
+LIMITER_DEFAULT_RETRY_AFTER = float(os.getenv("LIMITER_DEFAULT_RETRY_AFTER", "1"))
+# Weight of the newest call in the rolling latency and error rate of a model.
+LIMITER_EWMA_ALPHA = float(os.getenv("LIMITER_EWMA_ALPHA", "0.2"))
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given in seconds or as an HTTP date.
+
+    Args:
+        value (Optional[str]): Header value.
+
+    Returns:
+        Optional[float]: Seconds to wait, None if absent or unreadable.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveLimit:
+    """AIMD concurrency limit for one model.
+
+    The limit grows by one per window of successful calls whose latency stays
+    within LIMITER_LATENCY_TOLERANCE of the observed baseline, shrinks a
+    little when latency drifts up, and is cut by LIMITER_BACKOFF on overload.
+    Calls over the limit wait in a FIFO queue.
+    """
+
+    def __init__(self):
+        self.limit = LIMITER_INITIAL_LIMIT
+        self.inflight = 0
+        self.baseline: Optional[float] = None
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.blocked_until = 0.0
+        self.rejected = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._wake_handle: Optional[asyncio.TimerHandle] = None
+
+    def _has_capacity(self) -> bool:
+        return self.inflight < int(self.limit) and time.monotonic() >= self.blocked_until
+
+    async def acquire(self, timeout: float = LIMITER_QUEUE_TIMEOUT) -> None:
+        """Take a slot, queueing up to timeout seconds.
+
+        Raises:
+            HTTPException: 503 with Retry-After when no slot frees up in time.
+        """
+        if not self._waiters and self._has_capacity():
+            self.inflight += 1
+            return
+
+        if len(self._waiters) >= LIMITER_MAX_QUEUE:
+            self._reject()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._schedule_wake()
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                waiter.cancel()
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self._reject()
+
+    def _reject(self) -> None:
+        self.rejected += 1
+        retry_after = max(self.blocked_until - time.monotonic(), LIMITER_DEFAULT_RETRY_AFTER)
+        raise HTTPException(
+            status_code=503,
+            detail="Too many requests queued for this model, retry later",
+            headers={"Retry-After": str(int(retry_after + 0.999))},
+        )
+
+    def release(self) -> None:
+        """Give a slot back and hand it to the next waiter."""
+        self.inflight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self._has_capacity():
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.inflight += 1
+                waiter.set_result(None)
+        self._schedule_wake()
+
+    def _schedule_wake(self) -> None:
+        delay = self.blocked_until - time.monotonic()
+        if self._waiters and delay > 0 and self._wake_handle is None:
+            def wake():
+                self._wake_handle = None
+                self._wake()
+            self._wake_handle = asyncio.get_running_loop().call_later(delay, wake)
+
+    def on_success(self, latency: float) -> None:
+        """Record a successful call and adapt the limit to its latency."""
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += (latency - self.latency) * LIMITER_EWMA_ALPHA
+        self.error_rate -= self.error_rate * LIMITER_EWMA_ALPHA
+        if self.baseline is None or latency < self.baseline:
+            self.baseline = latency
+        else:
+            # Let the baseline follow lasting shifts of the latency.
+            self.baseline += (latency - self.baseline) * 0.01
+
+        if latency <= self.baseline * LIMITER_LATENCY_TOLERANCE:
+            self.limit = min(LIMITER_MAX_LIMIT, self.limit + 1 / self.limit)
+        else:
+            self.limit = max(LIMITER_MIN_LIMIT, self.limit * 0.95)
+        self._wake()
+
+    def on_failure(self) -> None:
+        """Record a call that failed with a connection error or 5xx."""
+        self.error_rate += (1 - self.error_rate) * LIMITER_EWMA_ALPHA
+
+    def on_overload(self, retry_after: Optional[float] = None) -> None:
+        """Cut the limit after a 429, 503 or timeout, pausing for Retry-After."""
+        self.limit = max(LIMITER_MIN_LIMIT, self.limit * LIMITER_BACKOFF)
+        if retry_after:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+
+    def stats(self) -> dict:
+        """Current limit, in-flight calls and queue depth."""
+        return {
+            "limit": int(self.limit),
+            "inflight": self.inflight,
+            "queued": len(self._waiters),
+            "rejected": self.rejected,
+            "baseline_latency_ms": self.baseline * 1000 if self.baseline is not None else None,
+            "latency_ewma_ms": self.latency * 1000 if self.latency is not None else None,
+            "error_rate": self.error_rate,
+            "blocked_for_seconds": max(0.0, self.blocked_until - time.monotonic()),
+        }
+
+
+class ModelLimiter:
+    """One AdaptiveLimit per model, created on first use."""
+
+    def __init__(self):
+        self._limits: Dict[str, AdaptiveLimit] = {}
+
+    def get(self, model: str) -> AdaptiveLimit:
+        """Return the limit of a model."""
+        limit = self._limits.get(model)
+        if limit is None:
+            limit = self._limits[model] = AdaptiveLimit()
+        return limit
+
+    def find(self, model: str) -> Optional[AdaptiveLimit]:
+        """Return the limit of a model if it has been used, without creating it."""
+        return self._limits.get(model)
+
+    def stats(self) -> Dict[str, dict]:
+        """Stats of every model seen so far."""
+        return {model: limit.stats() for model, limit in self._limits.items()}
+
+
+model_limiter = ModelLimiter()
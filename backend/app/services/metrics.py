@@ -0,0 +1,257 @@
+"""In-process metrics rendered in the Prometheus text format"""
+import os
+import re
+import time
+from bisect import bisect_left
+from typing import Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+from fastapi.routing import APIRoute
+
+
+load_dotenv()
+
+# Upper bounds, in seconds, of the latency histogram buckets.
+METRICS_LATENCY_BUCKETS = tuple(
+    float(bound) for bound in os.getenv(
+        "METRICS_LATENCY_BUCKETS",
+        "0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10,30,60",
+    ).split(",")
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_MODEL_PATH = re.compile(r"^(.*/models)/.+$")
+
+Labels = Tuple[str, ...]
+
+
+class Histogram:
+    """Cumulative-on-render histogram over fixed bucket bounds."""
+
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, size: int):
+        self.counts = [0] * (size + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """Record one value."""
+        self.counts[bisect_left(METRICS_LATENCY_BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metric:
+    """A named family of counters, gauges or histograms keyed by label values.
+
+    Every update runs on the event loop, so plain dicts and ints are enough:
+    no locks and no allocation once a label set has been seen.
+    """
+
+    def __init__(self, name: str, kind: str, description: str, label_names: Labels):
+        self.name = name
+        self.kind = kind
+        self.description = description
+        self.label_names = label_names
+        self.values: Dict[Labels, object] = {}
+
+    def inc(self, labels: Labels, value: float = 1) -> None:
+        """Add to a counter or gauge."""
+        self.values[labels] = self.values.get(labels, 0) + value
+
+    def dec(self, labels: Labels, value: float = 1) -> None:
+        """Subtract from a gauge."""
+        self.values[labels] = self.values.get(labels, 0) - value
+
+    def observe(self, labels: Labels, value: float) -> None:
+        """Record a value in a histogram."""
+        histogram = self.values.get(labels)
+        if histogram is None:
+            histogram = self.values[labels] = Histogram(len(METRICS_LATENCY_BUCKETS))
+        histogram.observe(value)
+
+    def _label_string(self, labels: Labels, extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, labels)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> str:
+        """Exposition lines of this family."""
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in list(self.values.items()):
+            if self.kind != "histogram":
+                lines.append(f"{self.name}{self._label_string(labels)} {_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(METRICS_LATENCY_BUCKETS, value.counts):
+                cumulative += count
+                le = self._label_string(labels, f'le="{_number(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            le = self._label_string(labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {value.count}")
+            lines.append(f"{self.name}_sum{self._label_string(labels)} {_number(value.sum)}")
+            lines.append(f"{self.name}_count{self._label_string(labels)} {value.count}")
+        return "\n".join(lines)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Registry:
+    """All metrics exposed by /metrics."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def metric(self, name: str, kind: str, description: str, label_names: Labels = ()) -> Metric:
+        """Register a metric family, or return the one already registered."""
+        if name not in self._metrics:
+            self._metrics[name] = Metric(name, kind, description, label_names)
+        return self._metrics[name]
+
+    def render(self) -> str:
+        """Every family in the Prometheus text format."""
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.metric(
+    "albert_proxy_requests_total", "counter",
+    "Requests handled, by route template, method and status.", ("route", "method", "status"),
+)
+http_in_flight = registry.metric(
+    "albert_proxy_requests_in_flight", "gauge",
+    "Requests being handled, by route template, 'unmatched' for unknown paths.", ("route",),
+)
+http_duration = registry.metric(
+    "albert_proxy_request_duration_seconds", "histogram",
+    "Time from request arrival to the last response byte, by route template.", ("route",),
+)
+http_request_bytes = registry.metric(
+    "albert_proxy_request_bytes_total", "counter", "Request body bytes received, by route template.", ("route",),
+)
+http_response_bytes = registry.metric(
+    "albert_proxy_response_bytes_total", "counter", "Response body bytes sent, by route template.", ("route",),
+)
+upstream_requests = registry.metric(
+    "albert_upstream_requests_total", "counter",
+    "Calls to the Albert API, by path and status, 'error' when no response came back.", ("path", "status"),
+)
+upstream_in_flight = registry.metric(
+    "albert_upstream_requests_in_flight", "gauge", "Calls to the Albert API awaiting headers, by path.", ("path",),
+)
+upstream_duration = registry.metric(
+    "albert_upstream_request_duration_seconds", "histogram",
+    "Time to the Albert API response headers, by path.", ("path",),
+)
+upstream_request_bytes = registry.metric(
+    "albert_upstream_request_bytes_total", "counter", "Request body bytes sent to the Albert API, by path.", ("path",),
+)
+upstream_response_bytes = registry.metric(
+    "albert_upstream_response_bytes_total", "counter",
+    "Response body bytes read from the Albert API, by path. Streamed bodies are not counted.", ("path",),
+)
+tokens = registry.metric(
+    "albert_tokens_total", "counter", "Tokens reported in upstream usage blocks, by model and kind.",
+    ("model", "kind"),
+)
+
+
+def upstream_path(path: str) -> str:
+    """Collapse model ids so upstream paths keep a bounded set of labels."""
+    return _MODEL_PATH.sub(r"\1/{model_id}", path)
+
+
+def record_usage(model: Optional[str], usage: Optional[dict]) -> None:
+    """Count the tokens of an OpenAI-style usage block.
+
+    Args:
+        model (Optional[str]): Model the completion was asked of.
+        usage (Optional[dict]): The "usage" object of the upstream response.
+    """
+    if not isinstance(usage, dict):
+        return
+    model = model or "unknown"
+    for kind in ("prompt_tokens", "completion_tokens"):
+        count = usage.get(kind)
+        if isinstance(count, int):
+            tokens.inc((model, kind[: -len("_tokens")]), count)
+
+
+IN_FLIGHT_SCOPE_KEY = "albert.metrics.in_flight"
+
+
+class InstrumentedRoute(APIRoute):
+    """Route moving its requests under its template in the in-flight gauge.
+
+    The route is known only once the router has matched it, after the
+    middleware started counting the request; the body of streamed
+    responses is sent within handle(), so it is counted too.
+    """
+
+    async def handle(self, scope, receive, send):
+        in_flight = scope.get(IN_FLIGHT_SCOPE_KEY)
+        if in_flight is not None:
+            label = (self.path,)
+            http_in_flight.dec(in_flight["label"])
+            http_in_flight.inc(label)
+            in_flight["label"] = label
+        await super().handle(scope, receive, send)
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request and counting its bytes.
+
+    Requests are labelled with the template of the route that handled them,
+    which the router stores in the scope before the response starts, so
+    /models/abc and /models/xyz share /models/{model_id}. A request is
+    counted in flight as "unmatched" until an InstrumentedRoute picks it up
+    and moves it under its template.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.monotonic()
+        state = {"status": 500, "in": 0, "out": 0}
+
+        async def receive_counted():
+            message = await receive()
+            if message["type"] == "http.request":
+                state["in"] += len(message.get("body", b""))
+            return message
+
+        async def send_counted(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                state["out"] += len(message.get("body", b""))
+            await send(message)
+
+        in_flight = {"label": ("unmatched",)}
+        scope[IN_FLIGHT_SCOPE_KEY] = in_flight
+        http_in_flight.inc(in_flight["label"])
+        try:
+            await self.app(scope, receive_counted, send_counted)
+        finally:
+            http_in_flight.dec(in_flight["label"])
+            route = scope.get("route")
+            label = getattr(route, "path", None) or "unmatched"
+            http_requests.inc((label, scope["method"], str(state["status"])))
+            http_duration.observe((label,), time.monotonic() - started)
+            http_request_bytes.inc((label,), state["in"])
+            http_response_bytes.inc((label,), state["out"])
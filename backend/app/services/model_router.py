@@ -0,0 +1,163 @@
+"""Resolve "auto:<type>" models and aliases against the live catalog"""
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+from dotenv import load_dotenv
+from fastapi import HTTPException, Response
+from pydantic import BaseModel
+
+from app.services.app_services import fetch_models
+from app.services.catalog_cache import catalog_cache
+from app.services.limiter import LIMITER_MAX_QUEUE, model_limiter
+
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+AUTO_PREFIX = "auto"
+# Type used by a bare "auto".
+MODEL_AUTO_DEFAULT_TYPE = os.getenv("MODEL_AUTO_DEFAULT_TYPE", "text-generation")
+# Comma separated "type=model" pairs always chosen for "auto:<type>" while available.
+MODEL_AUTO_PINS = os.getenv("MODEL_AUTO_PINS", "")
+# Catalog statuses a model may be chosen in.
+MODEL_AUTO_STATUSES = {
+    status.strip() for status in os.getenv("MODEL_AUTO_STATUSES", "available").split(",") if status.strip()
+}
+
+RESOLVED_MODEL_HEADER = "X-Resolved-Model"
+
+
+def parse_pins(spec: str) -> Dict[str, str]:
+    """Parse a "type=model,other=model" specification."""
+    pins = {}
+    for item in spec.split(","):
+        model_type, sep, model = item.partition("=")
+        if sep and model_type.strip() and model.strip():
+            pins[model_type.strip()] = model.strip()
+    return pins
+
+
+AUTO_PINS = parse_pins(MODEL_AUTO_PINS)
+
+
+def is_auto(model: str) -> bool:
+    """Tell whether a model is to be chosen by the backend."""
+    return model == AUTO_PREFIX or model.startswith(AUTO_PREFIX + ":")
+
+
+def auto_type(model: str) -> str:
+    """Type asked for by an "auto" model."""
+    return model.partition(":")[2] or MODEL_AUTO_DEFAULT_TYPE
+
+
+def index_catalog(models: List[dict]) -> Tuple[Dict[str, dict], Dict[str, str]]:
+    """Models by id and model ids by alias."""
+    by_id = {model["id"]: model for model in models if model.get("id")}
+    by_alias = {alias: model_id for model_id, model in by_id.items() for alias in model.get("aliases") or ()}
+    return by_id, by_alias
+
+
+def is_available(model: dict) -> bool:
+    """Tell whether the catalog lists a model as usable."""
+    return model.get("status", "available") in MODEL_AUTO_STATUSES
+
+
+def expected_latency(model_id: str, now: float) -> Optional[float]:
+    """Rolling latency of a model inflated by its queue and error rate.
+
+    Returns:
+        Optional[float]: Seconds, 0 for models not used yet so they get a
+            first call, None for models refusing calls right now.
+    """
+    limit = model_limiter.find(model_id)
+    if limit is None or limit.latency is None:
+        return 0.0
+    stats = limit.stats()
+    if now < limit.blocked_until or stats["queued"] >= LIMITER_MAX_QUEUE:
+        return None
+    queueing = 1 + stats["queued"] / max(1, stats["limit"])
+    return limit.latency * queueing / max(0.05, 1 - limit.error_rate)
+
+
+def choose(candidates: List[dict]) -> dict:
+    """Model of lowest expected latency, or the one unblocked soonest."""
+    now = time.monotonic()
+    scored = [(expected_latency(model["id"], now), model) for model in candidates]
+    ready = [(score, model) for score, model in scored if score is not None]
+    if ready:
+        return min(ready, key=lambda item: item[0])[1]
+    return min(candidates, key=lambda model: model_limiter.find(model["id"]).blocked_until)
+
+
+async def resolve_model(model: str, client: httpx.AsyncClient, pin: Optional[str] = None) -> str:
+    """Turn an "auto[:<type>]" model or an alias into a catalog model id.
+
+    "auto:<type>" picks, among the available models of that type, the one
+    with the lowest rolling latency, its queue and error rate considered.
+    A pin, from the X-Model-Pin header or MODEL_AUTO_PINS, wins while it is
+    available. Other models are looked up by alias and otherwise kept as is,
+    at once while the catalog is failing.
+
+    Args:
+        model (str): Model of the request.
+        client (httpx.AsyncClient): The shared Albert client.
+        pin (Optional[str]): Model or alias to use for "auto" requests.
+
+    Raises:
+        HTTPException: 503 if an "auto" model cannot be resolved.
+
+    Returns:
+        str: The model id to call.
+    """
+    if not is_auto(model) and catalog_cache.unavailable("models"):
+        return model
+    try:
+        catalog = await catalog_cache.get("models", lambda: fetch_models(client=client))
+        by_id, by_alias = index_catalog(catalog.json().get("data") or [])
+    except (HTTPException, httpx.HTTPError, ValueError, AttributeError) as e:
+        if is_auto(model):
+            raise HTTPException(status_code=503, detail=f"Model catalog unavailable to resolve {model}: {e}") from e
+        logger.warning("No model catalog, not resolving aliases: %s", e)
+        return model
+
+    if not is_auto(model):
+        return model if model in by_id else by_alias.get(model, model)
+
+    model_type = auto_type(model)
+    pin = pin or AUTO_PINS.get(model_type)
+    if pin:
+        pinned = by_id.get(by_alias.get(pin, pin))
+        if pinned is not None and is_available(pinned):
+            return pinned["id"]
+        logger.warning("Pinned model %s is not available, choosing another %s model", pin, model_type)
+
+    candidates = [entry for entry in by_id.values() if entry.get("type") == model_type and is_available(entry)]
+    if not candidates:
+        raise HTTPException(status_code=503, detail=f"No available model of type {model_type}")
+    return choose(candidates)["id"]
+
+
+async def resolve_request(request: BaseModel, client: httpx.AsyncClient, pin: Optional[str] = None) -> BaseModel:
+    """Copy of a chat or completion request with its model resolved.
+
+    Args:
+        request (BaseModel): Request with a `model` field.
+        client (httpx.AsyncClient): The shared Albert client.
+        pin (Optional[str]): Model or alias to use for "auto" requests.
+
+    Returns:
+        BaseModel: The request itself when the model did not change.
+    """
+    model = await resolve_model(request.model, client, pin)
+    if model == request.model:
+        return request
+    return request.model_copy(update={"model": model})
+
+
+def report_model(response: Response, model: str) -> None:
+    """Tell the client which model answered."""
+    response.headers[RESOLVED_MODEL_HEADER] = model
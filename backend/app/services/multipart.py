@@ -0,0 +1,107 @@
+"""Stream multipart/form-data bodies straight from spooled files"""
+import os
+import uuid
+from typing import AsyncIterator, BinaryIO, Callable, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+from starlette.concurrency import run_in_threadpool
+
+
+load_dotenv()
+
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(256 * 1024)))
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(200 * 1024 * 1024)))
+
+
+def file_size(fileobj: BinaryIO) -> int:
+    """Return the size of a seekable file, leaving it positioned at the start.
+
+    Args:
+        fileobj (BinaryIO): The file.
+
+    Returns:
+        int: Size in bytes.
+    """
+    fileobj.seek(0, os.SEEK_END)
+    size = fileobj.tell()
+    fileobj.seek(0)
+    return size
+
+
+def _quote(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', "%22").replace("\r", "%0D").replace("\n", "%0A")
+
+
+class MultipartFileStream:
+    """Multipart body whose file part is read lazily in fixed-size chunks.
+
+    Peak memory stays at one chunk whatever the file size, and the body length
+    is known up front so the upstream gets a Content-Length instead of a
+    chunked transfer.
+
+    Args:
+        fileobj (BinaryIO): Seekable file holding the upload.
+        filename (str): File name announced to the upstream.
+        content_type (Optional[str]): Media type of the file part.
+        fields (Dict[str, Tuple[str, Optional[str]]]): Extra parts as
+            name -> (value, content type).
+        file_field (str): Name of the file part.
+        size (Optional[int]): Size of the file when already known.
+        chunk_size (int): Bytes read from the file per chunk.
+        on_progress (Optional[Callable[[int, int], None]]): Called with
+            (bytes sent, file size) after each chunk.
+    """
+
+    def __init__(
+        self,
+        fileobj: BinaryIO,
+        filename: str,
+        content_type: Optional[str],
+        fields: Dict[str, Tuple[str, Optional[str]]],
+        file_field: str = "file",
+        size: Optional[int] = None,
+        chunk_size: int = UPLOAD_CHUNK_SIZE,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+    ):
+        self.fileobj = fileobj
+        self.on_progress = on_progress
+        self.size = file_size(fileobj) if size is None else size
+        self.chunk_size = chunk_size
+        self.boundary = uuid.uuid4().hex
+
+        head = b""
+        for name, (value, part_type) in fields.items():
+            head += self._part_header(name, None, part_type) + value.encode() + b"\r\n"
+        self._head = head + self._part_header(file_field, filename or "upload", content_type)
+        self._tail = f"\r\n--{self.boundary}--\r\n".encode()
+
+    def _part_header(self, name: str, filename: Optional[str], content_type: Optional[str]) -> bytes:
+        disposition = f'form-data; name="{_quote(name)}"'
+        if filename is not None:
+            disposition += f'; filename="{_quote(filename)}"'
+        header = f"--{self.boundary}\r\nContent-Disposition: {disposition}\r\n"
+        if content_type:
+            header += f"Content-Type: {content_type}\r\n"
+        return (header + "\r\n").encode()
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        """Content-Type and Content-Length headers for the upstream request."""
+        return {
+            "Content-Type": f"multipart/form-data; boundary={self.boundary}",
+            "Content-Length": str(len(self._head) + self.size + len(self._tail)),
+        }
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        yield self._head
+        self.fileobj.seek(0)
+        remaining = self.size
+        while remaining > 0:
+            chunk = await run_in_threadpool(self.fileobj.read, min(self.chunk_size, remaining))
+            if not chunk:
+                raise ValueError("File is shorter than its announced size")
+            remaining -= len(chunk)
+            yield chunk
+            if self.on_progress is not None:
+                self.on_progress(self.size - remaining, self.size)
+        yield self._tail
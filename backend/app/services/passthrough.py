@@ -0,0 +1,76 @@
+"""Relay upstream JSON bodies untouched and encode our own JSON quickly"""
+from typing import Any, Optional
+
+import httpx
+import orjson
+from fastapi import Response
+from fastapi.responses import JSONResponse
+
+
+class RawJSON:
+    """An upstream JSON body kept as bytes, parsed only when asked.
+
+    Routes relay the bytes as they came; code that needs the data calls
+    json(), which parses once and remembers the result.
+    """
+
+    __slots__ = ("body", "content_type", "_parsed")
+
+    def __init__(self, body: bytes, content_type: str = "application/json"):
+        self.body = body
+        self.content_type = content_type
+        self._parsed: Any = None
+
+    @classmethod
+    def from_response(cls, response: httpx.Response) -> "RawJSON":
+        """Keep the body and content type of an upstream response."""
+        return cls(response.content, response.headers.get("content-type", "application/json"))
+
+    def json(self) -> Any:
+        """The parsed body."""
+        if self._parsed is None:
+            self._parsed = orjson.loads(self.body)
+        return self._parsed
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response encoded with orjson."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _with_headers(target: Response, source: Optional[Response]) -> Response:
+    # Headers set on a route's Response parameter are dropped when the route
+    # returns its own Response, so they are carried over here.
+    if source is not None:
+        for key, value in source.headers.items():
+            if key != "content-length":
+                target.headers[key] = value
+    return target
+
+
+def relay(raw: RawJSON, response: Optional[Response] = None) -> Response:
+    """Answer with an upstream body as is, without parsing or re-encoding it.
+
+    Args:
+        raw (RawJSON): The upstream body.
+        response (Optional[Response]): Route Response parameter whose headers are kept.
+
+    Returns:
+        Response: The raw response.
+    """
+    return _with_headers(Response(content=raw.body, media_type=raw.content_type), response)
+
+
+def fast_json(content: Any, response: Optional[Response] = None) -> FastJSONResponse:
+    """Answer with JSON built by the backend, encoded with orjson.
+
+    Args:
+        content (Any): JSON-compatible data.
+        response (Optional[Response]): Route Response parameter whose headers are kept.
+
+    Returns:
+        FastJSONResponse: The response.
+    """
+    return _with_headers(FastJSONResponse(content), response)
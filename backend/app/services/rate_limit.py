@@ -0,0 +1,287 @@
+"""Per-user token buckets for requests per second and LLM tokens per minute"""
+import asyncio
+import hashlib
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, Request
+
+from app.services.metrics import registry
+
+
+load_dotenv()
+
+# 0 disables a dimension. Both are off unless set: callers without a `user`
+# or API key are told apart by address only, so everyone behind the same
+# proxy, or using the Streamlit frontend, would share one bucket.
+RATE_LIMIT_RPS = float(os.getenv("RATE_LIMIT_RPS", "0"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "10"))
+RATE_LIMIT_TOKENS_PER_MINUTE = float(os.getenv("RATE_LIMIT_TOKENS_PER_MINUTE", "0"))
+# Seconds a batch item may wait for its user's buckets before it is rejected.
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "60"))
+# Users tracked at once, the least recently seen are forgotten first.
+RATE_LIMIT_MAX_USERS = int(os.getenv("RATE_LIMIT_MAX_USERS", "10000"))
+
+rate_limited = registry.metric(
+    "albert_rate_limited_total", "counter", "Requests rejected by the per-user rate limits, by bucket.", ("bucket",),
+)
+
+
+class TokenBucket:
+    """Bucket refilled continuously at `rate` per second up to `capacity`.
+
+    The level may go negative when usage reported after the fact exceeds
+    what was left; the user then waits until the debt is paid back.
+    """
+
+    __slots__ = ("rate", "capacity", "level", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.level = capacity
+        self.updated = now
+
+    def refill(self, now: float) -> None:
+        """Add what accrued since the last update."""
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` can be taken, 0 if it can be taken now."""
+        missing = amount - self.level
+        return missing / self.rate if missing > 0 else 0.0
+
+
+class UserQuota:
+    """Request and token buckets of one user."""
+
+    __slots__ = ("requests", "tokens", "rejected", "used_tokens")
+
+    def __init__(self, now: float):
+        self.requests = TokenBucket(RATE_LIMIT_RPS, RATE_LIMIT_BURST, now) if RATE_LIMIT_RPS > 0 else None
+        self.tokens = (
+            TokenBucket(RATE_LIMIT_TOKENS_PER_MINUTE / 60, RATE_LIMIT_TOKENS_PER_MINUTE, now)
+            if RATE_LIMIT_TOKENS_PER_MINUTE > 0 else None
+        )
+        self.rejected = 0
+        self.used_tokens = 0
+
+    def stats(self, now: float) -> dict:
+        """Remaining allowance of both buckets."""
+        for bucket in (self.requests, self.tokens):
+            if bucket is not None:
+                bucket.refill(now)
+        return {
+            "requests_remaining": self.requests.level if self.requests is not None else None,
+            "requests_per_second": RATE_LIMIT_RPS or None,
+            "tokens_remaining": self.tokens.level if self.tokens is not None else None,
+            "tokens_per_minute": RATE_LIMIT_TOKENS_PER_MINUTE or None,
+            "retry_after_seconds": max(
+                self.requests.wait_time(1) if self.requests is not None else 0.0,
+                self.tokens.wait_time(0) if self.tokens is not None else 0.0,
+            ),
+            "used_tokens": self.used_tokens,
+            "rejected": self.rejected,
+        }
+
+
+class RateLimiter:
+    """Token buckets keyed by user, bounded to RATE_LIMIT_MAX_USERS entries.
+
+    A request takes one request token. Tokens are charged after the fact from
+    the `usage` block of the upstream response, or upfront from an estimate
+    when no usage will come back (streams). A user in token debt is rejected
+    until the bucket refills above zero.
+    """
+
+    def __init__(self, max_users: int = RATE_LIMIT_MAX_USERS):
+        self.max_users = max_users
+        self._quotas: "OrderedDict[str, UserQuota]" = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        """False when both dimensions are disabled."""
+        return RATE_LIMIT_RPS > 0 or RATE_LIMIT_TOKENS_PER_MINUTE > 0
+
+    def _quota(self, key: str, now: float) -> UserQuota:
+        quota = self._quotas.get(key)
+        if quota is None:
+            quota = self._quotas[key] = UserQuota(now)
+            if len(self._quotas) > self.max_users:
+                self._quotas.popitem(last=False)
+        else:
+            self._quotas.move_to_end(key)
+        return quota
+
+    def _take(self, key: str, tokens: int) -> Tuple[float, Optional[str]]:
+        """Take a request token and `tokens` LLM tokens if both buckets allow it.
+
+        Returns:
+            Tuple[float, Optional[str]]: (0, None) once taken, otherwise the
+                seconds to wait and the bucket that is short.
+        """
+        now = time.monotonic()
+        quota = self._quota(key, now)
+        requests, token_bucket = quota.requests, quota.tokens
+
+        wait = 0.0
+        bucket = None
+        if requests is not None:
+            requests.refill(now)
+            wait = requests.wait_time(1)
+            bucket = "requests" if wait else None
+        if token_bucket is not None:
+            token_bucket.refill(now)
+            token_wait = token_bucket.wait_time(min(tokens, token_bucket.capacity))
+            if token_wait > wait:
+                wait, bucket = token_wait, "tokens"
+        if wait:
+            return wait, bucket
+
+        if requests is not None:
+            requests.level -= 1
+        self.charge(key, tokens)
+        return 0.0, None
+
+    def _reject(self, key: str, wait: float, bucket: str) -> None:
+        quota = self._quotas.get(key)
+        if quota is not None:
+            quota.rejected += 1
+        rate_limited.inc((bucket,))
+        raise HTTPException(
+            status_code=429,
+            detail=f"Rate limit exceeded for this user ({bucket}), retry later",
+            headers={"Retry-After": str(math.ceil(wait))},
+        )
+
+    def admit(self, key: str, tokens: int = 0) -> None:
+        """Take a request token, and `tokens` LLM tokens charged upfront.
+
+        Nothing is taken unless both buckets allow it.
+
+        Args:
+            key (str): User the request is accounted to.
+            tokens (int): Estimated tokens, for calls whose usage is never reported.
+
+        Raises:
+            HTTPException: 429 with Retry-After when a bucket is empty.
+        """
+        if not self.enabled:
+            return
+        wait, bucket = self._take(key, tokens)
+        if wait:
+            self._reject(key, wait, bucket)
+
+    async def acquire(self, key: str, tokens: int = 0, max_wait: float = RATE_LIMIT_MAX_WAIT) -> None:
+        """Like admit(), but wait for the buckets to refill, up to `max_wait` seconds.
+
+        Used by batch items, which are paced at the user's rate instead of
+        being rejected as soon as the burst is spent.
+
+        Args:
+            key (str): User the request is accounted to.
+            tokens (int): Estimated tokens, for calls whose usage is never reported.
+            max_wait (float): Longest wait before giving up.
+
+        Raises:
+            HTTPException: 429 with Retry-After when the wait would exceed `max_wait`.
+        """
+        if not self.enabled:
+            return
+        deadline = time.monotonic() + max_wait
+        while True:
+            wait, bucket = self._take(key, tokens)
+            if not wait:
+                return
+            if time.monotonic() + wait > deadline:
+                self._reject(key, wait, bucket)
+            await asyncio.sleep(wait)
+
+    def charge(self, key: str, tokens: int) -> None:
+        """Take LLM tokens used by a call that was already admitted."""
+        if tokens <= 0 or not self.enabled:
+            return
+        now = time.monotonic()
+        quota = self._quota(key, now)
+        quota.used_tokens += tokens
+        if quota.tokens is not None:
+            quota.tokens.refill(now)
+            quota.tokens.level -= tokens
+
+    async def metered(self, key: str, completion: Awaitable[Any]) -> Any:
+        """Await an upstream completion and charge the tokens of its usage block.
+
+        Args:
+            key (str): User the completion is accounted to.
+            completion (Awaitable[Any]): e.g. post_chat_completion(...).
+
+        Returns:
+            Any: The completion.
+        """
+        result = await completion
+        usage = result.get("usage") if isinstance(result, dict) else None
+        if isinstance(usage, dict):
+            total = usage.get("total_tokens")
+            if not isinstance(total, int):
+                total = (usage.get("prompt_tokens") or 0) + (usage.get("completion_tokens") or 0)
+            self.charge(key, total)
+        return result
+
+    def get(self, key: str) -> Optional[dict]:
+        """Quota state of one user, None if unknown."""
+        quota = self._quotas.get(key)
+        return quota.stats(time.monotonic()) if quota is not None else None
+
+    def reset(self, key: str) -> bool:
+        """Forget a user, giving them full buckets again."""
+        return self._quotas.pop(key, None) is not None
+
+    def stats(self) -> Dict[str, dict]:
+        """Quota state of every tracked user."""
+        now = time.monotonic()
+        return {key: quota.stats(now) for key, quota in list(self._quotas.items())}
+
+
+rate_limiter = RateLimiter()
+
+
+def rate_limit_key(user: Optional[str], request: Request) -> str:
+    """Identify who a request is accounted to.
+
+    The `user` field of the body comes first, then the caller's API key
+    (hashed, never kept in clear), then the client address.
+
+    Args:
+        user (Optional[str]): The `user` field of the request body.
+        request (Request): The incoming request.
+
+    Returns:
+        str: Key of the user's buckets.
+    """
+    if user:
+        return f"user:{user}"
+    authorization = request.headers.get("authorization") or request.headers.get("x-api-key")
+    if authorization:
+        return "key:" + hashlib.sha256(authorization.encode()).hexdigest()[:16]
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+def estimate_tokens(payload: dict) -> int:
+    """Rough token count of a request: prompt characters / 4 plus max_tokens.
+
+    Args:
+        payload (dict): ChatRequest or CompletionRequest dump.
+
+    Returns:
+        int: Estimated tokens.
+    """
+    if "messages" in payload:
+        chars = sum(len(str(message.get("content") or "")) for message in payload["messages"])
+    else:
+        chars = len(str(payload.get("prompt") or ""))
+    return chars // 4 + (payload.get("max_tokens") or 0)
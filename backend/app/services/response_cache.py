@@ -0,0 +1,317 @@
+"""Exact-match cache for deterministic chat and text completions"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from dotenv import load_dotenv
+from fastapi import Response
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+# Comma separated "model=seconds" pairs, a TTL of 0 disables caching for a model.
+RESPONSE_CACHE_MODEL_TTLS = os.getenv("RESPONSE_CACHE_MODEL_TTLS", "")
+RESPONSE_CACHE_DIR = os.getenv("RESPONSE_CACHE_DIR", "")
+# Bytes of responses kept on disk, the least recently used go first.
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+CACHE_STATUS_HEADER = "X-Cache"
+CACHE_BYPASS_HEADER = "X-Cache-Bypass"
+
+
+def parse_model_ttls(spec: str) -> Dict[str, float]:
+    """Parse a "model=seconds,other=seconds" specification.
+
+    Args:
+        spec (str): The specification string.
+
+    Returns:
+        Dict[str, float]: TTL in seconds by model id.
+    """
+    ttls = {}
+    for item in spec.split(","):
+        model, sep, ttl = item.rpartition("=")
+        if sep and model.strip():
+            ttls[model.strip()] = float(ttl)
+    return ttls
+
+
+def is_deterministic(request: BaseModel) -> bool:
+    """Tell whether a chat or completion request always yields the same answer.
+
+    A request qualifies when it is not streamed and either samples with
+    temperature 0 or explicitly sets a seed.
+
+    Args:
+        request (BaseModel): A ChatRequest or CompletionRequest.
+
+    Returns:
+        bool: True when the response may be served from the cache.
+    """
+    if request.stream:
+        return False
+    return request.temperature == 0 or "seed" in request.model_fields_set
+
+
+def cache_key(kind: str, payload: dict) -> str:
+    """Canonical content hash of an upstream payload.
+
+    Args:
+        kind (str): Upstream endpoint, e.g. "chat" or "completions".
+        payload (dict): The model_dump() sent upstream.
+
+    Returns:
+        str: Hex SHA-256 digest.
+    """
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(f"{kind}\n{canonical}".encode()).hexdigest()
+
+
+class DiskStore:
+    """JSON files keyed by hash, sharded by the first two hex characters."""
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def read(self, key: str) -> Optional[dict]:
+        """Return the stored record, or None if missing or unreadable."""
+        try:
+            with self._path(key).open("r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write(self, key: str, record: dict) -> None:
+        """Atomically store a record.
+
+        Each write goes through its own temporary file, so concurrent
+        writers of the same key do not clash and the last one wins.
+        """
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f"{key}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(record, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+    def delete(self, key: str) -> None:
+        """Remove a record if present."""
+        self._path(key).unlink(missing_ok=True)
+
+
+class LRUDiskStore(DiskStore):
+    """DiskStore bounded in total size, evicting the least recently used files.
+
+    Recency survives restarts through the file modification times, which
+    are bumped on every read. Safe to use from several worker threads.
+
+    Args:
+        directory (str): Where records are kept.
+        max_bytes (int): Total size of the records kept.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = RESPONSE_CACHE_MAX_BYTES):
+        super().__init__(directory)
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._sizes: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._scan()
+
+    def _scan(self) -> None:
+        entries = []
+        for path in self.directory.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, path.stem, stat.st_size))
+        for _, key, size in sorted(entries):
+            self._sizes[key] = size
+            self.total_bytes += size
+
+    def read(self, key: str) -> Optional[dict]:
+        record = super().read(key)
+        if record is not None:
+            with self._lock:
+                if key in self._sizes:
+                    self._sizes.move_to_end(key)
+            try:
+                os.utime(self._path(key))
+            except OSError:
+                pass
+        return record
+
+    def write(self, key: str, record: dict) -> None:
+        with self._lock:
+            super().write(key, record)
+            size = self._path(key).stat().st_size
+            self.total_bytes += size - self._sizes.pop(key, 0)
+            self._sizes[key] = size
+            while self.total_bytes > self.max_bytes and len(self._sizes) > 1:
+                self._delete(next(iter(self._sizes)))
+
+    def _delete(self, key: str) -> None:
+        super().delete(key)
+        self.total_bytes -= self._sizes.pop(key, 0)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._delete(key)
+
+    def __len__(self) -> int:
+        return len(self._sizes)
+
+
+class ResponseCache:
+    """Bounded LRU memory tier in front of an optional on-disk tier.
+
+    The disk tier is bounded to RESPONSE_CACHE_MAX_BYTES, so entries that
+    expire without being read again are evicted in time.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        default_ttl: float = RESPONSE_CACHE_TTL,
+        model_ttls: Optional[Dict[str, float]] = None,
+        disk_dir: str = RESPONSE_CACHE_DIR,
+        disk_max_bytes: int = RESPONSE_CACHE_MAX_BYTES,
+    ):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.model_ttls = model_ttls if model_ttls is not None else parse_model_ttls(RESPONSE_CACHE_MODEL_TTLS)
+        self.disk = LRUDiskStore(disk_dir, disk_max_bytes) if disk_dir else None
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def ttl_for(self, model: str) -> float:
+        """TTL in seconds for a model, 0 meaning not cached."""
+        return self.model_ttls.get(model, self.default_ttl)
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Return a fresh cached value, or None."""
+        entry = self._memory.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at > time.time():
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._memory[key]
+
+        if self.disk is not None:
+            record = await run_in_threadpool(self.disk.read, key)
+            if record is not None:
+                if record["expires_at"] > time.time():
+                    self._remember(key, record["value"], record["expires_at"])
+                    self.disk_hits += 1
+                    return record["value"]
+                try:
+                    await run_in_threadpool(self.disk.delete, key)
+                except OSError as e:
+                    logger.warning("Could not delete expired cache entry %s: %s", key, e)
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: Any, model: str) -> None:
+        """Store a value with the TTL of its model.
+
+        Disk errors are logged without failing the request, the value stays
+        in the memory tier.
+        """
+        ttl = self.ttl_for(model)
+        if ttl <= 0:
+            return
+        expires_at = time.time() + ttl
+        self._remember(key, value, expires_at)
+        if self.disk is not None:
+            try:
+                await run_in_threadpool(self.disk.write, key, {"expires_at": expires_at, "value": value})
+            except OSError as e:
+                logger.warning("Could not store cached response %s: %s", key, e)
+
+    def _remember(self, key: str, value: Any, expires_at: float) -> None:
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    async def get_or_call(
+        self,
+        kind: str,
+        request: BaseModel,
+        call: Callable[[], Awaitable[Any]],
+        response: Response,
+        bypass: bool = False,
+    ) -> Any:
+        """Serve a completion from the cache, or call upstream and store it.
+
+        Sets the X-Cache response header to HIT, MISS, BYPASS or UNCACHEABLE.
+
+        Args:
+            kind (str): Upstream endpoint, e.g. "chat" or "completions".
+            request (BaseModel): The ChatRequest or CompletionRequest.
+            call (Callable[[], Awaitable[Any]]): Performs the upstream call.
+            response (Response): Response whose headers are updated.
+            bypass (bool): Skip the lookup but refresh the stored entry.
+
+        Returns:
+            Any: The completion.
+        """
+        if not is_deterministic(request) or self.ttl_for(request.model) <= 0:
+            response.headers[CACHE_STATUS_HEADER] = "UNCACHEABLE"
+            return await call()
+
+        key = cache_key(kind, request.model_dump())
+        if not bypass:
+            cached = await self.get(key)
+            if cached is not None:
+                response.headers[CACHE_STATUS_HEADER] = "HIT"
+                return cached
+
+        value = await call()
+        await self.set(key, value, request.model)
+        response.headers[CACHE_STATUS_HEADER] = "BYPASS" if bypass else "MISS"
+        return value
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and tier sizes."""
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "disk": str(self.disk.directory) if self.disk is not None else None,
+            "disk_entries": len(self.disk) if self.disk is not None else None,
+            "disk_bytes": self.disk.total_bytes if self.disk is not None else None,
+            "disk_max_bytes": self.disk.max_bytes if self.disk is not None else None,
+        }
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,168 @@
+"""Search several collections concurrently and fuse their rankings"""
+import asyncio
+import hashlib
+import os
+import time
+from typing import Dict, List
+
+import httpx
+from dotenv import load_dotenv
+from fastapi import HTTPException
+
+from app.functions.login_function import ALBERT_API_BASE_URL, get_timeout
+from app.models.models import SearchRequest
+from app.services.upstream import send_upstream
+
+
+load_dotenv()
+
+# Seconds after which collections that have not answered are left out.
+SEARCH_DEADLINE = float(os.getenv("SEARCH_DEADLINE", "5"))
+SEARCH_CONCURRENCY = int(os.getenv("SEARCH_CONCURRENCY", "16"))
+SEARCH_MAX_COLLECTIONS = int(os.getenv("SEARCH_MAX_COLLECTIONS", "100"))
+
+
+async def search_collection(collection: str, request: SearchRequest, client: httpx.AsyncClient) -> List[dict]:
+    """Search a single collection on the Albert API.
+
+    Raises:
+        HTTPException: If the upstream cannot be reached or answers an error.
+
+    Returns:
+        List[dict]: Upstream results, best first.
+    """
+    payload = {
+        "prompt": request.prompt,
+        "collections": [collection],
+        "k": request.k,
+        "rff_k": request.rff_k,
+        "method": request.method,
+        "score_threshold": request.score_threshold,
+    }
+    try:
+        response = await send_upstream(
+            client, "POST", f"{ALBERT_API_BASE_URL}/search", json=payload, timeout=get_timeout("search"),
+        )
+        response.raise_for_status()
+    except httpx.RequestError as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Request to origin API failed: {e}"
+        ) from e
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(
+            status_code=response.status_code,
+            detail=f"Error response from origin API: {e.response.text}"
+        ) from e
+    return response.json().get("data", [])
+
+
+def _result_key(result: dict) -> str:
+    chunk = result.get("chunk") or {}
+    if chunk.get("id") is not None:
+        return str(chunk["id"])
+    return hashlib.sha256(str(chunk.get("content", result)).encode()).hexdigest()
+
+
+def reciprocal_rank_fusion(rankings: Dict[str, List[dict]], rff_k: int, k: int,
+                           score_threshold: float = 0.0) -> List[dict]:
+    """Merge ranked lists, scoring each chunk sum(1 / (rff_k + rank)).
+
+    Results scoring under score_threshold in their own collection are
+    dropped before fusion. A chunk found in several lists is returned once.
+
+    Args:
+        rankings (Dict[str, List[dict]]): Results of each collection, best first.
+        rff_k (int): Rank smoothing constant.
+        k (int): Number of results to keep.
+        score_threshold (float): Minimum upstream score.
+
+    Returns:
+        List[dict]: Up to k results with their fused score and sources.
+    """
+    fused: Dict[str, dict] = {}
+    for collection, results in rankings.items():
+        rank = 0
+        for result in results:
+            score = result.get("score")
+            if score is not None and score < score_threshold:
+                continue
+            rank += 1
+            key = _result_key(result)
+            entry = fused.get(key)
+            if entry is None:
+                entry = fused[key] = {**result, "score": 0.0, "sources": []}
+            entry["score"] += 1 / (rff_k + rank)
+            entry["sources"].append({"collection": collection, "rank": rank, "score": score})
+    return sorted(fused.values(), key=lambda entry: entry["score"], reverse=True)[:k]
+
+
+async def fan_out_search(request: SearchRequest, client: httpx.AsyncClient) -> dict:
+    """Search every collection concurrently and fuse what arrives in time.
+
+    Collections still running at the deadline are cancelled and reported as
+    timed out; failed ones are reported with their error. The fused list is
+    built from the others.
+
+    Args:
+        request (SearchRequest): The search.
+        client (httpx.AsyncClient): The shared Albert client.
+
+    Raises:
+        HTTPException: 400 on too many collections, 502 or 504 if none answered.
+
+    Returns:
+        dict: {"object": "list", "data": [...], "sources": [...], "partial": bool}.
+    """
+    collections = list(dict.fromkeys(request.collections))
+    if not collections or len(collections) > SEARCH_MAX_COLLECTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Between 1 and {SEARCH_MAX_COLLECTIONS} collections are required",
+        )
+
+    semaphore = asyncio.Semaphore(SEARCH_CONCURRENCY)
+    sources: Dict[str, dict] = {collection: {"collection": collection} for collection in collections}
+    started = time.monotonic()
+
+    async def timed(collection: str) -> List[dict]:
+        async with semaphore:
+            source_started = time.monotonic()
+            try:
+                return await search_collection(collection, request, client)
+            finally:
+                sources[collection]["latency_ms"] = (time.monotonic() - source_started) * 1000
+
+    tasks = {asyncio.create_task(timed(collection)): collection for collection in collections}
+    _, pending = await asyncio.wait(tasks, timeout=request.deadline or SEARCH_DEADLINE)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+
+    rankings: Dict[str, List[dict]] = {}
+    for task, collection in tasks.items():
+        source = sources[collection]
+        if task in pending:
+            source["status"] = "timeout"
+        elif task.exception() is not None:
+            error = task.exception()
+            source["status"] = "error"
+            source["error"] = error.detail if isinstance(error, HTTPException) else str(error)
+        else:
+            rankings[collection] = task.result()
+            source["status"] = "ok"
+            source["results"] = len(rankings[collection])
+
+    if not rankings:
+        raise HTTPException(
+            status_code=504 if pending else 502,
+            detail={"message": "No collection answered", "sources": list(sources.values())},
+        )
+
+    return {
+        "object": "list",
+        "data": reciprocal_rank_fusion(rankings, request.rff_k, request.k, request.score_threshold),
+        "sources": list(sources.values()),
+        "partial": len(rankings) < len(collections),
+        "elapsed_ms": (time.monotonic() - started) * 1000,
+    }
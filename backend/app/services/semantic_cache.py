@@ -0,0 +1,247 @@
+"""Opt-in semantic cache of chat completions keyed by question similarity"""
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+import zlib
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+import httpx
+import numpy as np
+from dotenv import load_dotenv
+from fastapi import Response
+
+from app.functions.login_function import ALBERT_API_BASE_URL, get_timeout
+from app.services.response_cache import CACHE_STATUS_HEADER
+from app.services.upstream import send_upstream
+
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+SEMANTIC_CACHE_CAPACITY = int(os.getenv("SEMANTIC_CACHE_CAPACITY", "4096"))
+# Minimum cosine similarity between two questions to reuse an answer.
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+# Albert embeddings model; empty to use the local hashing embedder.
+SEMANTIC_CACHE_EMBEDDING_MODEL = os.getenv("SEMANTIC_CACHE_EMBEDDING_MODEL", "")
+# Dimension of the local hashing embedder.
+SEMANTIC_CACHE_HASH_DIM = int(os.getenv("SEMANTIC_CACHE_HASH_DIM", "512"))
+
+SIMILARITY_HEADER = "X-Semantic-Similarity"
+
+_WORD = re.compile(r"\w+")
+
+
+def hash_embedding(text: str, dim: int = SEMANTIC_CACHE_HASH_DIM) -> np.ndarray:
+    """Embed text locally by hashing its words and word pairs into `dim` buckets.
+
+    Only catches rewordings that share most words, but needs no upstream call.
+
+    Args:
+        text (str): Text to embed.
+        dim (int): Vector size.
+
+    Returns:
+        np.ndarray: Unit float32 vector, zero for text without words.
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    words = _WORD.findall(text.lower())
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    for feature in features:
+        digest = zlib.crc32(feature.encode())
+        vector[digest % dim] += 1.0 if digest & 0x80000000 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+async def upstream_embedding(text: str, client: httpx.AsyncClient) -> np.ndarray:
+    """Embed text with SEMANTIC_CACHE_EMBEDDING_MODEL on the Albert API.
+
+    Raises:
+        httpx.HTTPError: If the upstream cannot be reached or answers an error.
+
+    Returns:
+        np.ndarray: Unit float32 vector.
+    """
+    response = await send_upstream(
+        client,
+        "POST",
+        f"{ALBERT_API_BASE_URL}/embeddings",
+        model=SEMANTIC_CACHE_EMBEDDING_MODEL,
+        json={"model": SEMANTIC_CACHE_EMBEDDING_MODEL, "input": text},
+        timeout=get_timeout("embeddings"),
+    )
+    response.raise_for_status()
+    vector = np.asarray(response.json()["data"][0]["embedding"], dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def split_question(payload: dict) -> Optional[Tuple[int, str]]:
+    """Split a chat request into its namespace and the question to embed.
+
+    The question is the final user message. The namespace covers every
+    other field of the request: the model, the user, the sampling settings
+    such as temperature or max_tokens, the system prompt and the earlier
+    turns, so an answer is only reused for the same caller and setting.
+
+    Args:
+        payload (dict): ChatRequest dump.
+
+    Returns:
+        Optional[Tuple[int, str]]: (namespace id, question), None if the last
+            message is not from the user.
+    """
+    messages = payload.get("messages") or []
+    if not messages or messages[-1].get("role") != "user":
+        return None
+    question = messages[-1].get("content")
+    if not isinstance(question, str) or not question.strip():
+        return None
+    settings = {key: value for key, value in payload.items() if key not in ("messages", "stream")}
+    context = json.dumps(
+        [settings, [(m.get("role"), m.get("content")) for m in messages[:-1]]],
+        sort_keys=True, ensure_ascii=False, default=str,
+    )
+    digest = hashlib.sha256(context.encode()).digest()
+    return int.from_bytes(digest[:8], "little", signed=True), question
+
+
+class SemanticCache:
+    """Completions indexed by the embedding of their question.
+
+    Vectors live in one preallocated (capacity, dim) float32 matrix, so a
+    lookup is a single matrix-vector product masked to the request's
+    namespace. When full, the least recently used entry is replaced.
+
+    Args:
+        capacity (int): Number of entries.
+        threshold (float): Minimum cosine similarity of a hit.
+        ttl (float): Seconds an entry is served.
+    """
+
+    def __init__(self, capacity: int = SEMANTIC_CACHE_CAPACITY,
+                 threshold: float = SEMANTIC_CACHE_THRESHOLD,
+                 ttl: float = SEMANTIC_CACHE_TTL):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.ttl = ttl
+        self._vectors: Optional[np.ndarray] = None
+        self._namespaces = np.zeros(capacity, dtype=np.int64)
+        self._expires = np.zeros(capacity, dtype=np.float64)
+        self._last_used = np.zeros(capacity, dtype=np.float64)
+        self._values: List[Any] = [None] * capacity
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def lookup(self, namespace: int, vector: np.ndarray) -> Optional[Tuple[Any, float]]:
+        """Return the closest live entry of a namespace above the threshold.
+
+        Returns:
+            Optional[Tuple[Any, float]]: (value, similarity), None on a miss.
+        """
+        if self._vectors is None or vector.shape[0] != self._vectors.shape[1]:
+            return None
+        now = time.monotonic()
+        scores = self._vectors @ vector
+        scores[(self._namespaces != namespace) | (self._expires <= now)] = -np.inf
+        slot = int(np.argmax(scores))
+        if scores[slot] < self.threshold:
+            return None
+        self._last_used[slot] = now
+        return self._values[slot], float(scores[slot])
+
+    def store(self, namespace: int, vector: np.ndarray, value: Any) -> None:
+        """Insert an entry, replacing an expired or the least recently used one."""
+        if self._vectors is None or vector.shape[0] != self._vectors.shape[1]:
+            # Allocated once the embedder's dimension is known.
+            self._vectors = np.zeros((self.capacity, vector.shape[0]), dtype=np.float32)
+            self._expires.fill(0)
+            self._values = [None] * self.capacity
+        now = time.monotonic()
+        slot = int(np.argmin(np.where(self._expires > now, self._last_used, -np.inf)))
+        self._vectors[slot] = vector
+        self._namespaces[slot] = namespace
+        self._expires[slot] = now + self.ttl
+        self._last_used[slot] = now
+        self._values[slot] = value
+
+    async def embed(self, text: str, client: httpx.AsyncClient) -> np.ndarray:
+        """Embed a question upstream if a model is configured, locally otherwise."""
+        if SEMANTIC_CACHE_EMBEDDING_MODEL:
+            return await upstream_embedding(text, client)
+        return hash_embedding(text)
+
+    async def get_or_call(
+        self,
+        payload: dict,
+        call: Callable[[], Awaitable[Any]],
+        response: Response,
+        client: httpx.AsyncClient,
+        bypass: bool = False,
+    ) -> Any:
+        """Serve a similar question's answer, or call upstream and store it.
+
+        Does nothing unless SEMANTIC_CACHE_ENABLED. Hits set X-Cache to
+        SEMANTIC-HIT and X-Semantic-Similarity to the cosine similarity.
+        Embedding errors are logged and the call goes through uncached.
+
+        Args:
+            payload (dict): ChatRequest dump.
+            call (Callable[[], Awaitable[Any]]): Performs the upstream call.
+            response (Response): Response whose headers are updated.
+            client (httpx.AsyncClient): The shared Albert client.
+            bypass (bool): Skip the lookup but store the new answer.
+
+        Returns:
+            Any: The completion.
+        """
+        split = split_question(payload) if SEMANTIC_CACHE_ENABLED and not payload.get("stream") else None
+        if split is None:
+            return await call()
+        namespace, question = split
+
+        try:
+            vector = await self.embed(question, client)
+        except (httpx.HTTPError, KeyError, IndexError, ValueError) as e:
+            self.errors += 1
+            logger.warning("Semantic cache embedding failed: %s", e)
+            return await call()
+
+        if not bypass:
+            found = self.lookup(namespace, vector)
+            if found is not None:
+                self.hits += 1
+                value, similarity = found
+                response.headers[CACHE_STATUS_HEADER] = "SEMANTIC-HIT"
+                response.headers[SIMILARITY_HEADER] = f"{similarity:.4f}"
+                return value
+
+        self.misses += 1
+        value = await call()
+        self.store(namespace, vector, value)
+        return value
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and occupancy."""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": SEMANTIC_CACHE_ENABLED,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_ratio": self.hits / lookups if lookups else None,
+            "entries": int(np.count_nonzero(self._expires > time.monotonic())),
+            "capacity": self.capacity,
+            "threshold": self.threshold,
+            "embedder": SEMANTIC_CACHE_EMBEDDING_MODEL or "local-hashing",
+        }
+
+
+semantic_cache = SemanticCache()
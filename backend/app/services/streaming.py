@@ -0,0 +1,76 @@
+"""Relay streamed upstream responses to the client"""
+import httpx
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.services.upstream import send_upstream
+
+
+class UpstreamStreamingResponse(StreamingResponse):
+    """Streaming response that relays an open upstream response chunk by chunk.
+
+    Chunks are relayed with their Content-Encoding removed, since the client
+    only gets the upstream Content-Type; the events themselves are not parsed.
+    The upstream response is always closed once the relay ends, including when
+    the client disconnects mid-stream, which cancels the upstream generation.
+    """
+
+    def __init__(self, upstream: httpx.Response, **kwargs):
+        self.upstream = upstream
+        super().__init__(
+            upstream.aiter_bytes(),
+            status_code=upstream.status_code,
+            media_type=upstream.headers.get("content-type", "text/event-stream"),
+            **kwargs,
+        )
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.upstream.aclose()
+
+
+async def stream_upstream(
+    client: httpx.AsyncClient,
+    url: str,
+    payload: dict,
+    timeout: httpx.Timeout,
+) -> UpstreamStreamingResponse:
+    """Send a request upstream and relay its server-sent events as they arrive.
+
+    Args:
+        client (httpx.AsyncClient): The shared Albert client.
+        url (str): Upstream URL to post to.
+        payload (dict): JSON body of the request.
+        timeout (httpx.Timeout): Timeout, the read part applies between chunks.
+
+    Raises:
+        HTTPException: If the upstream cannot be reached or answers an error.
+
+    Returns:
+        UpstreamStreamingResponse: Response relaying the decoded upstream bytes.
+    """
+    try:
+        response = await send_upstream(
+            client, "POST", url, model=payload.get("model"), stream=True,
+            json=payload, timeout=timeout,
+        )
+    except httpx.RequestError as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Request to origin API failed: {e}"
+        ) from e
+
+    if response.is_error:
+        await response.aread()
+        await response.aclose()
+        raise HTTPException(
+            status_code=response.status_code,
+            detail=f"Error response from origin API: {response.text}"
+        )
+
+    return UpstreamStreamingResponse(
+        response,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,150 @@
+"""Content-addressed cache of audio transcriptions"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Awaitable, BinaryIO, Callable, Optional
+
+from dotenv import load_dotenv
+from fastapi import Response
+from starlette.concurrency import run_in_threadpool
+
+from app.services.response_cache import CACHE_STATUS_HEADER, LRUDiskStore
+
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIPTION_CACHE_ENABLED = os.getenv("TRANSCRIPTION_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+TRANSCRIPTION_CACHE_DIR = os.getenv("TRANSCRIPTION_CACHE_DIR", "transcription_cache")
+# Bytes of transcriptions kept on disk, the least recently used go first.
+TRANSCRIPTION_CACHE_MAX_BYTES = int(os.getenv("TRANSCRIPTION_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_audio(fileobj: BinaryIO) -> str:
+    """SHA-256 of a seekable file read in chunks, leaving it at the start.
+
+    Args:
+        fileobj (BinaryIO): The audio file.
+
+    Returns:
+        str: Hex digest.
+    """
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    for chunk in iter(lambda: fileobj.read(HASH_CHUNK_SIZE), b""):
+        digest.update(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+def transcription_key(audio_digest: str, params: dict) -> str:
+    """Cache key of an audio file transcribed with the given parameters.
+
+    Args:
+        audio_digest (str): SHA-256 of the audio bytes.
+        params (dict): model, language, prompt, response_format, temperature,
+            timestamp_granularities and any option changing the result.
+
+    Returns:
+        str: Hex SHA-256 digest.
+    """
+    canonical = json.dumps(params, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(f"{audio_digest}\n{canonical}".encode()).hexdigest()
+
+
+class TranscriptionCache:
+    """Transcriptions on disk keyed by audio content and parameters.
+
+    The store is created in a worker thread on first use, its scan of the
+    directory being blocking.
+
+    Args:
+        directory (str): Where transcriptions are kept, empty to disable the cache.
+        max_bytes (int): Total size of the transcriptions kept.
+    """
+
+    def __init__(self, directory: str = TRANSCRIPTION_CACHE_DIR, max_bytes: int = TRANSCRIPTION_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._store: Optional[LRUDiskStore] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def _run(self, operation: Callable, *args) -> Any:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._store is None:
+                self._store = await run_in_threadpool(LRUDiskStore, self.directory, self.max_bytes)
+            return await run_in_threadpool(operation, self._store, *args)
+
+    async def get_or_call(
+        self,
+        fileobj: BinaryIO,
+        params: dict,
+        call: Callable[[], Awaitable[Any]],
+        response: Optional[Response] = None,
+        bypass: bool = False,
+    ) -> Any:
+        """Serve a transcription from the cache, or call upstream and store it.
+
+        Sets the X-Cache response header to HIT, MISS or BYPASS.
+        Transcriptions with failed segments are not stored, and store errors
+        are logged without failing the request.
+
+        Args:
+            fileobj (BinaryIO): Seekable audio file, hashed then rewound.
+            params (dict): Parameters changing the transcription.
+            call (Callable[[], Awaitable[Any]]): Performs the upstream call.
+            response (Optional[Response]): Response whose headers are updated.
+            bypass (bool): Skip the lookup but refresh the stored entry.
+
+        Returns:
+            Any: The transcription.
+        """
+        if not (TRANSCRIPTION_CACHE_ENABLED and self.directory):
+            return await call()
+
+        key = transcription_key(await run_in_threadpool(hash_audio, fileobj), params)
+        if not bypass:
+            try:
+                record = await self._run(LRUDiskStore.read, key)
+            except OSError as e:
+                logger.warning("Transcription cache unavailable: %s", e)
+                record = None
+            if record is not None:
+                self.hits += 1
+                if response is not None:
+                    response.headers[CACHE_STATUS_HEADER] = "HIT"
+                return record["value"]
+
+        self.misses += 1
+        value = await call()
+        if not (isinstance(value, dict) and value.get("failed_segments")):
+            try:
+                await self._run(LRUDiskStore.write, key, {"params": params, "value": value})
+            except OSError as e:
+                logger.warning("Could not store transcription %s: %s", key, e)
+        if response is not None:
+            response.headers[CACHE_STATUS_HEADER] = "BYPASS" if bypass else "MISS"
+        return value
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the size of the store."""
+        return {
+            "enabled": TRANSCRIPTION_CACHE_ENABLED and bool(self.directory),
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._store) if self._store is not None else None,
+            "bytes": self._store.total_bytes if self._store is not None else None,
+            "max_bytes": self.max_bytes,
+            "directory": self.directory,
+        }
+
+
+transcription_cache = TranscriptionCache()
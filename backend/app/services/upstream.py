@@ -0,0 +1,180 @@
+"""Single path for every call to the Albert API"""
+import logging
+import time
+from typing import AsyncIterator, Callable, Optional
+
+import httpx
+
+from app.services.health import circuit_breaker
+from app.services.limiter import model_limiter, parse_retry_after
+from app.services import metrics
+from app.services.upstream_pool import UPSTREAM_EJECT_SECONDS, can_fail_over, upstream_pool
+
+
+logger = logging.getLogger(__name__)
+
+OVERLOAD_STATUS_CODES = (429, 503)
+
+
+class _SlotHoldingStream(httpx.AsyncByteStream):
+    """Body of a streamed response that gives its limiter slot back on close."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release: Callable[[], None]):
+        self._stream = stream
+        self._release: Optional[Callable[[], None]] = release
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if self._release is not None:
+                release, self._release = self._release, None
+                release()
+
+
+async def _send(client: httpx.AsyncClient, upstream_request: httpx.Request, stream: bool) -> httpx.Response:
+    """Send one request, counting and timing it in the upstream metrics."""
+    path = metrics.upstream_path(upstream_request.url.path)
+    started = time.monotonic()
+    metrics.upstream_in_flight.inc((path,))
+    try:
+        response = await client.send(upstream_request, stream=stream)
+    except httpx.RequestError:
+        metrics.upstream_requests.inc((path, "error"))
+        raise
+    finally:
+        metrics.upstream_in_flight.dec((path,))
+    metrics.upstream_requests.inc((path, str(response.status_code)))
+    metrics.upstream_duration.observe((path,), time.monotonic() - started)
+    metrics.upstream_request_bytes.inc((path,), int(upstream_request.headers.get("Content-Length", 0)))
+    if not stream:
+        metrics.upstream_response_bytes.inc((path,), len(response.content))
+    return response
+
+
+async def _send_pooled(client: httpx.AsyncClient, method: str, url: str, stream: bool,
+                       kwargs: dict) -> httpx.Response:
+    """Send to the least-loaded pool member, failing over to others when allowed.
+
+    URLs outside ALBERT_API_BASE_URL go out unchanged. Connection errors,
+    429 and 5xx count against the member; a 429 ejects it for Retry-After.
+    The last answer or error is returned once failover is not allowed or
+    UPSTREAM_MAX_ATTEMPTS members were tried.
+    """
+    if not upstream_pool.routes(url):
+        return await _send(client, client.build_request(method, url, **kwargs), stream)
+
+    tried = []
+    while True:
+        member = upstream_pool.pick(exclude=tried)
+        tried.append(member)
+        last = len(tried) >= upstream_pool.max_attempts()
+        upstream_request = client.build_request(method, upstream_pool.rewrite(url, member), **kwargs)
+        if member.api_key:
+            upstream_request.headers["Authorization"] = f"Bearer {member.api_key}"
+
+        member.in_flight += 1
+        started = time.monotonic()
+        try:
+            response = await _send(client, upstream_request, stream)
+        except httpx.RequestError as e:
+            member.record(False, time.monotonic() - started)
+            reached = not isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout))
+            if last or not can_fail_over(upstream_request, reached):
+                raise
+            logger.warning("Albert upstream %s failed, failing over: %s", member.name, e)
+            continue
+        finally:
+            member.in_flight -= 1
+
+        latency = time.monotonic() - started
+        if response.status_code == 429:
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            member.record(False, latency, eject_for=retry_after or UPSTREAM_EJECT_SECONDS)
+            reached = False
+        elif response.status_code >= 500:
+            member.record(False, latency)
+            reached = True
+        else:
+            member.record(True, latency)
+            return response
+        if last or not can_fail_over(upstream_request, reached):
+            return response
+        logger.warning("Albert upstream %s answered %s, failing over", member.name, response.status_code)
+        await response.aclose()
+
+
+async def send_upstream(
+    client: httpx.AsyncClient,
+    method: str,
+    url: str,
+    model: Optional[str] = None,
+    stream: bool = False,
+    **kwargs,
+) -> httpx.Response:
+    """Send a request to the Albert API.
+
+    Calls fail fast with 503 while the circuit breaker is open, and their
+    outcome feeds the breaker. Calls naming a model also go through that
+    model's adaptive concurrency limit: they may queue for a slot, and their
+    outcome feeds the limit back. With stream=True the slot is held until the
+    response is closed, so streamed generations count against the limit for
+    as long as they run; callers must close it. Calls under ALBERT_API_BASE_URL are routed
+    to a member of the upstream pool, with failover. Every call is counted
+    and timed in the upstream metrics.
+
+    Args:
+        client (httpx.AsyncClient): The shared Albert client.
+        method (str): HTTP method.
+        url (str): Upstream URL.
+        model (Optional[str]): Model the call is for, if any.
+        stream (bool): Return without reading the body.
+        **kwargs: Passed to httpx.AsyncClient.build_request.
+
+    Raises:
+        HTTPException: 503 if the circuit is open or the model's queue does
+            not drain in time.
+        httpx.RequestError: If the upstream cannot be reached.
+
+    Returns:
+        httpx.Response: The upstream response, status not checked.
+    """
+    limit = model_limiter.get(model) if model is not None else None
+    if limit is not None:
+        await limit.acquire()
+    response = None
+    try:
+        circuit_breaker.check()
+        started = time.monotonic()
+        try:
+            response = await _send_pooled(client, method, url, stream, kwargs)
+        except httpx.RequestError as e:
+            circuit_breaker.record(False, time.monotonic() - started)
+            if limit is not None:
+                limit.on_failure()
+                if isinstance(e, httpx.TimeoutException):
+                    limit.on_overload()
+            raise
+        finally:
+            circuit_breaker.release()
+    finally:
+        if limit is not None:
+            if stream and response is not None:
+                response.stream = _SlotHoldingStream(response.stream, limit.release)
+            else:
+                limit.release()
+
+    latency = time.monotonic() - started
+    circuit_breaker.record(response.status_code < 500, latency)
+    if limit is not None:
+        if response.status_code in OVERLOAD_STATUS_CODES:
+            limit.on_overload(parse_retry_after(response.headers.get("Retry-After")))
+        elif response.status_code < 500:
+            limit.on_success(latency)
+        if response.status_code >= 500:
+            limit.on_failure()
+    return response
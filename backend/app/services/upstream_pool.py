@@ -0,0 +1,176 @@
+"""Least-loaded routing over several Albert upstreams and API keys"""
+import hashlib
+import logging
+import os
+import random
+import time
+from itertools import product
+from typing import Collection, List, Optional
+
+import httpx
+from dotenv import load_dotenv
+
+from app.functions.login_function import ALBERT_API_BASE_URL, ALBERT_API_BASE_URLS, ALBERT_API_KEYS
+
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Weight of the newest sample in the latency moving average.
+UPSTREAM_EWMA_ALPHA = float(os.getenv("UPSTREAM_EWMA_ALPHA", "0.3"))
+# Consecutive failures after which a member is ejected.
+UPSTREAM_EJECT_FAILURES = int(os.getenv("UPSTREAM_EJECT_FAILURES", "3"))
+# Ejection length, doubled on each ejection in a row up to the maximum.
+UPSTREAM_EJECT_SECONDS = float(os.getenv("UPSTREAM_EJECT_SECONDS", "10"))
+UPSTREAM_EJECT_MAX_SECONDS = float(os.getenv("UPSTREAM_EJECT_MAX_SECONDS", "300"))
+# Members tried per call, failovers included.
+UPSTREAM_MAX_ATTEMPTS = int(os.getenv("UPSTREAM_MAX_ATTEMPTS", "3"))
+
+IDEMPOTENT_METHODS = frozenset(("GET", "HEAD", "OPTIONS", "PUT", "DELETE"))
+
+
+class UpstreamMember:
+    """One base URL used with one API key.
+
+    Args:
+        base_url (str): Base URL of the Albert API, e.g. https://host/v1.
+        api_key (Optional[str]): Bearer token sent to it.
+    """
+
+    def __init__(self, base_url: str, api_key: Optional[str]):
+        self.base_url = base_url
+        self.api_key = api_key
+        fingerprint = hashlib.sha256((api_key or "").encode()).hexdigest()[:8]
+        self.name = f"{base_url}#{fingerprint}"
+        self.in_flight = 0
+        self.latency: Optional[float] = None
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+
+    def ejected(self, now: float) -> bool:
+        """Tell whether the member is out of rotation."""
+        return now < self.ejected_until
+
+    def load(self) -> float:
+        """Expected wait of one more call: latency times calls in flight.
+
+        Members without a latency sample yet score 0 so they get one.
+        """
+        return (self.in_flight + 1) * (self.latency or 0.0)
+
+    def record(self, ok: bool, latency: float, eject_for: Optional[float] = None) -> None:
+        """Fold the outcome of a call into the moving average and health.
+
+        Args:
+            ok (bool): False for connection errors, 429 and 5xx.
+            latency (float): Duration in seconds.
+            eject_for (Optional[float]): Seconds to eject the member at once,
+                for a key that is rate limited.
+        """
+        self.requests += 1
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += UPSTREAM_EWMA_ALPHA * (latency - self.latency)
+        if ok:
+            self.consecutive_failures = 0
+            self.ejections = 0
+            self.ejected_until = 0.0
+            return
+        self.failures += 1
+        self.consecutive_failures += 1
+        if eject_for is not None:
+            self.eject(eject_for)
+        elif self.consecutive_failures >= UPSTREAM_EJECT_FAILURES:
+            self.eject(min(UPSTREAM_EJECT_SECONDS * 2 ** self.ejections, UPSTREAM_EJECT_MAX_SECONDS))
+
+    def eject(self, seconds: float) -> None:
+        """Take the member out of rotation for `seconds`."""
+        logger.warning("Ejecting Albert upstream %s for %.0f s", self.name, seconds)
+        self.ejections += 1
+        self.ejected_until = time.monotonic() + seconds
+
+    def stats(self, now: float) -> dict:
+        """Load, latency and health of the member."""
+        return {
+            "name": self.name,
+            "base_url": self.base_url,
+            "in_flight": self.in_flight,
+            "latency_ewma_ms": self.latency * 1000 if self.latency is not None else None,
+            "requests": self.requests,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "ejected": self.ejected(now),
+            "ejected_for_seconds": max(0.0, self.ejected_until - now),
+            "ejection_streak": self.ejections,
+        }
+
+
+class UpstreamPool:
+    """Picks the member with the lowest expected wait for each call.
+
+    Members are the base URLs paired with the keys: position by position
+    when both lists have the same length, every combination otherwise.
+    Ejected members are skipped while others remain; if all are ejected,
+    the one coming back first is used.
+
+    Args:
+        base_url (Optional[str]): URL prefix the code builds URLs from.
+        base_urls (List[str]): Upstream base URLs.
+        api_keys (List[str]): API keys.
+    """
+
+    def __init__(self, base_url: Optional[str], base_urls: List[str], api_keys: List[str]):
+        self.base_url = base_url
+        keys = api_keys or [None]
+        pairs = zip(base_urls, keys) if len(base_urls) == len(keys) else product(base_urls, keys)
+        self.members = [UpstreamMember(url, key) for url, key in pairs]
+
+    def routes(self, url: str) -> bool:
+        """Tell whether a URL points under the pooled base URL."""
+        return bool(self.members) and self.base_url is not None and url.startswith(self.base_url)
+
+    def max_attempts(self) -> int:
+        """Members tried per call at most."""
+        return max(1, min(UPSTREAM_MAX_ATTEMPTS, len(self.members)))
+
+    def pick(self, exclude: Collection[UpstreamMember] = ()) -> UpstreamMember:
+        """Least-loaded healthy member not in `exclude`."""
+        now = time.monotonic()
+        candidates = [member for member in self.members if member not in exclude] or self.members
+        healthy = [member for member in candidates if not member.ejected(now)]
+        if not healthy:
+            return min(candidates, key=lambda member: member.ejected_until)
+        return min(healthy, key=lambda member: (member.load(), random.random()))
+
+    def rewrite(self, url: str, member: UpstreamMember) -> str:
+        """Move a URL built from the base URL onto a member."""
+        return member.base_url + url[len(self.base_url):]
+
+    def stats(self) -> List[dict]:
+        """Stats of every member."""
+        now = time.monotonic()
+        return [member.stats(now) for member in self.members]
+
+
+def can_fail_over(request: httpx.Request, reached: bool) -> bool:
+    """Tell whether a failed call may be sent again to another member.
+
+    The body must be replayable. Calls that never reached the upstream, or
+    were refused with 429, may be replayed whatever their method; calls the
+    upstream may have processed only when their method is idempotent.
+
+    Args:
+        request (httpx.Request): The call that failed.
+        reached (bool): Whether the upstream may have processed it.
+    """
+    if not isinstance(request.stream, httpx.ByteStream):
+        return False
+    return not reached or request.method in IDEMPOTENT_METHODS
+
+
+upstream_pool = UpstreamPool(ALBERT_API_BASE_URL, ALBERT_API_BASE_URLS, ALBERT_API_KEYS)
@@ -0,0 +1 @@
+"""Benchmarks of the backend, run from the backend directory with python -m"""
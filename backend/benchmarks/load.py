@@ -0,0 +1,280 @@
+"""Load test of the backend against the mock Albert API.
+
+Starts benchmarks.mock_albert under uvicorn, points the backend at it and
+drives app.main in process at a fixed request rate, one endpoint after
+the other. Requests are sent open loop: they go out on schedule whether
+or not earlier ones have answered, so queueing shows up in the latency.
+
+Run from the backend directory:
+
+    python -m benchmarks.load --rps 50 --duration 20 --output report.json
+    python -m benchmarks.load --profile slow.json --baseline report.json
+
+The JSON report holds, per endpoint, p50/p95/p99 latency, throughput,
+error rate and peak RSS of the process. With --baseline the run is
+compared to an earlier report.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+import uuid
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+
+def free_port() -> int:
+    """A TCP port nobody listens on."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_mock(port: int) -> subprocess.Popen:
+    """Run the mock Albert API and wait until it answers."""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.mock_albert:app",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning", "--no-access-log"],
+    )
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("Mock Albert API exited at startup")
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("Mock Albert API did not start")
+
+
+def configure_backend(port: int) -> None:
+    """Point the backend at the mock before app.main reads its settings.
+
+    Rate limiting stays off even if a .env file turns it on, unless set in
+    the environment, since every request comes from the same caller.
+    """
+    base_url = f"http://127.0.0.1:{port}/v1"
+    os.environ["ALBERT_API_BASE_URL"] = base_url
+    os.environ["ALBERT_API_HEALTH_URL"] = f"http://127.0.0.1:{port}/health"
+    os.environ.setdefault("ALBERT_API_KEY", "benchmark")
+    os.environ.setdefault("ALBERT_HTTP2", "false")
+    os.environ.setdefault("RATE_LIMIT_RPS", "0")
+    os.environ.setdefault("RATE_LIMIT_TOKENS_PER_MINUTE", "0")
+
+
+class Scenario(NamedTuple):
+    """One endpoint under load; `build` returns the httpx request arguments."""
+    method: str
+    path: str
+    build: Callable[[int], dict]
+
+
+def chat_payload(index: int, stream: bool = False) -> dict:
+    """A chat request the response cache will not answer."""
+    return {"json": {
+        "model": "mock/model-1",
+        "user": "benchmark",
+        "stream": stream,
+        "temperature": 0.7,
+        "messages": [{"role": "user", "name": "benchmark", "content": f"Question {index}: what is Albert?"}],
+    }}
+
+
+AUDIO = b"RIFF" + bytes(32 * 1024)
+DOCUMENT = json.dumps([{"title": "benchmark", "text": "lorem ipsum " * 1000}]).encode()
+
+SCENARIOS: Dict[str, Scenario] = {
+    "models": Scenario("GET", "/models", lambda i: {}),
+    "collections": Scenario("GET", "/collections", lambda i: {}),
+    "chat": Scenario("POST", "/chat-completion/", chat_payload),
+    "chat_stream": Scenario("POST", "/chat-completion/", lambda i: chat_payload(i, stream=True)),
+    "completions": Scenario("POST", "/completions", lambda i: {"json": {
+        "model": "mock/model-1", "prompt": f"Prompt {i}", "temperature": 0.7,
+    }}),
+    "upload": Scenario("POST", "/upload", lambda i: {
+        "files": {"file": ("benchmark.json", DOCUMENT, "application/json")},
+        "data": {"collection": "collection-1"},
+    }),
+    "transcription": Scenario("POST", "/transcribe/", lambda i: {
+        "files": {"file": ("benchmark.wav", AUDIO, "audio/wav")},
+        "data": {"language": "fr", "temperature": str(0.1 + (i % 1000) / 10000)},
+    }),
+}
+
+
+def current_rss() -> int:
+    """Resident set size of the process in bytes."""
+    try:
+        with open("/proc/self/statm", encoding="ascii") as handle:
+            return int(handle.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        return peak_rss()
+
+
+def peak_rss() -> int:
+    """Highest resident set size of the process so far, in bytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if platform.system() == "Darwin" else peak * 1024
+
+
+def percentile(ordered: List[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of sorted values."""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+async def run_scenario(client, scenario: Scenario, rps: float, duration: float,
+                       max_in_flight: int) -> dict:
+    """Send `rps` requests per second for `duration` seconds and summarize them."""
+    loop = asyncio.get_running_loop()
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    in_flight = 0
+    dropped = 0
+    peak = current_rss()
+
+    async def one(index: int):
+        nonlocal in_flight
+        in_flight += 1
+        started = time.perf_counter()
+        try:
+            response = await client.request(scenario.method, scenario.path, **scenario.build(index))
+            status = str(response.status_code)
+            if response.status_code < 400:
+                latencies.append(time.perf_counter() - started)
+        except Exception as e:
+            status = type(e).__name__
+        finally:
+            in_flight -= 1
+        statuses[status] = statuses.get(status, 0) + 1
+
+    async def sample_rss():
+        nonlocal peak
+        while True:
+            peak = max(peak, current_rss())
+            await asyncio.sleep(0.1)
+
+    sampler = asyncio.create_task(sample_rss())
+    tasks = []
+    total = max(1, int(rps * duration))
+    started = loop.time()
+    for index in range(total):
+        delay = started + index / rps - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if in_flight >= max_in_flight:
+            dropped += 1
+            continue
+        tasks.append(asyncio.create_task(one(index)))
+    await asyncio.gather(*tasks)
+    elapsed = loop.time() - started
+    sampler.cancel()
+    peak = max(peak, current_rss())
+
+    latencies.sort()
+    errors = total - len(latencies)
+    return {
+        "requests": total,
+        "ok": len(latencies),
+        "errors": errors,
+        "dropped": dropped,
+        "error_rate": round(errors / total, 4),
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": _ms(percentile(latencies, 0.50)),
+        "p95_ms": _ms(percentile(latencies, 0.95)),
+        "p99_ms": _ms(percentile(latencies, 0.99)),
+        "max_ms": _ms(latencies[-1] if latencies else None),
+        "statuses": statuses,
+        "peak_rss_mb": round(peak / 2 ** 20, 1),
+    }
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+async def run(args: argparse.Namespace) -> dict:
+    """Load every selected endpoint in turn against one app instance."""
+    import httpx
+    from app.main import app
+
+    report = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "run_id": uuid.uuid4().hex[:8],
+        "config": {"rps": args.rps, "duration": args.duration, "max_in_flight": args.max_in_flight,
+                   "profile": json.loads(os.environ.get("MOCK_PROFILE") or "{}")},
+        "endpoints": {},
+    }
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://backend", timeout=None) as client:
+            for name in args.endpoints:
+                result = await run_scenario(client, SCENARIOS[name], args.rps, args.duration, args.max_in_flight)
+                report["endpoints"][name] = result
+                print(f"{name:<14} p50 {result['p50_ms']} ms  p95 {result['p95_ms']} ms  "
+                      f"p99 {result['p99_ms']} ms  {result['throughput_rps']} req/s  "
+                      f"errors {result['error_rate']:.2%}  rss {result['peak_rss_mb']} MB")
+    report["peak_rss_mb"] = round(peak_rss() / 2 ** 20, 1)
+    return report
+
+
+def compare(report: dict, baseline: dict) -> None:
+    """Print the change of each metric from a baseline report."""
+    print("\nChange from baseline:")
+    for name, result in report["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(name)
+        if not before:
+            continue
+        changes = []
+        for metric in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps", "error_rate", "peak_rss_mb"):
+            old, new = before.get(metric), result.get(metric)
+            if old is None or new is None:
+                continue
+            change = f"{(new - old) / old:+.1%}" if old else f"{new - old:+g}"
+            changes.append(f"{metric} {change}")
+        print(f"{name:<14} " + "  ".join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rps", type=float, default=20, help="Requests per second per endpoint")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds of load per endpoint")
+    parser.add_argument("--max-in-flight", type=int, default=1000,
+                        help="Requests skipped, and counted as errors, beyond this many in flight")
+    parser.add_argument("--endpoints", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--profile", help="JSON file of mock latency and error settings per group")
+    parser.add_argument("--output", default="benchmark-report.json", help="Where to write the report")
+    parser.add_argument("--baseline", help="Earlier report to compare with")
+    args = parser.parse_args()
+
+    if args.profile:
+        with open(args.profile, encoding="utf-8") as handle:
+            os.environ["MOCK_PROFILE"] = handle.read()
+    port = free_port()
+    mock = start_mock(port)
+    try:
+        configure_backend(port)
+        report = asyncio.run(run(args))
+    finally:
+        mock.terminate()
+        mock.wait()
+
+    with open(args.output, "w", encoding="utf-8") as handle:
+        json.dump(report, handle, indent=2)
+    print(f"\nReport written to {args.output}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as handle:
+            compare(report, json.load(handle))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""Local stand-in for the Albert API with configurable latency and errors.
+
+Serve it with uvicorn from the backend directory:
+
+    python -m uvicorn benchmarks.mock_albert:app --port 8901
+
+Each endpoint group draws its latency from a distribution and fails with
+a configurable probability. MOCK_PROFILE holds JSON overriding the
+defaults per group, e.g.
+
+    {"chat": {"latency_ms": 800, "sigma": 0.5, "error_rate": 0.02}}
+
+Groups: catalog, chat, completions, files, transcription, embeddings,
+search. Keys: distribution ("lognormal", "uniform" or "fixed"),
+latency_ms (median), sigma (spread), error_rate, error_status.
+Streamed chat answers send MOCK_STREAM_CHUNKS chunks MOCK_CHUNK_DELAY_MS apart.
+"""
+import asyncio
+import json
+import os
+import random
+import time
+
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+DEFAULT_PROFILE = {
+    "catalog": {"latency_ms": 20},
+    "chat": {"latency_ms": 300},
+    "completions": {"latency_ms": 200},
+    "files": {"latency_ms": 100},
+    "transcription": {"latency_ms": 500},
+    "embeddings": {"latency_ms": 30},
+    "search": {"latency_ms": 80},
+}
+DEFAULTS = {"distribution": "lognormal", "sigma": 0.3, "error_rate": 0.0, "error_status": 500}
+
+MOCK_STREAM_CHUNKS = int(os.getenv("MOCK_STREAM_CHUNKS", "20"))
+MOCK_CHUNK_DELAY_MS = float(os.getenv("MOCK_CHUNK_DELAY_MS", "10"))
+MOCK_MODELS = int(os.getenv("MOCK_MODELS", "20"))
+MOCK_COLLECTIONS = int(os.getenv("MOCK_COLLECTIONS", "20"))
+
+
+def load_profile() -> dict:
+    """Defaults per group, overridden by the MOCK_PROFILE JSON."""
+    overrides = json.loads(os.getenv("MOCK_PROFILE") or "{}")
+    return {
+        group: {**DEFAULTS, **settings, **overrides.get(group, {})}
+        for group, settings in DEFAULT_PROFILE.items()
+    }
+
+
+PROFILE = load_profile()
+
+app = FastAPI(title="Mock Albert API")
+
+
+def draw_latency(settings: dict) -> float:
+    """Seconds to wait for one call."""
+    median = settings["latency_ms"] / 1000
+    sigma = settings["sigma"]
+    if settings["distribution"] == "fixed" or median <= 0:
+        return max(0.0, median)
+    if settings["distribution"] == "uniform":
+        return random.uniform(median * (1 - sigma), median * (1 + sigma))
+    return random.lognormvariate(0, sigma) * median
+
+
+async def simulate(group: str):
+    """Wait for the group's latency, then return an error response or None."""
+    settings = PROFILE[group]
+    await asyncio.sleep(draw_latency(settings))
+    if random.random() < settings["error_rate"]:
+        return JSONResponse({"detail": "Simulated upstream error"}, status_code=settings["error_status"])
+    return None
+
+
+def model_entry(index: int) -> dict:
+    """One model of the catalog."""
+    return {
+        "id": f"mock/model-{index}",
+        "created": 1700000000,
+        "object": "model",
+        "owned_by": "mock",
+        "max_context_length": 32768,
+        "type": "text-generation" if index % 4 else "text-embeddings-inference",
+        "status": "available",
+        "aliases": [f"model-{index}"],
+    }
+
+
+def completion(model: str, text: str) -> dict:
+    """A chat completion answering `text`."""
+    return {
+        "id": "chatcmpl-mock",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "finish_reason": "stop",
+                     "message": {"role": "assistant", "content": text}}],
+        "usage": {"prompt_tokens": 50, "completion_tokens": 50, "total_tokens": 100},
+    }
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.get("/v1/models")
+async def models():
+    return await simulate("catalog") or {"object": "list", "data": [model_entry(i) for i in range(MOCK_MODELS)]}
+
+
+@app.get("/v1/models/{model_id:path}")
+async def model(model_id: str):
+    return await simulate("catalog") or {**model_entry(0), "id": model_id}
+
+
+@app.get("/v1/collections")
+async def collections():
+    return await simulate("catalog") or {
+        "object": "list",
+        "data": [{"id": f"collection-{i}", "name": f"Collection {i}", "type": "private"}
+                 for i in range(MOCK_COLLECTIONS)],
+    }
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    error = await simulate("chat")
+    if error is not None:
+        return error
+    model_id = body.get("model", "mock/model-1")
+    if not body.get("stream"):
+        return completion(model_id, "lorem ipsum " * MOCK_STREAM_CHUNKS)
+
+    async def events():
+        for _ in range(MOCK_STREAM_CHUNKS):
+            chunk = {"object": "chat.completion.chunk", "model": model_id,
+                     "choices": [{"index": 0, "delta": {"content": "lorem ipsum "}}]}
+            yield f"data: {json.dumps(chunk)}\n\n"
+            await asyncio.sleep(MOCK_CHUNK_DELAY_MS / 1000)
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.post("/v1/completions")
+async def completions(request: Request):
+    body = await request.json()
+    return await simulate("completions") or {
+        "id": "cmpl-mock",
+        "object": "text_completion",
+        "model": body.get("model"),
+        "choices": [{"index": 0, "text": "lorem ipsum", "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 2, "total_tokens": 12},
+    }
+
+
+@app.post("/v1/files")
+async def files(request: Request):
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+    return await simulate("files") or {"id": "file-mock", "bytes": size}
+
+
+@app.post("/v1/audio/transcriptions")
+async def transcriptions(request: Request):
+    await request.body()
+    return await simulate("transcription") or {"text": "lorem ipsum dolor sit amet"}
+
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request):
+    body = await request.json()
+    return await simulate("embeddings") or {
+        "object": "list",
+        "model": body.get("model"),
+        "data": [{"object": "embedding", "index": 0, "embedding": [random.random() for _ in range(64)]}],
+    }
+
+
+@app.post("/v1/search")
+async def search(request: Request):
+    body = await request.json()
+    collection = body["collections"][0]
+    return await simulate("search") or {
+        "object": "list",
+        "data": [{"object": "search", "score": 1 - i / 10,
+                  "chunk": {"id": f"{collection}-{i}", "content": "lorem ipsum", "metadata": {}}}
+                 for i in range(body.get("k", 4))],
+    }
+
+
+@app.api_route("/{path:path}", methods=["GET", "POST", "DELETE"])
+async def not_found(path: str):
+    return Response(status_code=404)
@@ -0,0 +1,124 @@
+"""CPU cost per request of relaying upstream JSON raw versus parsing and re-encoding it.
+
+Catalog routes relay the cached upstream bytes; before, they encoded the
+catalog that was cached parsed. Completion routes still parse the body,
+for usage accounting and caching, but encode with orjson.
+
+Run from the backend directory:
+
+    python -m benchmarks.passthrough --models 500 --iterations 2000
+"""
+import argparse
+import json
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.services.passthrough import FastJSONResponse, RawJSON, relay
+
+
+def models_body(count: int) -> bytes:
+    """An upstream /models body listing `count` models."""
+    return json.dumps({
+        "object": "list",
+        "data": [
+            {
+                "id": f"organization/model-{index}",
+                "created": 1700000000 + index,
+                "object": "model",
+                "owned_by": "albert",
+                "max_context_length": 32768,
+                "type": "text-generation",
+                "status": "available",
+                "aliases": [f"alias-{index}-a", f"alias-{index}-b"],
+            }
+            for index in range(count)
+        ],
+    }).encode()
+
+
+def completion_body(chars: int) -> bytes:
+    """An upstream chat completion body whose answer has `chars` characters."""
+    return json.dumps({
+        "id": "chatcmpl-1",
+        "object": "chat.completion",
+        "created": 1700000000,
+        "model": "organization/model-0",
+        "choices": [{"index": 0, "finish_reason": "stop",
+                     "message": {"role": "assistant", "content": "lorem ipsum " * (chars // 12)}}],
+        "usage": {"prompt_tokens": 100, "completion_tokens": chars // 4, "total_tokens": 100 + chars // 4},
+    }).encode()
+
+
+def encode_cached(content: dict) -> bytes:
+    """What a catalog route cost with the catalog cached parsed: encode, serialize."""
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def parse_and_reencode(body: bytes) -> bytes:
+    """What a route returning response.json() costs: parse, encode, serialize."""
+    return JSONResponse(jsonable_encoder(json.loads(body))).body
+
+
+def raw_relay(body: bytes) -> bytes:
+    """What relay() costs on a cached RawJSON."""
+    return relay(RawJSON(body)).body
+
+
+def parse_and_fast_json(body: bytes) -> bytes:
+    """What completion routes cost: parse for usage and caching, encode with orjson."""
+    return FastJSONResponse(json.loads(body)).body
+
+
+def stdlib_json(content: dict) -> bytes:
+    """Our own JSON through FastAPI's default path."""
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def orjson_json(content: dict) -> bytes:
+    """Our own JSON through fast_json()."""
+    return FastJSONResponse(content).body
+
+
+def cpu_per_call(function, argument, iterations: int) -> float:
+    """Process CPU time of one call, in microseconds."""
+    function(argument)
+    started = time.process_time()
+    for _ in range(iterations):
+        function(argument)
+    return (time.process_time() - started) / iterations * 1e6
+
+
+def main() -> None:
+    """Print the CPU time per request of each path and the savings."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--models", type=int, default=500, help="Models in the /models body")
+    parser.add_argument("--answer-chars", type=int, default=4000, help="Characters of the completion")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    models = models_body(args.models)
+    completion = completion_body(args.answer_chars)
+    reply = {"assistant_reply": json.loads(completion)["choices"][0]["message"]["content"]}
+    cases = [
+        (f"/models ({args.models} models)", (encode_cached, json.loads(models)), (raw_relay, models)),
+        (f"completion ({args.answer_chars} chars)",
+         (parse_and_reencode, completion), (parse_and_fast_json, completion)),
+        ("assistant_reply JSON", (stdlib_json, reply), (orjson_json, reply)),
+    ]
+    report = {}
+    for name, before, after in cases:
+        before_us = cpu_per_call(*before, args.iterations)
+        after_us = cpu_per_call(*after, args.iterations)
+        report[name] = {
+            "before_us": round(before_us, 2),
+            "after_us": round(after_us, 2),
+            "saved_us": round(before_us - after_us, 2),
+            "speedup": round(before_us / after_us, 1) if after_us else None,
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import io
+import wave
+
+import pytest
+from fastapi import HTTPException
+
+from app.services import audio_segments
+from app.services.audio_segments import AudioWindow, WavSegmenter, stitch_transcriptions
+
+
+def wav_file(seconds: float, framerate: int = 8000) -> io.BytesIO:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(framerate)
+        writer.writeframes(bytes(2 * int(seconds * framerate)))
+    buffer.seek(0)
+    return buffer
+
+
+def bounds(segmenter: WavSegmenter):
+    return [(window.start, window.end) for window in segmenter.windows]
+
+
+def test_plan_covers_recording_with_overlap():
+    segmenter = WavSegmenter(wav_file(25), segment_seconds=10, overlap_seconds=2)
+    assert bounds(segmenter) == [(0.0, 10.0), (8.0, 18.0), (16.0, 25.0)]
+
+
+def test_plan_short_recording_is_one_window():
+    segmenter = WavSegmenter(wav_file(3), segment_seconds=10, overlap_seconds=2)
+    assert bounds(segmenter) == [(0.0, 3.0)]
+
+
+def test_plan_last_window_ends_at_recording_end():
+    segmenter = WavSegmenter(wav_file(18), segment_seconds=10, overlap_seconds=2)
+    assert bounds(segmenter) == [(0.0, 10.0), (8.0, 18.0)]
+
+
+@pytest.mark.parametrize("segment_seconds, overlap_seconds", [
+    (0.00001, 0),
+    (1, 0.9999),
+    (0, 0),
+    (5, 5),
+    (5, -1),
+])
+def test_plan_rejects_tiny_steps(segment_seconds, overlap_seconds):
+    with pytest.raises(HTTPException) as error:
+        WavSegmenter(wav_file(5), segment_seconds, overlap_seconds)
+    assert error.value.status_code == 400
+
+
+def test_plan_rejects_too_many_windows(monkeypatch):
+    monkeypatch.setattr(audio_segments, "TRANSCRIPTION_MAX_SEGMENTS", 4)
+    with pytest.raises(HTTPException) as error:
+        WavSegmenter(wav_file(10), segment_seconds=2, overlap_seconds=0)
+    assert error.value.status_code == 400
+    assert len(WavSegmenter(wav_file(8), segment_seconds=2, overlap_seconds=0).windows) == 4
+
+
+def test_stitch_keeps_overlap_speech_once():
+    windows = [AudioWindow(0, 0, 0, 0.0, 10.0), AudioWindow(1, 0, 0, 8.0, 18.0)]
+    results = [
+        {"text": "a b", "segments": [{"start": 0.0, "end": 5.0, "text": "a"},
+                                     {"start": 8.5, "end": 9.5, "text": "b"}]},
+        {"text": "b c", "segments": [{"start": 0.5, "end": 1.5, "text": "b"},
+                                     {"start": 4.0, "end": 6.0, "text": "c"}]},
+    ]
+    stitched = stitch_transcriptions(windows, results, overlap_seconds=2)
+    assert stitched["text"] == "a b c"
+    assert [segment["start"] for segment in stitched["segments"]] == [0.0, 8.5, 12.0]
+    assert [segment["id"] for segment in stitched["segments"]] == [0, 1, 2]
@@ -0,0 +1,20 @@
+import asyncio
+
+from fastapi import HTTPException
+
+from app.services.batch import run_batch
+
+
+def test_item_errors_do_not_fail_the_batch():
+    async def call(item):
+        if item == "bad-json":
+            raise ValueError("Expecting value")
+        if item == "refused":
+            raise HTTPException(status_code=429, detail="slow down")
+        return item
+
+    results = asyncio.run(run_batch(["ok", "bad-json", "refused", HTTPException(422, "invalid")], call))
+
+    assert [result["status_code"] for result in results] == [200, 502, 429, 422]
+    assert results[0]["response"] == "ok"
+    assert "Expecting value" in results[1]["error"]
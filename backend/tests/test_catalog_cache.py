@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+
+from app.services.catalog_cache import CatalogCache
+
+
+def test_failed_load_is_remembered():
+    cache = CatalogCache(ttl=60, stale_ttl=0, error_ttl=60)
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        raise RuntimeError("down")
+
+    async def scenario():
+        for _ in range(3):
+            with pytest.raises(RuntimeError):
+                await cache.get("models", fetch)
+
+    asyncio.run(scenario())
+    assert len(calls) == 1
+    assert cache.unavailable("models")
+
+
+def test_invalidate_forgets_failure():
+    cache = CatalogCache(ttl=60, stale_ttl=0, error_ttl=60)
+    outcomes = [RuntimeError("down"), "catalog"]
+
+    async def fetch():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await cache.get("models", fetch)
+        cache.invalidate("models")
+        return await cache.get("models", fetch)
+
+    assert asyncio.run(scenario()) == "catalog"
+    assert not cache.unavailable("models")
@@ -0,0 +1,34 @@
+import asyncio
+import time
+
+from app.models.models import Job
+from app.services.jobs import InMemoryJobStore
+
+
+def finished(job_id: str, finished_at: float) -> Job:
+    return Job(id=job_id, kind="upload", created_at=finished_at, status="succeeded", finished_at=finished_at)
+
+
+def test_memory_store_bounds_finished_jobs():
+    store = InMemoryJobStore(max_finished=2, ttl=3600)
+    now = time.time()
+
+    async def scenario():
+        await store.save(Job(id="running", kind="upload", created_at=now, status="running"))
+        for index in range(4):
+            await store.save(finished(f"done-{index}", now + index))
+        return await store.list()
+
+    assert sorted(job.id for job in asyncio.run(scenario())) == ["done-2", "done-3", "running"]
+
+
+def test_memory_store_expires_finished_jobs():
+    store = InMemoryJobStore(max_finished=10, ttl=60)
+
+    async def scenario():
+        await store.save(finished("old", time.time() - 120))
+        await store.save(finished("new", time.time()))
+        return await store.get("old"), await store.get("new")
+
+    old, new = asyncio.run(scenario())
+    assert old is None and new.id == "new"
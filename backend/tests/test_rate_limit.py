@@ -0,0 +1,59 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app.services import rate_limit
+from app.services.batch import run_batch
+from app.services.rate_limit import RateLimiter
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_RPS", 20.0)
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_BURST", 2.0)
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_TOKENS_PER_MINUTE", 0.0)
+
+
+def test_admit_rejects_past_burst(limits):
+    limiter = RateLimiter()
+    limiter.admit("user:a")
+    limiter.admit("user:a")
+    with pytest.raises(HTTPException) as error:
+        limiter.admit("user:a")
+    assert error.value.status_code == 429
+    assert error.value.headers["Retry-After"] == "1"
+
+
+def test_batch_items_are_paced_at_user_rate(limits):
+    limiter = RateLimiter()
+    sent = []
+
+    async def forward(item):
+        await limiter.acquire("user:a")
+        sent.append(time.monotonic())
+        return item
+
+    started = time.monotonic()
+    results = asyncio.run(run_batch(list(range(8)), forward, concurrency=8))
+
+    assert all(result["status_code"] == 200 for result in results)
+    # The burst of 2 goes at once, the 6 others at 20 per second.
+    assert sent[-1] - started >= 6 / 20 * 0.9
+    with pytest.raises(HTTPException):
+        limiter.admit("user:a")
+
+
+def test_batch_items_rejected_past_max_wait(limits):
+    limiter = RateLimiter()
+
+    async def forward(item):
+        await limiter.acquire("user:a", max_wait=0.1)
+        return item
+
+    results = asyncio.run(run_batch(list(range(6)), forward, concurrency=6))
+    statuses = sorted(result["status_code"] for result in results)
+    # 2 from the burst and 2 refilled within 0.1 s at most.
+    assert statuses.count(200) <= 4
+    assert statuses.count(429) >= 2
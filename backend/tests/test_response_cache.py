@@ -0,0 +1,53 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services.response_cache import DiskStore, LRUDiskStore, ResponseCache
+
+
+def test_concurrent_writes_of_one_key(tmp_path):
+    store = DiskStore(str(tmp_path))
+    key = "ab" + "0" * 62
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda i: store.write(key, {"value": i}), range(64)))
+
+    assert store.read(key)["value"] in range(64)
+    assert [path.name for path in (tmp_path / "ab").iterdir()] == [f"{key}.json"]
+
+
+def test_lru_store_evicts_least_recently_used(tmp_path):
+    record = {"value": "x" * 100}
+    store = LRUDiskStore(str(tmp_path), max_bytes=350)
+    for key in ("aa1", "bb2", "cc3"):
+        store.write(key, record)
+    store.read("aa1")
+    store.write("dd4", record)
+
+    assert store.read("bb2") is None
+    assert store.read("aa1") == record
+    assert len(store) == 3
+    assert store.total_bytes <= 350
+
+
+def test_lru_store_recovers_index_after_restart(tmp_path):
+    store = LRUDiskStore(str(tmp_path), max_bytes=10_000)
+    store.write("aa1", {"value": 1})
+    store.write("bb2", {"value": 2})
+
+    reopened = LRUDiskStore(str(tmp_path), max_bytes=10_000)
+    assert len(reopened) == 2
+    assert reopened.total_bytes == store.total_bytes
+
+
+def test_response_cache_disk_tier_is_bounded(tmp_path):
+    cache = ResponseCache(max_entries=1, default_ttl=60, model_ttls={}, disk_dir=str(tmp_path), disk_max_bytes=500)
+
+    async def fill():
+        for index in range(20):
+            await cache.set(f"{index:02d}" + "0" * 62, {"answer": "y" * 100}, "model")
+        return await cache.get("19" + "0" * 62), await cache.get("00" + "0" * 62)
+
+    newest, oldest = asyncio.run(fill())
+    assert newest == {"answer": "y" * 100}
+    assert oldest is None
+    assert sum(path.stat().st_size for path in tmp_path.glob("*/*.json")) <= 500
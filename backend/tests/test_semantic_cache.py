@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+from fastapi import Response
+
+from app.services import semantic_cache as module
+from app.services.semantic_cache import SemanticCache, hash_embedding, split_question
+
+
+def chat(question: str, **settings) -> dict:
+    payload = {"model": "m", "user": "alice", "temperature": 0.2, "max_tokens": 100,
+               "messages": [{"role": "system", "content": "be brief"}, {"role": "user", "content": question}]}
+    payload.update(settings)
+    return payload
+
+
+def test_lookup_finds_similar_question_above_threshold():
+    cache = SemanticCache(capacity=4, threshold=0.8, ttl=60)
+    cache.store(1, hash_embedding("what is the capital of france"), "Paris")
+
+    value, similarity = cache.lookup(1, hash_embedding("what is the capital of france ?"))
+    assert value == "Paris" and similarity > 0.99
+    assert cache.lookup(1, hash_embedding("how do I bake bread")) is None
+
+
+def test_threshold_rejects_loose_matches():
+    question = hash_embedding("what is the capital of france")
+    reworded = hash_embedding("what is the capital city of france")
+    similarity = float(question @ reworded)
+
+    loose = SemanticCache(capacity=4, threshold=similarity - 0.01, ttl=60)
+    strict = SemanticCache(capacity=4, threshold=similarity + 0.01, ttl=60)
+    for cache in (loose, strict):
+        cache.store(1, question, "Paris")
+    assert loose.lookup(1, reworded) is not None
+    assert strict.lookup(1, reworded) is None
+
+
+def test_lookup_stays_in_namespace():
+    cache = SemanticCache(capacity=4, threshold=0.8, ttl=60)
+    vector = hash_embedding("what is the capital of france")
+    cache.store(1, vector, "Paris")
+    assert cache.lookup(2, vector) is None
+
+
+@pytest.mark.parametrize("settings", [
+    {"user": "bob"},
+    {"max_tokens": 5},
+    {"temperature": 0.9},
+    {"model": "other"},
+    {"messages": [{"role": "system", "content": "be verbose"}, {"role": "user", "content": "hello"}]},
+])
+def test_namespace_covers_user_and_settings(settings):
+    namespace, question = split_question(chat("hello"))
+    other_namespace, other_question = split_question(chat("hello", **settings))
+    assert question == other_question == "hello"
+    assert namespace != other_namespace
+
+
+def test_namespace_ignores_stream_flag():
+    assert split_question(chat("hello")) == split_question(chat("hello", stream=False))
+
+
+def test_get_or_call_serves_only_same_settings(monkeypatch):
+    monkeypatch.setattr(module, "SEMANTIC_CACHE_ENABLED", True)
+    monkeypatch.setattr(module, "SEMANTIC_CACHE_EMBEDDING_MODEL", "")
+    cache = SemanticCache(capacity=4, threshold=0.9, ttl=60)
+    calls = []
+
+    async def ask(payload):
+        async def call():
+            calls.append(payload)
+            return {"answer": len(calls)}
+        response = Response()
+        value = await cache.get_or_call(payload, call, response, client=None)
+        return value, response.headers.get("X-Cache")
+
+    async def scenario():
+        return [await ask(chat("hello there")), await ask(chat("hello there")),
+                await ask(chat("hello there", max_tokens=5))]
+
+    first, second, capped = asyncio.run(scenario())
+    assert first == ({"answer": 1}, None)
+    assert second == ({"answer": 1}, "SEMANTIC-HIT")
+    assert capped == ({"answer": 2}, None)
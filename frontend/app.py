@@ -1,13 +1,18 @@
 """Model to Diplay Frontrend functionnalities"""
-import os
-import json
-import httpx
-import asyncio
-
 from dotenv import load_dotenv
-import requests
 import streamlit as st
 
+from utils.api_client import (
+    get_assistant_reply,
+    get_collections,
+    get_models,
+    prefetch_catalog,
+    stop_stream,
+    stream_assistant_reply,
+    transcribe_audio,
+    upload_file,
+)
+
 
 load_dotenv()
 
@@ -15,13 +20,8 @@ st.set_page_config(page_title="Discuter avec Albert", layout="wide")
 
 st.title("Discuter avec Albert")
 
-BACKEND_CHAT_URL = os.getenv("BACKEND_CHAT_URL")
-BACKEND_CHAT_COMPLETION_URL = os.getenv("BACKEND_CHAT_COMPLETION_URL")
-BACKEND_UPLOAD_URL = os.getenv("BACKEND_UPLOAD_URL")
-BACKEND_COLLECTIONS_URL = os.getenv("BACKEND_COLLECTIONS_URL")
-BACKEND_MODELS_URL = os.getenv("BACKEND_MODELS_URL")
-COMPLETIONS_URL = os.getenv("COMPLETIONS_URL")
-BACKEND_TRANSCRIPTION_URL = os.getenv("BACKEND_TRANSCRIPTION_URL")
+# Models and collections in one parallel round-trip, then from cache.
+prefetch_catalog()
 
 # Language choices for transcription
 LANGUAGES = {
@@ -38,204 +38,6 @@ if st.button("Clear Chat History"):
     st.session_state.chat_history = []
     st.success("Chat history cleared.")
 
-def get_assistant_reply(user_message, model_id):
-    """Send message to Albert Api and get the assistant's reply."""
-    payload = {
-        "messages": [
-            {"role": "system", "content": "You are a helpful assistant."},
-            {"role": "user", "content": user_message, "name": "Ayoub"}
-        ],
-        "model": model_id
-    }
-    try:
-        response = requests.post(FASTAPI_CHAT_URL, json=payload)
-        if response.status_code == 200:
-            data = response.json()
-            print("Response from backend:", data)  # Log full response for debugging
-            assistant_reply = data.get("assistant_reply", "")
-            if assistant_reply:
-                return assistant_reply
-            else:
-                st.error("Empty response from assistant.")
-                return None
-        else:
-            st.error(f"Error: {response.text}")
-            return None
-    except requests.exceptions.RequestException as e:
-        st.error(f"Request failed: {str(e)}")
-        return None
-
-
-def transcribe_audio(file, language, temperature=0, prompt=""):
-    """Send audio file to the backend for transcription."""
-    try:
-        files = {"file": (file.name, file.getvalue(), file.type)}
-        data = {
-            "model": "openai/whisper-large-v3",
-            "language": language,
-            "prompt": prompt,
-            "response_format": "json",
-            "temperature": temperature
-        }
-        response = requests.post(BACKEND_TRANSCRIPTION_URL, files=files, data=data)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.HTTPError as e:
-        return {"error": f"HTTP Error: {e.response.text}"}
-    except requests.exceptions.RequestException as e:
-        return {"error": f"Request failed: {str(e)}"}
-
-
-# def send_message_to_backend(messages, model, temperature, max_tokens, top_p, n, logprobs, 
-#                             frequency_penalty, presence_penalty, best_of, echo, logit_bias, stop, 
-#                             stream, suffix, user):
-#     # Create the payload for the API request, ensuring only valid fields
-#     payload = {
-#         "messages": [{"role": msg['role'], "content": msg['content'], "name": msg['name']} for msg in messages],  # Include 'name'
-#         "model": model,
-#         "temperature": temperature,
-#         "max_tokens": max_tokens,
-#         "top_p": top_p,
-#         "n": n,
-#         "logprobs": logprobs,
-#         "frequency_penalty": frequency_penalty,
-#         "presence_penalty": presence_penalty,
-#         "best_of": best_of,
-#         "echo": echo,
-#         "logit_bias": logit_bias,
-#         "stop": stop,
-#         "stream": stream,
-#         "suffix": suffix,
-#         "user": user
-#     }
-
-#     try:
-#         response = requests.post(BACKEND_CHAT_COMPLETION_URL, json=payload)
-#         response.raise_for_status()  # Raises HTTPError for bad responses
-#         response_data = response.json()
-#         return response_data.get("response", "")
-#     except requests.exceptions.HTTPError as e:
-#         return {"error": f"HTTP Error: {e.response.text}"}
-#     except requests.exceptions.RequestException as e:
-#         return {"error": f"Request failed: {str(e)}"}
-
-def send_message_to_backend(messages, model, **params):
-    payload = {"messages": messages, "model": model, **params}
-    try:
-        response = requests.post(BACKEND_CHAT_URL, json=payload)
-        response.raise_for_status()
-        return response.json().get("response", "")
-    except requests.exceptions.HTTPError as e:
-        return {"error": f"HTTP Error: {e.response.text}"}
-    except requests.exceptions.RequestException as e:
-        return {"error": f"Request failed: {str(e)}"}
-
-
-
-def send_message(prompt, model_id, **additional_params):
-    """Send message to Albert API and retrieve completion."""
-    payload = {
-        "prompt": prompt,
-        "model": model_id,
-        **additional_params
-    }
-
-    try:
-        response = requests.post(COMPLETIONS_URL, json=payload)
-        response.raise_for_status()
-        response_data = response.json()
-        return response_data['choices'][0]['text']
-    except requests.exceptions.HTTPError as e:
-        return {"error": f"HTTP Error: {e.response.text}"}
-    except requests.exceptions.RequestException as e:
-        return {"error": f"Request failed: {str(e)}"}
-
-
-def get_collections():
-    """Get collections.
-
-    Returns:
-        _type_: _description_
-    """
-    try:
-        response = requests.get(BACKEND_COLLECTIONS_URL)
-        response.raise_for_status()
-        data = response.json()
-
-        collections = data.get("data", [])
-
-        formatted_collections = []
-        for collection in collections:
-            formatted_collections.append({
-                "id": collection.get("id"),
-                "name": collection.get("name"),
-                "description": collection.get("description", None),
-            })
-
-        return formatted_collections
-
-    except requests.exceptions.RequestException as e:
-        st.error(f"Erreur lors de la récupération des collections : {e}")
-        return []
-
-
-def get_models():
-    """_summary_
-
-    Returns:
-        _type_: _description_
-    """
-    try:
-        response = requests.get(BACKEND_MODELS_URL)
-        response.raise_for_status()
-        data = response.json()
-
-        models = data.get("data", [])
-
-        formatted_models = []
-        for model in models:
-            formatted_models.append({
-                "id": model.get("id"),
-                "owned_by": model.get("owned_by"),
-                "type": model.get("type"),
-            })
-
-        return formatted_models
-
-    except requests.exceptions.RequestException as e:
-        st.error(f"Erreur lors de la récupération des modeles : {e}")
-        return []
-
-
-def upload_file(file, collection_id, chunk_size=512, chunk_overlap=0):
-    """
-    Synchronous version of the upload function using requests.
-    """
-    try:
-        file_data = file.read()
-
-        files = {
-            "file": (file.name, file_data, file.type)
-        }
-        data = {
-            "collection": str(collection_id),
-            "chunk_size": str(chunk_size),
-            "chunk_overlap": str(chunk_overlap),
-            "length_function": "len",
-            "is_separator_regex": "false",
-            "separators": "\n\n,\n,. , ",
-            "chunk_min_size": "1",
-        }
-
-        response = requests.post(BACKEND_UPLOAD_URL, files=files, data=data)
-        response.raise_for_status()  # Raises HTTPError for bad responses
-        return response.json()
-
-    except requests.exceptions.HTTPError as e:
-        return {"error": f"HTTP Error: {e.response.text}"}
-    except requests.exceptions.RequestException as e:
-        return {"error": f"Request failed: {str(e)}"}
-
 st.sidebar.title("Fonctionnalités")
 option = st.sidebar.selectbox("Choisissez une action :", ["Discuter",
                                                           "Charger un fichier",
@@ -328,11 +130,20 @@ if option == "Assistant":
 
     user_message = st.text_input("Vous :", placeholder="Écrivez votre message ici...")
 
-    if user_message:
+    # Clicking interrupts the run that is streaming; this rerun closes its response.
+    stop = st.button("Arrêter la génération") if stream else False
+
+    if stop:
+        stop_stream()
+    elif user_message:
         st.session_state.chat_history.append({"role": "user", "content": user_message, "name": "Ayoub"})
-        assistant_reply = get_assistant_reply(user_message, model)  # Pass the user message here
+        if stream:
+            st.write("Assistant:")
+            assistant_reply = st.write_stream(stream_assistant_reply(user_message, model))
+        else:
+            assistant_reply = get_assistant_reply(user_message, model)  # Pass the user message here
+            st.write(f"Assistant: {assistant_reply}")
         st.session_state.chat_history.append({"role": "assistant", "content": assistant_reply, "name": "assistant"})
-        st.write(f"Assistant: {assistant_reply}")
 
 
 # elif option == "Discuter":
@@ -0,0 +1,292 @@
+"""Client of the backend API shared by the Streamlit pages"""
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import streamlit as st
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+
+load_dotenv()
+
+BACKEND_CHAT_URL = os.getenv("BACKEND_CHAT_URL")
+BACKEND_CHAT_COMPLETION_URL = os.getenv("BACKEND_CHAT_COMPLETION_URL")
+BACKEND_UPLOAD_URL = os.getenv("BACKEND_UPLOAD_URL")
+BACKEND_COLLECTIONS_URL = os.getenv("BACKEND_COLLECTIONS_URL")
+BACKEND_MODELS_URL = os.getenv("BACKEND_MODELS_URL")
+COMPLETIONS_URL = os.getenv("COMPLETIONS_URL")
+BACKEND_TRANSCRIPTION_URL = os.getenv("BACKEND_TRANSCRIPTION_URL")
+
+BACKEND_POOL_SIZE = int(os.getenv("BACKEND_POOL_SIZE", "10"))
+BACKEND_CONNECT_TIMEOUT = float(os.getenv("BACKEND_CONNECT_TIMEOUT", "5"))
+# Catalog reads are quick; generation, uploads and transcriptions are not.
+BACKEND_CATALOG_TIMEOUT = float(os.getenv("BACKEND_CATALOG_TIMEOUT", "10"))
+BACKEND_READ_TIMEOUT = float(os.getenv("BACKEND_READ_TIMEOUT", "300"))
+# Seconds models and collections are reused across reruns and sessions.
+BACKEND_CATALOG_TTL = int(os.getenv("BACKEND_CATALOG_TTL", "60"))
+
+CATALOG_TIMEOUT = (BACKEND_CONNECT_TIMEOUT, BACKEND_CATALOG_TIMEOUT)
+READ_TIMEOUT = (BACKEND_CONNECT_TIMEOUT, BACKEND_READ_TIMEOUT)
+
+
+@st.cache_resource
+def get_session() -> requests.Session:
+    """One keep-alive connection pool shared by every session and rerun.
+
+    Returns:
+        requests.Session: Session with a pool of BACKEND_POOL_SIZE connections.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=BACKEND_POOL_SIZE, pool_maxsize=BACKEND_POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@st.cache_resource
+def get_executor() -> ThreadPoolExecutor:
+    """Threads used to prefetch catalogs concurrently."""
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="backend-prefetch")
+
+
+@st.cache_data(ttl=BACKEND_CATALOG_TTL, show_spinner=False)
+def fetch_models() -> list:
+    """Get models, cached for BACKEND_CATALOG_TTL seconds.
+
+    Raises:
+        requests.exceptions.RequestException: If the backend call fails, nothing is cached.
+
+    Returns:
+        list: Models with their id, owner and type.
+    """
+    response = get_session().get(BACKEND_MODELS_URL, timeout=CATALOG_TIMEOUT)
+    response.raise_for_status()
+    return [
+        {
+            "id": model.get("id"),
+            "owned_by": model.get("owned_by"),
+            "type": model.get("type"),
+        }
+        for model in response.json().get("data", [])
+    ]
+
+
+@st.cache_data(ttl=BACKEND_CATALOG_TTL, show_spinner=False)
+def fetch_collections() -> list:
+    """Get collections, cached for BACKEND_CATALOG_TTL seconds.
+
+    Raises:
+        requests.exceptions.RequestException: If the backend call fails, nothing is cached.
+
+    Returns:
+        list: Collections with their id, name and description.
+    """
+    response = get_session().get(BACKEND_COLLECTIONS_URL, timeout=CATALOG_TIMEOUT)
+    response.raise_for_status()
+    return [
+        {
+            "id": collection.get("id"),
+            "name": collection.get("name"),
+            "description": collection.get("description", None),
+        }
+        for collection in response.json().get("data", [])
+    ]
+
+
+def prefetch_catalog() -> None:
+    """Warm the models and collections caches with one parallel round-trip.
+
+    Errors are left for get_models() and get_collections() to report.
+    """
+    ctx = get_script_run_ctx()
+
+    def run(fetch):
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return fetch()
+
+    futures = [get_executor().submit(run, fetch) for fetch in (fetch_models, fetch_collections)]
+    for future in futures:
+        future.exception()
+
+
+def get_models():
+    """Get models, showing an error and returning [] if the backend fails.
+
+    Returns:
+        list: Models with their id, owner and type.
+    """
+    try:
+        return fetch_models()
+    except requests.exceptions.RequestException as e:
+        st.error(f"Erreur lors de la récupération des modeles : {e}")
+        return []
+
+
+def get_collections():
+    """Get collections, showing an error and returning [] if the backend fails.
+
+    Returns:
+        list: Collections with their id, name and description.
+    """
+    try:
+        return fetch_collections()
+    except requests.exceptions.RequestException as e:
+        st.error(f"Erreur lors de la récupération des collections : {e}")
+        return []
+
+
+def get_assistant_reply(user_message, model_id):
+    """Send message to Albert Api and get the assistant's reply."""
+    payload = {
+        "messages": [
+            {"role": "system", "content": "You are a helpful assistant."},
+            {"role": "user", "content": user_message, "name": "Ayoub"}
+        ],
+        "model": model_id
+    }
+    try:
+        response = get_session().post(BACKEND_CHAT_URL, json=payload, timeout=READ_TIMEOUT)
+        if response.status_code == 200:
+            data = response.json()
+            assistant_reply = data.get("assistant_reply", "")
+            if assistant_reply:
+                return assistant_reply
+            else:
+                st.error("Empty response from assistant.")
+                return None
+        else:
+            st.error(f"Error: {response.text}")
+            return None
+    except requests.exceptions.RequestException as e:
+        st.error(f"Request failed: {str(e)}")
+        return None
+
+
+def stream_assistant_reply(user_message, model_id):
+    """Yield the assistant's reply piece by piece as the backend streams it.
+
+    The open response is kept in st.session_state.active_stream so that
+    stop_stream() can close it, which makes the backend cancel generation.
+    """
+    payload = {
+        "messages": [
+            {"role": "system", "content": "You are a helpful assistant."},
+            {"role": "user", "content": user_message, "name": "Ayoub"}
+        ],
+        "model": model_id,
+        "stream": True,
+    }
+    response = None
+    try:
+        response = get_session().post(BACKEND_CHAT_URL, json=payload, stream=True, timeout=READ_TIMEOUT)
+        st.session_state.active_stream = response
+        response.raise_for_status()
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            choices = json.loads(data).get("choices") or [{}]
+            content = (choices[0].get("delta") or {}).get("content")
+            if content:
+                yield content
+    except requests.exceptions.HTTPError as e:
+        st.error(f"Error: {e.response.text}")
+    except requests.exceptions.RequestException as e:
+        st.error(f"Request failed: {str(e)}")
+    finally:
+        if response is not None:
+            response.close()
+        st.session_state.pop("active_stream", None)
+
+
+def stop_stream():
+    """Close the reply being streamed, if any."""
+    response = st.session_state.pop("active_stream", None)
+    if response is not None:
+        response.close()
+
+
+def transcribe_audio(file, language, temperature=0, prompt=""):
+    """Send audio file to the backend for transcription."""
+    try:
+        files = {"file": (file.name, file.getvalue(), file.type)}
+        data = {
+            "model": "openai/whisper-large-v3",
+            "language": language,
+            "prompt": prompt,
+            "response_format": "json",
+            "temperature": temperature
+        }
+        response = get_session().post(BACKEND_TRANSCRIPTION_URL, files=files, data=data, timeout=READ_TIMEOUT)
+        response.raise_for_status()
+        return response.json()
+    except requests.exceptions.HTTPError as e:
+        return {"error": f"HTTP Error: {e.response.text}"}
+    except requests.exceptions.RequestException as e:
+        return {"error": f"Request failed: {str(e)}"}
+
+
+def send_message_to_backend(messages, model, **params):
+    """Send a conversation to the backend chat route."""
+    payload = {"messages": messages, "model": model, **params}
+    try:
+        response = get_session().post(BACKEND_CHAT_URL, json=payload, timeout=READ_TIMEOUT)
+        response.raise_for_status()
+        return response.json().get("response", "")
+    except requests.exceptions.HTTPError as e:
+        return {"error": f"HTTP Error: {e.response.text}"}
+    except requests.exceptions.RequestException as e:
+        return {"error": f"Request failed: {str(e)}"}
+
+
+def send_message(prompt, model_id, **additional_params):
+    """Send message to Albert API and retrieve completion."""
+    payload = {
+        "prompt": prompt,
+        "model": model_id,
+        **additional_params
+    }
+
+    try:
+        response = get_session().post(COMPLETIONS_URL, json=payload, timeout=READ_TIMEOUT)
+        response.raise_for_status()
+        response_data = response.json()
+        return response_data['choices'][0]['text']
+    except requests.exceptions.HTTPError as e:
+        return {"error": f"HTTP Error: {e.response.text}"}
+    except requests.exceptions.RequestException as e:
+        return {"error": f"Request failed: {str(e)}"}
+
+
+def upload_file(file, collection_id, chunk_size=512, chunk_overlap=0):
+    """Upload a file to a collection."""
+    try:
+        file_data = file.read()
+
+        files = {
+            "file": (file.name, file_data, file.type)
+        }
+        data = {
+            "collection": str(collection_id),
+            "chunk_size": str(chunk_size),
+            "chunk_overlap": str(chunk_overlap),
+            "length_function": "len",
+            "is_separator_regex": "false",
+            "separators": "\n\n,\n,. , ",
+            "chunk_min_size": "1",
+        }
+
+        response = get_session().post(BACKEND_UPLOAD_URL, files=files, data=data, timeout=READ_TIMEOUT)
+        response.raise_for_status()  # Raises HTTPError for bad responses
+        return response.json()
+
+    except requests.exceptions.HTTPError as e:
+        return {"error": f"HTTP Error: {e.response.text}"}
+    except requests.exceptions.RequestException as e:
+        return {"error": f"Request failed: {str(e)}"}